@@ -0,0 +1,336 @@
+"""
+Admission control for live audio sessions.
+
+Every live session costs an ffmpeg decode per chunk, a Transcribe stream and
+LLM traffic, so admitting without limit lets one spike degrade every call.
+The AdmissionController decides whether a new session may start:
+- Tenant limit: at most ADMISSION_MAX_PER_CUSTOMER live sessions per
+  customer; over it the request is rejected at once, since waiting would
+  not free a slot
+- A global limit of ADMISSION_MAX_SESSIONS, plus ADMISSION_URGENT_HEADROOM
+  extra slots that only urgent calls may use. A call is urgent when the
+  same customer had a call classified into URGENT_INTENTS (e.g.
+  fraud_reporting) within ADMISSION_URGENT_MEMORY_SECONDS, so a dropped
+  fraud call that reconnects goes ahead of routine traffic
+- Load signals: when process + ffmpeg CPU, the mean transcription queue
+  depth or LLM concurrency in use pass their thresholds, or a provider
+  breaker is open, normal calls wait even below the global limit
+- Calls that cannot start wait in a priority queue (urgent first, then
+  arrival order) for up to ADMISSION_MAX_WAIT_SECONDS; after that they get
+  AdmissionRejected with their position and an estimated wait, derived from
+  the observed session length and the number of live sessions
+
+Priority is derived only from server-side classification (mark_urgent),
+never from the client asking to be admitted; see start_audio_session in
+main.py.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    ADMISSION_MAX_SESSIONS, ADMISSION_MAX_PER_CUSTOMER, ADMISSION_URGENT_HEADROOM,
+    ADMISSION_URGENT_MEMORY_SECONDS, ADMISSION_MAX_WAIT_SECONDS, ADMISSION_MAX_QUEUE,
+    ADMISSION_CPU_HIGH, ADMISSION_QUEUE_DEPTH_HIGH, ADMISSION_PROVIDER_HIGH, URGENT_INTENTS,
+)
+from llm_clients import provider_saturation
+from metrics import registry
+from resilience import resilience_summary
+
+logger = logging.getLogger(__name__)
+
+URGENT, NORMAL = 0, 1
+PRIORITY_NAMES = {URGENT: "urgent", NORMAL: "normal"}
+
+DEFAULT_SESSION_SECONDS = 180.0  # assumed call length until some calls have ended
+SESSION_SECONDS_SMOOTHING = 0.1  # EWMA weight of each finished session
+CPU_SAMPLE_SECONDS = 1.0
+REDISPATCH_SECONDS = 0.5  # waiters re-check load signals this often
+TENANT_RETRY_AFTER_SECONDS = 30
+
+admission_decisions = registry.counter("admission_decisions", "Live session admission decisions",
+                                       ("outcome", "priority"))
+admission_wait_seconds = registry.histogram("admission_wait_seconds", "Time new sessions spent queued for admission",
+                                            ("priority",))
+
+
+def priority_for(intent: Optional[str]) -> int:
+    return URGENT if intent in URGENT_INTENTS else NORMAL
+
+
+class AdmissionRejected(Exception):
+    """The session may not start now; retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: float, position: Optional[int] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+        self.position = position
+
+
+class AdmissionSlot:
+    """A granted session's share of capacity"""
+
+    def __init__(self, session_id: str, customer_id: str, priority: int):
+        self.session_id = session_id
+        self.customer_id = customer_id
+        self.priority = priority
+        self.admitted_at = time.monotonic()
+
+
+class _Waiter:
+    def __init__(self, slot: AdmissionSlot):
+        self.slot = slot
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """Global and per-customer session limits with a priority wait queue"""
+
+    def __init__(self, max_sessions: int = ADMISSION_MAX_SESSIONS,
+                 max_per_customer: int = ADMISSION_MAX_PER_CUSTOMER,
+                 urgent_headroom: int = ADMISSION_URGENT_HEADROOM,
+                 urgent_memory: float = ADMISSION_URGENT_MEMORY_SECONDS,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.max_sessions = max_sessions
+        self.max_per_customer = max_per_customer
+        self.urgent_headroom = urgent_headroom
+        self.urgent_memory = urgent_memory
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.active: Dict[str, AdmissionSlot] = {}
+        self.by_customer: Counter = Counter()
+        self._urgent_until: Dict[str, float] = {}  # customer -> when their urgent priority lapses
+        self.avg_session_seconds = DEFAULT_SESSION_SECONDS
+        self.totals: Counter = Counter()
+        # Mean chunks waiting per live session; wired up by the session manager
+        self.queue_depths: Callable[[], List[int]] = lambda: []
+        self._waiters: List = []  # heap of (priority, sequence, _Waiter)
+        self._sequence = itertools.count()
+        self._cpu_sample = (time.monotonic(), self._cpu_seconds())
+        self._cpu_fraction = 0.0
+
+    # --- Load signals ---
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+    def cpu_fraction(self) -> float:
+        """Process plus finished ffmpeg children CPU per core over the last sample window"""
+        now = time.monotonic()
+        started, cpu_started = self._cpu_sample
+        if now - started >= CPU_SAMPLE_SECONDS:
+            cpu = self._cpu_seconds()
+            self._cpu_fraction = (cpu - cpu_started) / (now - started) / (os.cpu_count() or 1)
+            self._cpu_sample = (now, cpu)
+        return self._cpu_fraction
+
+    def load_signals(self) -> Dict:
+        depths = self.queue_depths()
+        return {
+            "cpu": round(self.cpu_fraction(), 3),
+            "queue_depth": round(sum(depths) / len(depths), 2) if depths else 0.0,
+            "provider_saturation": round(provider_saturation(), 3),
+            "open_breakers": sorted(name for name, breaker in resilience_summary().items()
+                                    if breaker["state"] == "open"),
+        }
+
+    def overload_reason(self, signals: Optional[Dict] = None) -> Optional[str]:
+        signals = signals or self.load_signals()
+        if signals["cpu"] >= ADMISSION_CPU_HIGH:
+            return "cpu"
+        if signals["queue_depth"] >= ADMISSION_QUEUE_DEPTH_HIGH:
+            return "queue_depth"
+        if signals["provider_saturation"] >= ADMISSION_PROVIDER_HIGH:
+            return "provider_quota"
+        if signals["open_breakers"]:
+            return "provider_unavailable"
+        return None
+
+    # --- Decisions ---
+
+    def _tenant_block(self, slot: AdmissionSlot) -> Optional[str]:
+        if self.by_customer[slot.customer_id] >= self.max_per_customer:
+            return "customer_limit"
+        return None
+
+    def _capacity_block(self, slot: AdmissionSlot) -> Optional[str]:
+        limit = self.max_sessions + (self.urgent_headroom if slot.priority == URGENT else 0)
+        if len(self.active) >= limit:
+            return "capacity"
+        # Urgent calls still start under load, as long as there is a slot
+        if slot.priority != URGENT:
+            return self.overload_reason()
+        return None
+
+    def _grant(self, slot: AdmissionSlot, outcome: str):
+        slot.admitted_at = time.monotonic()
+        self.active[slot.session_id] = slot
+        self.by_customer[slot.customer_id] += 1
+        self.totals[outcome] += 1
+        admission_decisions.inc(outcome, PRIORITY_NAMES[slot.priority])
+
+    def _rejection(self, slot: AdmissionSlot, reason: str, retry_after: float,
+                   position: Optional[int] = None) -> AdmissionRejected:
+        """Count and log a rejection; the caller raises it or hands it to a waiter"""
+        self.totals[f"rejected_{reason}"] += 1
+        admission_decisions.inc(f"rejected_{reason}", PRIORITY_NAMES[slot.priority])
+        logger.info("Admission rejected (%s, position %s, retry after %.0fs)", reason, position, retry_after,
+                    extra={"session_id": slot.session_id})
+        return AdmissionRejected(reason, retry_after, position)
+
+    # --- Priority ---
+
+    def mark_urgent(self, session_id: str):
+        """A live call classified as urgent: raise its slot and its customer's next sessions"""
+        slot = self.active.get(session_id)
+        if slot is None:
+            return
+        slot.priority = URGENT
+        now = time.monotonic()
+        self._urgent_until = {customer: until for customer, until in self._urgent_until.items() if until > now}
+        self._urgent_until[slot.customer_id] = now + self.urgent_memory
+
+    def priority_of(self, customer_id: str) -> int:
+        return URGENT if self._urgent_until.get(customer_id, 0.0) > time.monotonic() else NORMAL
+
+    async def admit(self, session_id: str, customer_id: str) -> AdmissionSlot:
+        """Grant a slot, waiting in the priority queue if needed.
+
+        Raises AdmissionRejected, or ValueError if the session already holds or awaits a slot.
+        """
+        if session_id in self.active or any(entry[2].slot.session_id == session_id for entry in self._waiters):
+            raise ValueError(f"Session {session_id} is already admitted or queued")
+        slot = AdmissionSlot(session_id, customer_id, self.priority_of(customer_id))
+
+        tenant_block = self._tenant_block(slot)
+        if tenant_block:
+            raise self._rejection(slot, tenant_block, TENANT_RETRY_AFTER_SECONDS)
+
+        ahead = sum(1 for priority, _, _ in self._waiters if priority <= slot.priority)
+        if not ahead and not self._capacity_block(slot):
+            self._grant(slot, "admitted")
+            return slot
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._rejection(slot, "queue_full", self.estimated_wait(len(self._waiters)))
+
+        waiter = _Waiter(slot)
+        heapq.heappush(self._waiters, (slot.priority, next(self._sequence), waiter))
+        deadline = waiter.enqueued_at + self.max_wait
+        admitted = False
+        try:
+            while not waiter.future.done():
+                self._dispatch()
+                remaining = deadline - time.monotonic()
+                if waiter.future.done() or remaining <= 0:
+                    break
+                # asyncio.wait never raises the future's outcome, so a rejection is read below
+                await asyncio.wait({waiter.future}, timeout=min(REDISPATCH_SECONDS, remaining))
+
+            if waiter.future.done():
+                # _dispatch either granted the slot or rejected the waiter (tenant limit reached meanwhile)
+                rejection = waiter.future.exception()
+                if rejection is not None:
+                    raise rejection
+                admission_wait_seconds.observe(time.monotonic() - waiter.enqueued_at, PRIORITY_NAMES[slot.priority])
+                admitted = True
+                return slot
+        finally:
+            if not waiter.future.done():
+                self._remove_waiter(waiter)
+                waiter.future.cancel()
+            elif not admitted and waiter.future.exception() is None:
+                # Granted just as this request was cancelled; nobody will start the session
+                self._free(slot)
+                self._dispatch()
+
+        position = self._position(slot.priority)
+        raise self._rejection(slot, self._capacity_block(slot) or "capacity", self.estimated_wait(position), position)
+
+    def _dispatch(self):
+        """Start queued sessions in priority order while capacity allows"""
+        while self._waiters:
+            _, _, waiter = self._waiters[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._capacity_block(waiter.slot):
+                return
+            heapq.heappop(self._waiters)
+            tenant_block = self._tenant_block(waiter.slot)
+            if tenant_block:
+                # Another session of this tenant started meanwhile; waiting longer would not help
+                waiter.future.set_exception(self._rejection(waiter.slot, tenant_block, TENANT_RETRY_AFTER_SECONDS))
+                continue
+            self._grant(waiter.slot, "admitted_after_wait")
+            waiter.future.set_result(waiter.slot)
+
+    def _remove_waiter(self, waiter: _Waiter):
+        self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+        heapq.heapify(self._waiters)
+
+    def _position(self, priority: int) -> int:
+        return sum(1 for p, _, _ in self._waiters if p <= priority)
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until `position` earlier sessions have ended, at the observed departure rate"""
+        departures_per_second = max(1, len(self.active)) / self.avg_session_seconds
+        return (position + 1) / departures_per_second
+
+    def force_admit(self, session_id: str, customer_id: str):
+        """Count a session that bypasses admission (resumed from a checkpoint)"""
+        if session_id not in self.active:
+            self._grant(AdmissionSlot(session_id, customer_id, self.priority_of(customer_id)), "resumed")
+
+    def release(self, session_id: str):
+        slot = self.active.get(session_id)
+        if slot is None:
+            return
+        self._free(slot)
+        duration = time.monotonic() - slot.admitted_at
+        self.avg_session_seconds += SESSION_SECONDS_SMOOTHING * (duration - self.avg_session_seconds)
+        self._dispatch()
+
+    def _free(self, slot: AdmissionSlot):
+        self.active.pop(slot.session_id, None)
+        self.by_customer[slot.customer_id] -= 1
+        if self.by_customer[slot.customer_id] <= 0:
+            del self.by_customer[slot.customer_id]
+
+    def summary(self) -> Dict:
+        signals = self.load_signals()
+        return {
+            "active": len(self.active),
+            "limits": {
+                "max_sessions": self.max_sessions,
+                "urgent_headroom": self.urgent_headroom,
+                "per_customer": self.max_per_customer,
+            },
+            "urgent_customers": sum(1 for until in self._urgent_until.values() if until > time.monotonic()),
+            "waiting": {PRIORITY_NAMES[priority]: count
+                        for priority, count in Counter(entry[0] for entry in self._waiters).items()},
+            "load": signals,
+            "overloaded": self.overload_reason(signals),
+            "avg_session_seconds": round(self.avg_session_seconds, 1),
+            "estimated_wait_seconds": round(self.estimated_wait(len(self._waiters)), 1),
+            "totals": dict(self.totals),
+        }
+
+
+# Global controller
+admission_controller = AdmissionController()
+
+registry.gauge_callback("admission_active_sessions", "Sessions holding an admission slot",
+                        lambda: len(admission_controller.active))
+registry.gauge_callback("admission_waiting", "Sessions queued for admission", lambda: len(admission_controller._waiters))
@@ -16,6 +16,7 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from fastapi.responses import FileResponse
 from auth.dependencies import verify_token
 from database.fake_db import db
+from records import UploadRecord
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/audio", tags=["audio"])
@@ -40,15 +41,7 @@ async def upload_audio(
         f.write(audio_data)
     
     # Store metadata
-    db.audio_storage[audio_id] = {
-        "audio_id": audio_id,
-        "filename": file.filename,
-        "file_path": file_path,
-        "uploaded_by": username,
-        "role": role,
-        "size_bytes": len(audio_data),
-        "uploaded_at": datetime.utcnow()
-    }
+    db.audio_storage[audio_id] = UploadRecord(audio_id, file.filename, file_path, username, role, len(audio_data))
     
     logger.info(f"✅ Audio saved: {file_path} ({len(audio_data)} bytes)")
     
@@ -64,7 +57,7 @@ async def download_audio(audio_id: str):
         raise HTTPException(status_code=404, detail="Audio not found")
     
     audio_info = db.audio_storage[audio_id]
-    file_path = audio_info["file_path"]
+    file_path = audio_info.file_path
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
@@ -78,8 +71,8 @@ async def list_audio_files(token_data = Depends(verify_token)):
     
     # Agents see all, customers see only their own
     if role == "agent":
-        files = list(db.audio_storage.values())
+        files = [a.to_dict() for a in db.audio_storage.values()]
     else:
-        files = [a for a in db.audio_storage.values() if a["uploaded_by"] == username]
+        files = [a.to_dict() for a in db.audio_storage.values() if a.uploaded_by == username]
     
     return {"audio_files": files, "total": len(files)}
\ No newline at end of file
@@ -0,0 +1,307 @@
+"""
+Post-call archiving of session audio.
+
+This module moves recorded sessions out of memory and into a compact format:
+- The session's WebM chunks are joined and written once to audio_files/
+- A small worker pool transcodes each recording to Opus in Ogg at voice
+  bitrate with ffmpeg, off the live path
+- Identical recordings (same content hash) are archived only once; each
+  session still gets its own record pointing at the shared file
+- A later save of the same session (e.g. at call end after a mid-call save)
+  supersedes the earlier one, whose files are removed once nothing uses them
+- Source and archived sizes are recorded per session and in aggregate, and
+  appended to a manifest so archive records survive restarts; a record is
+  written when it is queued and again when it finishes, so jobs still
+  pending at a restart are queued again by resume()
+
+Downloads are served from the archive once a session has ended, so the raw
+bytes no longer need to stay in memory or be copied again to sessions/.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from audio_index import AudioFileIndex, audio_file_index
+from config import ARCHIVE_WORKERS, ARCHIVE_OPUS_BITRATE, ARCHIVE_KEEP_SOURCE
+from metrics import ffmpeg_processes, ffmpeg_runs
+from records import ChunkRecord
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "archive_manifest.jsonl"
+
+
+def combine_chunks(chunks: List[ChunkRecord]) -> bytes:
+    """Join uploaded chunks in chunk-index order"""
+    return b"".join(chunk.data for chunk in sorted(chunks, key=lambda x: x.index))
+
+
+class AudioArchiver:
+    """Writes finished sessions to disk and transcodes them in the background"""
+
+    def __init__(self, index: AudioFileIndex, workers: int = ARCHIVE_WORKERS,
+                 bitrate: str = ARCHIVE_OPUS_BITRATE, keep_source: bool = ARCHIVE_KEEP_SOURCE):
+        self.index = index
+        self.directory = index.directory
+        self.workers = workers
+        self.bitrate = bitrate
+        self.keep_source = keep_source
+        self.records: Dict[str, Dict] = {}
+        self.totals = {"jobs": 0, "completed": 0, "failed": 0, "deduplicated": 0, "superseded": 0,
+                       "source_bytes": 0, "archived_bytes": 0}
+        self._by_hash: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._manifest_loaded = False
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        if self._manifest_loaded:
+            return
+        self._manifest_loaded = True
+        if not os.path.exists(self.manifest_path):
+            return
+        replaced = []
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                previous = self.records.get(record["session_id"])
+                if previous is not None and previous["status"] == "pending":
+                    replaced.append(previous)
+                self.records[record["session_id"]] = record
+                if record["status"] != "failed":
+                    self._by_hash[record["sha256"]] = record["session_id"]
+
+        # Sources of pending saves superseded before the restart are never transcoded
+        for record in replaced:
+            self._remove_unused(record.get("source_path"))
+
+    def resume(self):
+        """Queue the jobs that were still pending when the previous process stopped"""
+        self._load_manifest()
+        # Deduplicated records follow the job of the record that owns their file
+        pending = [record for record in self.records.values()
+                   if record["status"] == "pending" and not record.get("duplicate_of")]
+        if not pending:
+            return
+        self._ensure_workers()
+        for record in pending:
+            self._queue.put_nowait(record)
+        logger.info(f"Re-queued {len(pending)} archive jobs left pending by the previous process")
+
+    def _append_manifest(self, record: Dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        self._load_manifest()
+        return self.records.get(session_id)
+
+    def _is_current(self, record: Dict) -> bool:
+        return self.records.get(record["session_id"]) is record
+
+    def _in_use(self, path: str) -> bool:
+        return any(record["file_path"] == path for record in self.records.values())
+
+    def _remove_unused(self, path: Optional[str]):
+        if path and not self._in_use(path) and os.path.exists(path):
+            os.remove(path)
+            self.index.discard(path)
+
+    def _replace(self, session_id: str, record: Dict):
+        """Make record the session's current one and drop what only the previous one used"""
+        previous = self.records.get(session_id)
+        self.records[session_id] = record
+        if previous is None or previous is record:
+            return
+        if self._by_hash.get(previous["sha256"]) == session_id:
+            del self._by_hash[previous["sha256"]]
+        # A pending one is skipped (or finished for sessions sharing it) by the worker
+        if previous["status"] != "pending":
+            self._remove_unused(previous["file_path"])
+            self._remove_unused(previous.get("source_path"))
+
+    async def archive_session(self, session_id: str, customer_id: str, chunks: List[ChunkRecord]) -> Dict:
+        """Write the session's audio once and queue it for transcoding"""
+        self._load_manifest()
+
+        data = await asyncio.to_thread(combine_chunks, chunks)
+        digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+
+        # Same recording already archived (e.g. save-local called twice)
+        duplicate_of = self._by_hash.get(digest)
+        original = self.records.get(duplicate_of) if duplicate_of else None
+        if original is not None and original["sha256"] == digest:
+            self.totals["deduplicated"] += 1
+            if duplicate_of == session_id:
+                return original
+            # Own record pointing at the shared file; a pending transcode updates it too
+            record = {**original, "session_id": session_id, "customer_id": customer_id,
+                      "duplicate_of": duplicate_of, "saved_at": datetime.utcnow().isoformat()}
+            self._replace(session_id, record)
+            await asyncio.to_thread(self._append_manifest, record)
+            return record
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        # The digest keeps a second save of the session within the same second from overwriting the first
+        filename = f"customer_{customer_id}_{session_id}_{timestamp}_{digest[:8]}.webm"
+        file_path = os.path.join(self.directory, filename)
+
+        def write_source():
+            os.makedirs(self.directory, exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(data)
+
+        await asyncio.to_thread(write_source)
+        self.index.add(file_path)
+
+        record = {
+            "session_id": session_id,
+            "customer_id": customer_id,
+            "filename": filename,
+            "file_path": file_path,
+            "source_path": file_path,
+            "file_size": len(data),
+            "total_chunks": len(chunks),
+            "sha256": digest,
+            "status": "pending",
+            "source_bytes": len(data),
+            "archived_bytes": None,
+            "compression_ratio": None,
+            "saved_at": datetime.utcnow().isoformat(),
+        }
+        self._replace(session_id, record)
+        self._by_hash[digest] = session_id
+        self.totals["jobs"] += 1
+        # Recorded as pending now, so a restart before the transcode re-queues it
+        await asyncio.to_thread(self._append_manifest, record)
+
+        self._ensure_workers()
+        await self._queue.put(record)
+        logger.info(f"Queued {file_path} ({len(data)} bytes) for archiving")
+        return record
+
+    async def _worker(self):
+        while True:
+            record = await self._queue.get()
+            try:
+                if self._is_current(record) or self._in_use(record["source_path"]):
+                    await self._transcode(record)
+                else:
+                    # A later save of the session replaced it before its turn
+                    record["status"] = "superseded"
+                    self.totals["superseded"] += 1
+                    self._remove_unused(record["source_path"])
+            except Exception as e:
+                logger.error(f"Archiving failed for session {record['session_id']}: {e}")
+                failed = self._fail(record)
+                await asyncio.to_thread(lambda: [self._append_manifest(r) for r in failed])
+            finally:
+                self._queue.task_done()
+
+    def _fail(self, record: Dict) -> List[Dict]:
+        """Mark the job and the sessions sharing its file failed; returns the current ones"""
+        source = record["source_path"]
+        sharing = [r for r in self.records.values() if r is not record and r["file_path"] == source]
+        for other in [record] + sharing:
+            other["status"] = "failed"
+        # Let a later save retry instead of deduplicating against the failure
+        if self._by_hash.get(record["sha256"]) == record["session_id"]:
+            del self._by_hash[record["sha256"]]
+        self.totals["failed"] += 1
+        return ([record] if self._is_current(record) else []) + sharing
+
+    async def _transcode(self, record: Dict):
+        source = record["source_path"]
+        target = os.path.splitext(source)[0] + ".ogg"
+
+        with ffmpeg_processes.track("archive"):
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-nostdin", "-y",
+                "-i", source,
+                "-vn",
+                "-c:a", "libopus",
+                "-b:a", self.bitrate,
+                "-application", "voip",
+                target,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            _, stderr = await process.communicate()
+        ffmpeg_runs.inc("archive", "ok" if process.returncode == 0 else "error")
+
+        if process.returncode != 0:
+            if os.path.exists(target):
+                os.remove(target)
+            raise RuntimeError(stderr.decode(errors="replace")[-500:])
+
+        archived_bytes = os.path.getsize(target)
+        archived = {
+            "filename": os.path.basename(target),
+            "file_path": target,
+            "file_size": archived_bytes,
+            "status": "done",
+            "archived_bytes": archived_bytes,
+            "compression_ratio": round(record["source_bytes"] / archived_bytes, 2) if archived_bytes else None,
+        }
+        # Deduplicated sessions pointing at the same source move to the archive with it
+        sharing = [r for r in self.records.values() if r is not record and r["file_path"] == source]
+        current = self._is_current(record)
+        record.update(archived)
+        for other in sharing:
+            other.update(archived)
+
+        if not current and not sharing:
+            # Superseded while transcoding; nothing refers to these files any more
+            record["status"] = "superseded"
+            self.totals["superseded"] += 1
+            self._remove_unused(target)
+            self._remove_unused(source)
+            return
+
+        self.index.add(target)
+        if not self.keep_source:
+            self._remove_unused(source)
+
+        self.totals["completed"] += 1
+        self.totals["source_bytes"] += record["source_bytes"]
+        self.totals["archived_bytes"] += archived_bytes
+        for finished in ([record] if current else []) + sharing:
+            await asyncio.to_thread(self._append_manifest, finished)
+
+        logger.info(
+            f"Archived session {record['session_id']}: {record['source_bytes']} -> {archived_bytes} bytes "
+            f"(x{record['compression_ratio']})"
+        )
+
+    def stats(self) -> Dict:
+        totals = dict(self.totals)
+        totals["pending"] = self._queue.qsize() if self._queue else 0
+        totals["compression_ratio"] = (
+            round(totals["source_bytes"] / totals["archived_bytes"], 2) if totals["archived_bytes"] else None
+        )
+        return totals
+
+
+# Global archiver instance
+audio_archiver = AudioArchiver(audio_file_index)
@@ -0,0 +1,245 @@
+"""
+Incrementally maintained metadata indexes for audio listings.
+
+This module provides:
+- AudioFileIndex: file metadata for the audio_files/ archive, kept sorted by
+  creation time. Saves update it directly; files added or removed by other
+  processes are picked up when the directory mtime changes.
+- SessionIndex: per-session summaries (chunk count, owner, last activity)
+  updated as chunks are uploaded, instead of walking every stored chunk.
+  It keeps the newest SESSION_INDEX_MAX_SESSIONS sessions; older summaries
+  are dropped so the index stays bounded on a long-running server.
+
+Both serve newest-first pages addressed by an opaque cursor, so a listing
+request costs one directory stat plus the page itself, not a full scan.
+"""
+
+import base64
+import bisect
+import itertools
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import SESSION_INDEX_MAX_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.webm', '.wav', '.mp3', '.mp4', '.ogg')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value: str) -> str:
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class AudioFileIndex:
+    """Sorted metadata index of the recordings in one directory"""
+
+    def __init__(self, directory: str = "audio_files", extensions: Tuple[str, ...] = AUDIO_EXTENSIONS):
+        self.directory = directory
+        self.extensions = extensions
+        self.total_size = 0
+        self._entries: Dict[str, Dict] = {}
+        self._order: List[Tuple[int, str]] = []  # (created_ns, filename), ascending
+        self._dir_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _stat_entry(self, filename: str, file_stat: os.stat_result) -> Dict:
+        return {
+            "filename": filename,
+            "size": file_stat.st_size,
+            "created": datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
+            "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
+            "path": os.path.join(self.directory, filename),
+            "_key": (file_stat.st_ctime_ns, filename),
+        }
+
+    def _insert(self, entry: Dict):
+        self._remove(entry["filename"])
+        self._entries[entry["filename"]] = entry
+        bisect.insort(self._order, entry["_key"])
+        self.total_size += entry["size"]
+
+    def _remove(self, filename: str):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        position = bisect.bisect_left(self._order, entry["_key"])
+        if position < len(self._order) and self._order[position] == entry["_key"]:
+            del self._order[position]
+        self.total_size -= entry["size"]
+
+    def _dir_stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Reconcile with the directory, but only if its mtime changed"""
+        with self._lock:
+            mtime = self._dir_stat()
+            if mtime == self._dir_mtime:
+                return
+            self._dir_mtime = mtime
+
+            if mtime is None:
+                self._entries.clear()
+                self._order.clear()
+                self.total_size = 0
+                return
+
+            seen = set()
+            with os.scandir(self.directory) as listing:
+                for item in listing:
+                    if not item.name.endswith(self.extensions) or not item.is_file():
+                        continue
+                    seen.add(item.name)
+                    if item.name not in self._entries:
+                        self._insert(self._stat_entry(item.name, item.stat()))
+
+            for filename in [name for name in self._entries if name not in seen]:
+                self._remove(filename)
+
+            logger.debug("Audio index refreshed: %d files", len(self._entries))
+
+    def add(self, path: str):
+        """Index a file this process just wrote"""
+        filename = os.path.basename(path)
+        if not filename.endswith(self.extensions):
+            return
+        with self._lock:
+            self._insert(self._stat_entry(filename, os.stat(path)))
+            # Our own write changed the directory mtime; no rescan needed for it
+            if self._dir_mtime is not None:
+                self._dir_mtime = self._dir_stat()
+
+    def discard(self, path: str):
+        """Drop a file this process just removed"""
+        with self._lock:
+            self._remove(os.path.basename(path))
+            if self._dir_mtime is not None:
+                self._dir_mtime = self._dir_stat()
+
+    def get(self, filename: str) -> Optional[Dict]:
+        entry = self._entries.get(filename)
+        return self._public(entry) if entry else None
+
+    def page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Newest-first page of files and the cursor for the next page"""
+        self.refresh()
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        with self._lock:
+            end = len(self._order)
+            if cursor:
+                created_ns, filename = decode_cursor(cursor).split(":", 1)
+                end = bisect.bisect_left(self._order, (int(created_ns), filename))
+
+            start = max(0, end - limit)
+            keys = self._order[start:end][::-1]
+            files = [self._public(self._entries[filename]) for _, filename in keys]
+
+        next_cursor = None
+        if start > 0 and keys:
+            created_ns, filename = keys[-1]
+            next_cursor = encode_cursor(f"{created_ns}:{filename}")
+        return files, next_cursor
+
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _public(entry: Dict) -> Dict:
+        return {key: value for key, value in entry.items() if not key.startswith("_")}
+
+
+class SessionIndex:
+    """Per-session chunk summaries, maintained as chunks arrive"""
+
+    def __init__(self, max_sessions: int = SESSION_INDEX_MAX_SESSIONS):
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: Dict[str, Dict] = {}
+        self._order: List[Tuple[int, str]] = []  # (sequence, session_id), ascending
+        self._by_customer: Dict[str, List[Tuple[int, str]]] = {}
+        self._sequence = itertools.count()
+
+    def record_chunk(self, session_id: str, customer_id: str, timestamp: datetime):
+        summary = self._sessions.get(session_id)
+        if summary is None:
+            key = (next(self._sequence), session_id)
+            summary = self._sessions[session_id] = {
+                "session_id": session_id,
+                "chunks_count": 0,
+                "customer_id": customer_id or "unknown",
+                "last_activity": None,
+                "_key": key,
+            }
+            # Sequence numbers only increase, so appending keeps both lists sorted
+            self._order.append(key)
+            self._by_customer.setdefault(summary["customer_id"], []).append(key)
+            # Retention: the oldest sessions leave the listing first
+            while len(self._sessions) > self.max_sessions:
+                self.remove(self._order[0][1])
+
+        summary["chunks_count"] += 1
+        summary["last_activity"] = timestamp.isoformat()
+
+    @staticmethod
+    def _delete(order: List[Tuple[int, str]], key: Tuple[int, str]):
+        position = bisect.bisect_left(order, key)
+        if position < len(order) and order[position] == key:
+            del order[position]
+
+    def remove(self, session_id: str):
+        summary = self._sessions.pop(session_id, None)
+        if summary is None:
+            return
+        self._delete(self._order, summary["_key"])
+        customer_order = self._by_customer.get(summary["customer_id"], [])
+        self._delete(customer_order, summary["_key"])
+        if not customer_order:
+            self._by_customer.pop(summary["customer_id"], None)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        summary = self._sessions.get(session_id)
+        return AudioFileIndex._public(summary) if summary else None
+
+    def page(self, customer_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+             cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Newest-first page of sessions, optionally restricted to one customer"""
+        order = self._order if customer_id is None else self._by_customer.get(customer_id, [])
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        end = len(order)
+        if cursor:
+            # Sessions older than the cursor's; any integer lands inside the list
+            end = bisect.bisect_left(order, (int(decode_cursor(cursor)), ""))
+
+        start = max(0, end - limit)
+        keys = order[start:end][::-1]
+        sessions = [AudioFileIndex._public(self._sessions[session_id]) for _, session_id in keys]
+
+        next_cursor = encode_cursor(str(keys[-1][0])) if start > 0 and keys else None
+        return sessions, next_cursor
+
+    @property
+    def count(self) -> int:
+        return len(self._sessions)
+
+
+# Global index instances
+audio_file_index = AudioFileIndex("audio_files")
+session_index = SessionIndex()
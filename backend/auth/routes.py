@@ -1,12 +1,16 @@
+import hmac
 import logging
-from fastapi import APIRouter, HTTPException, Depends, status
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from auth.models import UserSignup, UserLogin, Token, User
 from supabase_service import supabase_service  # Your Supabase service functions
+from config import ADMIN_EMAILS, ADMIN_API_TOKEN
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 # Dependency to get current user
@@ -21,6 +25,23 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     return user
 
 
+# Dependency for operator-only endpoints: an admin user, or X-Admin-Token for deploy scripts
+async def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    x_admin_token: Optional[str] = Header(None),
+) -> User:
+    if ADMIN_API_TOKEN and x_admin_token and hmac.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        return User(id="admin-token", customer_id="admin-token", name="Admin token",
+                    email="admin-token", role="admin")
+    if credentials is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+
+    current_user = await get_current_user(credentials)
+    if current_user.role != "admin" and current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
 # -------------------
 # Signup Endpoints
 # -------------------
@@ -0,0 +1,157 @@
+"""
+Side-by-side comparison of the two-stage and single-call suggestion pipelines.
+
+For every transcript it runs both paths against the live providers and
+reports, per pipeline:
+- End-to-end latency (mean, p50, p95)
+- Intent accuracy against expected labels, where the case has one
+- Intent agreement between the two pipelines and word overlap of their
+  suggestions
+- Errors (classification failures or fallbacks)
+
+Every pair of answers is written to --output for manual quality review.
+
+Usage (from backend/):
+    python -m benchmarks.compare_pipelines [--cases cases.jsonl] [--from-store 20] [--runs 1]
+
+Cases are JSON lines: {"transcript": "...", "intent": "<expected, optional>"}.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from combined_pipeline import classify_and_suggest
+from intent_classifier import classify_intent_and_giveQuery
+from main_llm import generate_suggestion
+from suggestion_catalogue import normalize_query, similarity
+from tracing import percentile
+from transcript_store import transcript_store
+
+NON_ACTIONABLE_INTENTS = {"irrelevant", "other", "error"}
+
+SAMPLE_CASES = [
+    {"transcript": "Hi, I want to check my account balance please", "intent": "balance_inquiry"},
+    {"transcript": "How do I transfer money to another account?", "intent": "fund_transfer"},
+    {"transcript": "My card is lost, I need to block it immediately", "intent": "card_lost_stolen"},
+    {"transcript": "What's the weather like today?", "intent": "irrelevant"},
+    {"transcript": "I need help with opening a new savings account", "intent": "account_opening"},
+    {"transcript": "Yeah so I saw two payments on my statement that I never made, like yesterday", "intent": "fraud_reporting"},
+    {"transcript": "Um, where's the closest ATM to the mall on main street?", "intent": "atm_nearby"},
+    {"transcript": "I wanted to know what the interest rate is on a one year fixed deposit", "intent": "fd_rd_info"},
+]
+
+
+def load_cases(path: Optional[str], from_store: int) -> List[Dict]:
+    cases = []
+    if path:
+        with open(path, encoding="utf-8") as f:
+            cases.extend(json.loads(line) for line in f if line.strip())
+    if from_store:
+        seen = set()
+        for row in transcript_store.query_suggestions(limit=from_store * 10):
+            if row["session_id"] in seen:
+                continue
+            seen.add(row["session_id"])
+            text = transcript_store.session_text(row["session_id"])
+            if text:
+                cases.append({"transcript": text, "session_id": row["session_id"]})
+            if len(seen) >= from_store:
+                break
+    return cases or SAMPLE_CASES
+
+
+def run_two_stage(transcript: str) -> Dict:
+    started = time.perf_counter()
+    intent, query = classify_intent_and_giveQuery(transcript)
+    suggestion = ""
+    if intent not in NON_ACTIONABLE_INTENTS and query:
+        # Skip the catalogue so both paths pay for generation
+        suggestion = generate_suggestion(intent, query, use_catalogue=False)
+    return {"intent": intent, "query": query, "suggestion": suggestion,
+            "seconds": time.perf_counter() - started}
+
+
+def run_single_call(transcript: str) -> Dict:
+    started = time.perf_counter()
+    intent, query, suggestion = classify_and_suggest(transcript)
+    return {"intent": intent, "query": query, "suggestion": suggestion,
+            "seconds": time.perf_counter() - started}
+
+
+PIPELINES = {"two_stage": run_two_stage, "single_call": run_single_call}
+
+
+def summarize(rows: List[Dict]) -> Dict[str, Dict]:
+    report = {}
+    for name in PIPELINES:
+        latencies = sorted(row[name]["seconds"] for row in rows)
+        labelled = [row for row in rows if row.get("expected_intent")]
+        correct = sum(1 for row in labelled if row[name]["intent"] == row["expected_intent"])
+        report[name] = {
+            "runs": len(rows),
+            "mean_s": round(statistics.mean(latencies), 3),
+            "p50_s": round(percentile(latencies, 50), 3),
+            "p95_s": round(percentile(latencies, 95), 3),
+            "intent_accuracy": round(correct / len(labelled), 3) if labelled else None,
+            "errors": sum(1 for row in rows if row[name]["intent"] == "error"),
+            "mean_suggestion_chars": round(statistics.mean(len(row[name]["suggestion"]) for row in rows), 1),
+        }
+
+    both = [row for row in rows if row["two_stage"]["suggestion"] and row["single_call"]["suggestion"]]
+    report["agreement"] = {
+        "intent": round(sum(1 for row in rows if row["two_stage"]["intent"] == row["single_call"]["intent"]) / len(rows), 3),
+        "suggestion_word_overlap": round(statistics.mean(
+            similarity(normalize_query(row["two_stage"]["suggestion"]), normalize_query(row["single_call"]["suggestion"]))
+            for row in both
+        ), 3) if both else None,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the two-stage and single-call suggestion pipelines")
+    parser.add_argument("--cases", help="JSONL file of {transcript, intent} cases")
+    parser.add_argument("--from-store", type=int, default=0, help="Also replay this many recent stored sessions")
+    parser.add_argument("--runs", type=int, default=1, help="Repeat each case this many times")
+    parser.add_argument("--output", default="pipeline_comparison.jsonl", help="Side-by-side answers for review")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    cases = load_cases(args.cases, args.from_store)
+
+    rows = []
+    for run in range(args.runs):
+        for number, case in enumerate(cases, 1):
+            row = {"case": number, "run": run, "transcript": case["transcript"],
+                   "expected_intent": case.get("intent")}
+            # Alternate the order so neither path always benefits from warm connections
+            order = list(PIPELINES) if (number + run) % 2 else list(reversed(PIPELINES))
+            for name in order:
+                row[name] = PIPELINES[name](case["transcript"])
+            rows.append(row)
+            print(f"[{len(rows)}] two_stage {row['two_stage']['intent']} {row['two_stage']['seconds']:.2f}s | "
+                  f"single_call {row['single_call']['intent']} {row['single_call']['seconds']:.2f}s")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    report = summarize(rows)
+    print()
+    print(f"{'pipeline':<12} {'mean':>7} {'p50':>7} {'p95':>7} {'accuracy':>9} {'errors':>7} {'chars':>7}")
+    for name in PIPELINES:
+        stats = report[name]
+        accuracy = "-" if stats["intent_accuracy"] is None else f"{stats['intent_accuracy']:.0%}"
+        print(f"{name:<12} {stats['mean_s']:>6.2f}s {stats['p50_s']:>6.2f}s {stats['p95_s']:>6.2f}s "
+              f"{accuracy:>9} {stats['errors']:>7} {stats['mean_suggestion_chars']:>7}")
+    print(f"\nIntent agreement: {report['agreement']['intent']:.0%}, "
+          f"suggestion word overlap: {report['agreement']['suggestion_word_overlap']}")
+    print(f"Side-by-side answers written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Cold-start cost: import time per module and time until the server answers.
+
+Import profile: runs `python -X importtime -c "import main"` in a fresh
+interpreter and reports the total, the slowest first-party modules
+(cumulative, i.e. including what they import) and the third-party packages
+with the most self time.
+
+--serve additionally starts uvicorn on main:app and reports how long the
+process takes to answer --path (time to first healthy response) and how long
+the background warm-up (warmup.py) takes to finish after that.
+
+Usage (from backend/):
+    python -m benchmarks.import_time [--module main] [--top 15]
+    python -m benchmarks.import_time --serve [--port 8765] [--path /health]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def is_first_party(module: str) -> bool:
+    top = module.split(".")[0]
+    return os.path.exists(os.path.join(BACKEND_DIR, top + ".py")) or os.path.isdir(os.path.join(BACKEND_DIR, top))
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for every import made by `import module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report_imports(module: str, top: int) -> Dict:
+    rows = import_profile(module)
+    total_us = next(cumulative for name, _, cumulative, _ in rows if name == module)
+    first_party = sorted(((name, cumulative) for name, _, cumulative, _ in rows if is_first_party(name)),
+                         key=lambda row: -row[1])
+    by_package: Counter = Counter()
+    for name, self_us, _, _ in rows:
+        if not is_first_party(name):
+            by_package[name.split(".")[0]] += self_us
+
+    print(f"import {module}: {total_us / 1000:.0f} ms ({len(rows)} modules)\n")
+    print(f"{'first-party module':<32}{'cumulative ms':>14}")
+    for name, cumulative in first_party[:top]:
+        print(f"{name:<32}{cumulative / 1000:>14.1f}")
+    print(f"\n{'third-party package':<32}{'self ms':>14}")
+    for name, self_us in by_package.most_common(top):
+        print(f"{name:<32}{self_us / 1000:>14.1f}")
+
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "first_party_ms": {name: round(cumulative / 1000, 1) for name, cumulative in first_party[:top]},
+        "third_party_self_ms": {name: round(self_us / 1000, 1) for name, self_us in by_package.most_common(top)},
+    }
+
+
+def get_json(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            if response.status == 200:
+                body = response.read()
+                try:
+                    return json.loads(body)
+                except ValueError:
+                    return {}
+    except Exception:
+        return None
+    return None
+
+
+def report_serve(port: int, path: str, timeout: float) -> Dict:
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    result = {"path": path, "first_healthy_seconds": None, "warm_seconds": None, "warm_up": None}
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                sys.exit(f"Server exited with code {server.returncode}")
+            if get_json(base + path) is not None:
+                result["first_healthy_seconds"] = round(time.perf_counter() - started, 3)
+                break
+            time.sleep(0.05)
+        while result["first_healthy_seconds"] is not None and time.perf_counter() - started < timeout:
+            warm = get_json(base + "/metrics/warmup")
+            if warm and warm.get("complete"):
+                result["warm_seconds"] = round(time.perf_counter() - started, 3)
+                result["warm_up"] = warm
+                break
+            time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    print(f"\nFirst healthy response ({path}): {result['first_healthy_seconds']}s after launch")
+    print(f"Background warm-up finished:      {result['warm_seconds']}s after launch")
+    if result["warm_up"]:
+        for name, step in result["warm_up"]["steps"].items():
+            print(f"  {name:<20}{step.get('state'):>8}{step.get('seconds', 0):>8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time per module and time to first healthy response")
+    parser.add_argument("--module", default="main", help="module to profile the import of")
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--serve", action="store_true", help="also start uvicorn and time the first response")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/health", help="endpoint polled until it answers 200")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the server")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {"imports": report_imports(args.module, args.top)}
+    if args.serve:
+        results["serve"] = report_serve(args.port, args.path, args.timeout)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Reproducible benchmark for the live audio -> suggestion pipeline.
+
+Replays the sample WebM recordings through the real live_transcriber code:
+- decode: convert_webm_to_pcm (ffmpeg) on each uploaded chunk
+- framing: audio_stream_generator slicing PCM into 100ms frames
+- triggering: MyTranscriptHandler deciding when to ask for a suggestion
+- classification and retrieval: local stand-ins (keyword intent rules and
+  an in-process BM25 index with the prompt budget applied), with optional
+  simulated provider latency
+
+Amazon Transcribe is replaced by a stand-in input stream that turns every
+N frames of audio into a final transcript event; Claude, Bedrock and Chroma
+are never called. Transcripts go to a temporary store.
+
+Reports throughput (audio seconds per wall second), per-stage latency
+percentiles from the tracer, CPU time (including ffmpeg children) and peak
+memory. --save-baseline writes the headline numbers to a JSON file and
+--check compares a run against it, exiting non-zero on a regression beyond
+--tolerance. No baseline is shipped: record one on the machine you compare on.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline_bench [files...] [--repeat 3] [--concurrency 2]
+    python -m benchmarks.pipeline_bench --save-baseline benchmarks/pipeline_baseline.json
+    python -m benchmarks.pipeline_bench --check benchmarks/pipeline_baseline.json
+"""
+
+import os
+import sys
+import tempfile
+
+# Keep benchmark transcripts out of the real store; must precede the imports below
+_tmpdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+os.environ.setdefault("TRANSCRIPT_DB_PATH", os.path.join(_tmpdir, "transcripts.db"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_LEVELS", "live_transcriber=ERROR")  # undecodable chunks are counted instead
+
+import argparse
+import asyncio
+import glob
+import json
+import resource
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+import live_transcriber
+from config import RETRIEVAL_K, RAG_CONTEXT_TOKENS
+from kb_ingest import infer_intent, iter_file_documents, iter_source_files
+from langchain_core.documents import Document
+from lexical_index import BM25Index
+from logging_config import setup_logging
+from prompt_budget import compress_context
+from tracing import tracer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+DEFAULT_SOURCES = [os.path.join(REPO_DIR, "audio_files"), os.path.join(BACKEND_DIR, "audio_files")]
+
+FRAME_SECONDS = live_transcriber.PCM_FRAME_SIZE / (16000 * 2)
+
+# Spoken-style utterances fed back as "final transcripts", in rotation
+UTTERANCES = [
+    "Hi, thanks for calling. How can I help you today?",
+    "Yeah I think I lost my debit card at the mall yesterday.",
+    "Can you block it so nobody can use it?",
+    "Also what is my current account balance?",
+    "And is there an ATM near the central station?",
+    "I saw a payment on my statement that I never made.",
+    "How much are the charges for a replacement card?",
+    "Okay great, thank you so much.",
+]
+
+# Stand-in knowledge base when --kb is not given
+SAMPLE_KB = [
+    "Q: How do I block a lost or stolen card?\nA: Open the Bank-AI app, select Cards, choose the card and click Block Card.",
+    "Q: How do I check my balance?\nA: In the app, select Accounts to see the available balance and a mini statement.",
+    "Q: Where is the nearest ATM?\nA: Use the ATM & Branch Locator on the website or app and enter your PIN code.",
+    "Q: How do I report an unauthorized transaction?\nA: Block the card, then go to Help > Report Fraud and select the transaction.",
+    "Q: What does a replacement card cost?\nA: A replacement debit card costs 200 plus tax and is delivered in 7 working days.",
+    "Q: How do I transfer money?\nA: Select Transfers, add the beneficiary, enter the amount and confirm with the OTP.",
+]
+
+STAGES = ("decode", "classify", "retrieve", "generate", "broadcast", "time_to_suggestion")
+
+# Higher is better for these; lower is better for everything else compared
+HIGHER_IS_BETTER = {"realtime_factor", "chunks_per_second"}
+
+
+class StandInInputStream:
+    """Takes the place of Transcribe's input stream; emits a final transcript every N frames"""
+
+    def __init__(self, handler, frames_per_utterance: int, offset: int, speed: float = 0.0):
+        self.handler = handler
+        self.frames_per_utterance = frames_per_utterance
+        self.frame_interval = FRAME_SECONDS / speed if speed else 0.0
+        self.frames = 0
+        self.utterance = offset
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.consumer = asyncio.create_task(self._consume())
+
+    async def send_audio_event(self, audio_chunk: bytes):
+        self.frames += 1
+        if self.frame_interval:
+            await asyncio.sleep(self.frame_interval)
+        if self.frames % self.frames_per_utterance == 0:
+            text = UTTERANCES[self.utterance % len(UTTERANCES)]
+            self.utterance += 1
+            self.events.put_nowait(final_transcript_event(text))
+
+    async def end_stream(self):
+        self.events.put_nowait(None)
+
+    async def _consume(self):
+        # Events are handled in order, concurrently with framing, like handle_events()
+        while True:
+            event = await self.events.get()
+            if event is None:
+                return
+            await self.handler.handle_transcript_event(event)
+
+
+def final_transcript_event(text: str):
+    alternative = SimpleNamespace(transcript=text)
+    result = SimpleNamespace(is_partial=False, alternatives=[alternative])
+    return SimpleNamespace(transcript=SimpleNamespace(results=[result]))
+
+
+def load_corpus(kb_paths: List[str]) -> BM25Index:
+    if kb_paths:
+        documents = [doc for path in iter_source_files(kb_paths) for doc in iter_file_documents(path)]
+    else:
+        documents = [Document(page_content=text, metadata={"intent": infer_intent(text)}) for text in SAMPLE_KB]
+    return BM25Index(documents)
+
+
+def install_standins(corpus: BM25Index, classify_latency: float, generate_latency: float, decode_stats: Dict):
+    """Replace remote calls in live_transcriber with local equivalents"""
+
+    async def classify(full_transcript: str, session_id: str = None):
+        with tracer.span(session_id, "classify"):
+            if classify_latency:
+                await asyncio.sleep(classify_latency)
+            intent = infer_intent(full_transcript)
+        return (intent if intent != "bank_related" else "other"), full_transcript[-300:]
+
+    def generate(intent: str, query: str, session_id: str = None, use_catalogue: bool = True):
+        with tracer.span(session_id, "retrieve"):
+            docs = [doc for doc, _ in corpus.search(query, RETRIEVAL_K, intent)]
+            if not docs:
+                docs = [doc for doc, _ in corpus.search(query, RETRIEVAL_K)]
+            docs = compress_context(query, docs, RAG_CONTEXT_TOKENS)
+        with tracer.span(session_id, "generate"):
+            if generate_latency:
+                time.sleep(generate_latency)
+        return docs[0].page_content if docs else "No suggestion"
+
+    def single_call(full_transcript: str, session_id: str = None):
+        intent, query = asyncio.run(classify(full_transcript, session_id))
+        return intent, query, generate(intent, query, session_id)
+
+    original_decode = live_transcriber.convert_webm_to_pcm
+
+    async def decode(webm_bytes: bytes) -> bytes:
+        pcm = await original_decode(webm_bytes)
+        decode_stats["chunks"] += 1
+        decode_stats["pcm_bytes"] += len(pcm)
+        if not pcm:
+            decode_stats["failures"] += 1
+        return pcm
+
+    live_transcriber.aclassify_intent_and_giveQuery = classify
+    live_transcriber.generate_suggestion = generate
+    live_transcriber.classify_and_suggest = single_call
+    live_transcriber.convert_webm_to_pcm = decode
+
+
+def split_chunks(data: bytes, chunk_bytes: int) -> List[bytes]:
+    if chunk_bytes <= 0:
+        return [data]
+    return [data[start:start + chunk_bytes] for start in range(0, len(data), chunk_bytes)]
+
+
+async def replay(path: str, run: int, args, totals: Dict):
+    session_id = f"bench-{run}-{os.path.basename(path)}"
+    with open(path, "rb") as f:
+        data = f.read()
+
+    async def broadcast(suggestion: str):
+        totals["suggestions"] += 1
+
+    handler = live_transcriber.MyTranscriptHandler(None, session_id, broadcast)
+    stream = StandInInputStream(handler, args.frames_per_utterance, offset=run, speed=args.speed)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    chunks = split_chunks(data, args.chunk_bytes)
+    for chunk in chunks:
+        queue.put_nowait(chunk)
+    queue.put_nowait(None)
+
+    await live_transcriber.audio_stream_generator(queue, stream, session_id)
+    await stream.consumer
+    await handler.try_generate_suggestion()
+    await handler.close()
+    tracer.end_session(session_id)
+
+    totals["chunks"] += len(chunks)
+    totals["frames"] += stream.frames
+    totals["bytes"] += len(data)
+
+
+async def run_benchmark(files: List[str], args) -> Dict:
+    decode_stats = {"chunks": 0, "pcm_bytes": 0, "failures": 0}
+    install_standins(load_corpus(args.kb), args.classify_latency, args.generate_latency, decode_stats)
+    totals = {"chunks": 0, "frames": 0, "bytes": 0, "suggestions": 0}
+
+    jobs = [(path, run) for run in range(args.repeat) for path in files]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def guarded(path: str, run: int):
+        async with semaphore:
+            await replay(path, run, args, totals)
+
+    usage_before = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+    started = time.perf_counter()
+    await asyncio.gather(*(guarded(path, run) for path, run in jobs))
+    wall = time.perf_counter() - started
+    usage_after = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+
+    def cpu(before, after):
+        return (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    audio_seconds = decode_stats["pcm_bytes"] / (16000 * 2)
+    process_cpu = cpu(usage_before[0], usage_after[0])
+    ffmpeg_cpu = cpu(usage_before[1], usage_after[1])
+    stage_summary = tracer.summary()["stages"]
+
+    return {
+        "recordings": len(jobs),
+        "wall_seconds": round(wall, 3),
+        "audio_seconds": round(audio_seconds, 1),
+        "realtime_factor": round(audio_seconds / wall, 1) if wall else 0.0,
+        "chunks_per_second": round(totals["chunks"] / wall, 1) if wall else 0.0,
+        "frames": totals["frames"],
+        "suggestions": totals["suggestions"],
+        "decode_failures": decode_stats["failures"],
+        "cpu_seconds": {"process": round(process_cpu, 3), "ffmpeg": round(ffmpeg_cpu, 3)},
+        "cpu_per_audio_second": round((process_cpu + ffmpeg_cpu) / audio_seconds, 5) if audio_seconds else None,
+        "peak_rss_mb": round(usage_after[0].ru_maxrss / 1024, 1),  # Linux reports KiB
+        "stages": {stage: stage_summary[stage] for stage in STAGES if stage in stage_summary},
+    }
+
+
+def headline(report: Dict) -> Dict[str, float]:
+    """Numbers compared against the baseline"""
+    numbers = {
+        "realtime_factor": report["realtime_factor"],
+        "chunks_per_second": report["chunks_per_second"],
+        "cpu_per_audio_second": report["cpu_per_audio_second"],
+        "peak_rss_mb": report["peak_rss_mb"],
+    }
+    for stage, stats in report["stages"].items():
+        if stats["count"]:
+            numbers[f"{stage}_p95"] = stats["p95"]
+    return numbers
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, base in baseline.items():
+        value = current.get(name)
+        if value is None or not base:
+            continue
+        change = (value - base) / base
+        if name in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {base} -> {value} ({change:+.0%} worse)")
+    return regressions
+
+
+def print_report(report: Dict):
+    print(f"Replayed {report['recordings']} recordings ({report['audio_seconds']}s of audio) "
+          f"in {report['wall_seconds']}s: x{report['realtime_factor']} realtime, "
+          f"{report['chunks_per_second']} chunks/s, {report['suggestions']} suggestions, "
+          f"{report['decode_failures']} undecodable chunks")
+    print(f"CPU: {report['cpu_seconds']['process']}s process + {report['cpu_seconds']['ffmpeg']}s ffmpeg "
+          f"({report['cpu_per_audio_second']} CPU-s per audio second), peak RSS {report['peak_rss_mb']} MB")
+    print()
+    print(f"{'stage':<20} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<20} {stats['count']:>6} {stats['mean'] * 1000:>7.1f}ms {stats['p50'] * 1000:>7.1f}ms "
+              f"{stats['p95'] * 1000:>7.1f}ms {stats['p99'] * 1000:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the live audio to suggestion pipeline")
+    parser.add_argument("files", nargs="*", help="WebM recordings (default: audio_files/ and backend/audio_files/)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every recording this many times")
+    parser.add_argument("--concurrency", type=int, default=1, help="Sessions replayed at the same time")
+    parser.add_argument("--chunk-bytes", type=int, default=0,
+                        help="Split recordings into upload chunks of this size (0 = one chunk per recording); "
+                             "chunks after the first lack a WebM header, as with uploads that are not self-contained")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Pace audio at this multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--frames-per-utterance", type=int, default=30, help="Audio frames (100ms) per transcript event")
+    parser.add_argument("--classify-latency", type=float, default=0.0, help="Simulated classification latency (s)")
+    parser.add_argument("--generate-latency", type=float, default=0.0, help="Simulated generation latency (s)")
+    parser.add_argument("--kb", nargs="*", default=[], help="Knowledge-base sources for the BM25 stand-in")
+    parser.add_argument("--json", help="Write the full report to this file")
+    parser.add_argument("--save-baseline", help="Write headline numbers to this baseline file")
+    parser.add_argument("--check", help="Compare against this baseline file; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default 25%%)")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    files = args.files or sorted(
+        path for directory in DEFAULT_SOURCES for path in glob.glob(os.path.join(directory, "*.webm"))
+    )
+    if not files:
+        parser.error("no recordings found")
+
+    report = asyncio.run(run_benchmark(files, args))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    numbers = headline(report)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": len(files),
+                       "repeat": args.repeat, "concurrency": args.concurrency, "metrics": numbers}, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(numbers, baseline["metrics"], args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.check}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Memory per record: the old per-chunk/per-connection dicts versus records.py.
+
+For each record kind, builds --count instances of the dict layout the code
+used before and of the __slots__ record that replaced it, and measures the
+heap each set allocates with tracemalloc. Audio payloads and strings shared
+by every record (customer id, role, file path) are created up front, so the
+figures are the per-record overhead only: the container, its timestamp and
+any per-record integers.
+
+Usage (from backend/):
+    python -m benchmarks.record_memory [--count 10000] [--json results.json]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from records import ChunkRecord, ConnectionRecord, UploadRecord
+
+PAYLOAD = b"\x1a\x45\xdf\xa3" * 1024  # one shared 4 KB "chunk"
+
+
+def measure(build: Callable[[int], object], count: int) -> float:
+    """Bytes allocated per record while building `count` records"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the records is not part of their cost
+    list_bytes = records.__sizeof__()
+    del records
+    return (after - before - list_bytes) / count
+
+
+def chunk_dict(i: int) -> Dict:
+    return {"index": i + 1000, "data": PAYLOAD, "timestamp": datetime.utcnow(), "size": len(PAYLOAD),
+            "customer_id": "CUST-0001"}
+
+
+def chunk_record(i: int) -> ChunkRecord:
+    return ChunkRecord(i + 1000, PAYLOAD, time.monotonic_ns())
+
+
+def connection_dict(i: int) -> Dict:
+    return {"user_id": "user-1", "username": "agent@bank.example", "role": "agent", "connected_at": datetime.utcnow()}
+
+
+def connection_record(i: int) -> ConnectionRecord:
+    return ConnectionRecord("agent@bank.example", "agent", user_id="user-1")
+
+
+def upload_dict(i: int) -> Dict:
+    return {"audio_id": "s_CUST-0001_1", "filename": "call.webm", "file_path": "uploads/s_CUST-0001_1.webm",
+            "uploaded_by": "CUST-0001", "user_email": "c@bank.example", "role": "customer",
+            "size_bytes": i + 100000, "uploaded_at": datetime.utcnow()}
+
+
+def upload_record(i: int) -> UploadRecord:
+    return UploadRecord("s_CUST-0001_1", "call.webm", "uploads/s_CUST-0001_1.webm", "CUST-0001", "customer",
+                        i + 100000, user_email="c@bank.example")
+
+
+KINDS = {
+    "chunk": (chunk_dict, chunk_record),
+    "connection": (connection_dict, connection_record),
+    "upload": (upload_dict, upload_record),
+}
+
+
+def run(count: int) -> List[Dict]:
+    results = []
+    for kind, (as_dict, as_record) in KINDS.items():
+        dict_bytes = measure(as_dict, count)
+        record_bytes = measure(as_record, count)
+        results.append({
+            "kind": kind,
+            "dict_bytes": round(dict_bytes, 1),
+            "record_bytes": round(record_bytes, 1),
+            "saved_bytes": round(dict_bytes - record_bytes, 1),
+            "saved_percent": round(100 * (1 - record_bytes / dict_bytes), 1) if dict_bytes else 0.0,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-record memory of dicts vs __slots__ records")
+    parser.add_argument("--count", type=int, default=10000, help="records built per layout")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.count)
+    print(f"{'record':<12}{'dict B':>10}{'slots B':>10}{'saved B':>10}{'saved %':>10}")
+    for row in results:
+        print(f"{row['kind']:<12}{row['dict_bytes']:>10}{row['record_bytes']:>10}"
+              f"{row['saved_bytes']:>10}{row['saved_percent']:>10}")
+    chunk = next(row for row in results if row["kind"] == "chunk")
+    # The customer's MediaRecorder uploads one chunk per second
+    print(f"\nA one-hour call keeps 3600 chunks: {chunk['saved_bytes'] * 3600 / 1024:.0f} KB less metadata")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"count": args.count, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""
+Load generator and soak test for the signaling and suggestion WebSockets.
+
+Starts the FastAPI app from main.py under uvicorn in a child process, with
+Supabase token verification replaced by a local stand-in: a token such as
+"agent-12" or "customer-12" is accepted as that user, so no auth backend
+is needed. The parent process then drives it:
+- signaling: N agent/customer pairs on /ws/signaling/{token}. Each customer
+  sends offers at --rate; the paired agent answers, and both sides follow
+  up with --ice ICE candidates
+- suggestions: --listeners clients on /ws/suggestions, with a suggestion
+  broadcast through main.broadcast_suggestion every --broadcast-every seconds
+
+Every message carries its send time, so receivers record one-way delivery
+latency. Note that forward_message sends each agent message to every
+customer (and vice versa), so each offer is delivered N times and total
+traffic grows with the square of the pair count; "fan-out" in the report
+is delivered / sent.
+
+Every --interval seconds a window line reports delivery latency
+percentiles, offer->answer round trips, server RSS and event-loop lag (from
+a sampler inside the server process), plus the load generator's own loop
+lag: when that is high the client, not the server, is the bottleneck.
+Memory per connection is the server's RSS growth while peers connect,
+divided by the number of connections; RSS drift across a soak shows leaks.
+
+Usage (from backend/):
+    python -m benchmarks.signaling_load --pairs 200 --duration 60
+    python -m benchmarks.signaling_load --pairs 2000 --rate 0.05 --ramp 30 --duration 3600 --output soak.json
+"""
+
+import os
+import tempfile
+
+# Keep the server quiet and its transcripts out of the real store; inherited by the server process
+os.environ.setdefault("TRANSCRIPT_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="signaling-load-"), "transcripts.db"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+LAG_SAMPLE_SECONDS = 0.05
+RESERVOIR_SIZE = 100_000  # latency samples kept for the whole-run percentiles
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max in milliseconds"""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def current_rss_bytes() -> int:
+    """Resident set size now (falls back to the peak where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LagSampler:
+    """Measures how late a periodic sleep wakes up on the running event loop"""
+
+    def __init__(self, interval: float = LAG_SAMPLE_SECONDS):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def drain(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+# ==========================================
+#  SERVER PROCESS
+# ==========================================
+
+def run_server(host: str, port: int):
+    """Serve main.app with the auth stand-in and benchmark-only routes"""
+    os.environ.setdefault("SUPABASE_URL", "https://signaling-load.supabase.co")
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", "signaling-load")
+
+    import uvicorn
+    import main
+    from auth.models import User
+
+    async def verify_token(token: str) -> Optional[User]:
+        role, _, number = token.partition("-")
+        if role not in ("agent", "customer") or not number:
+            return None
+        return User(id=token, customer_id=token, name=token, email=f"{token}@load.test", role=role)
+
+    main.supabase_service.verify_token = verify_token
+    lag = LagSampler()
+
+    async def stats():
+        return {
+            "rss_bytes": current_rss_bytes(),
+            "signaling_connections": len(main.active_connections),
+            "suggestion_connections": len(main.suggestion_connections),
+            "loop_lag": distribution(lag.drain()),
+        }
+
+    async def broadcast():
+        await main.broadcast_suggestion(json.dumps({"bench_sent_at": time.time()}))
+        return {"listeners": len(main.suggestion_connections)}
+
+    main.app.add_api_route("/bench/stats", stats, methods=["GET"])
+    main.app.add_api_route("/bench/broadcast", broadcast, methods=["POST"])
+
+    async def serve():
+        lag.start()
+        config = uvicorn.Config(main.app, host=host, port=port, log_level="warning",
+                                ws_ping_interval=None, backlog=4096)
+        await uvicorn.Server(config).serve()
+
+    asyncio.run(serve())
+
+
+async def wait_for_server(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/bench/stats")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+# ==========================================
+#  SIMULATED PEERS
+# ==========================================
+
+class Reservoir:
+    """Uniform sample of an unbounded stream, so long soaks keep bounded memory"""
+
+    def __init__(self, size: int = RESERVOIR_SIZE):
+        self.size = size
+        self.seen = 0
+        self.values: List[float] = []
+
+    def extend(self, values: List[float]):
+        for value in values:
+            self.seen += 1
+            if len(self.values) < self.size:
+                self.values.append(value)
+            else:
+                slot = random.randrange(self.seen)
+                if slot < self.size:
+                    self.values[slot] = value
+
+
+class LoadStats:
+    """Counters and latency samples, reset at every report window"""
+
+    def __init__(self):
+        self.totals = {"sent": 0, "delivered": 0, "negotiations": 0, "answered": 0,
+                       "suggestions": 0, "connect_failures": 0, "disconnects": 0}
+        self.window_counts: Dict[str, int] = {}
+        self.delivery: List[float] = []
+        self.round_trip: List[float] = []
+        self.suggestion: List[float] = []
+        self.all_delivery = Reservoir()
+        self.all_round_trip = Reservoir()
+        self.all_suggestion = Reservoir()
+
+    def count(self, key: str, amount: int = 1):
+        self.totals[key] += amount
+        self.window_counts[key] = self.window_counts.get(key, 0) + amount
+
+    def take_window(self) -> Dict:
+        window = {
+            "counts": self.window_counts,
+            "delivery": distribution(self.delivery),
+            "offer_answer": distribution(self.round_trip),
+            "suggestion": distribution(self.suggestion),
+        }
+        self.all_delivery.extend(self.delivery)
+        self.all_round_trip.extend(self.round_trip)
+        self.all_suggestion.extend(self.suggestion)
+        self.window_counts, self.delivery, self.round_trip, self.suggestion = {}, [], [], []
+        return window
+
+
+class SignalingPeer:
+    """One side of an agent/customer pair on /ws/signaling/{token}"""
+
+    def __init__(self, url: str, role: str, pair: int, stats: LoadStats, ice_candidates: int):
+        self.url = f"{url}/ws/signaling/{role}-{pair}"
+        self.role = role
+        self.pair = pair
+        self.stats = stats
+        self.ice_candidates = ice_candidates
+        self.ws = None
+        self.pending_offers: Dict[int, float] = {}
+        self._sequence = 0
+
+    async def open(self) -> bool:
+        try:
+            self.ws = await connect(self.url, ping_interval=None, max_queue=None)
+            return True
+        except Exception:
+            self.stats.count("connect_failures")
+            return False
+
+    async def send(self, message: Dict):
+        message.update({"pair": self.pair, "sent_at": time.time()})
+        await self.ws.send(json.dumps(message))
+        self.stats.count("sent")
+
+    async def send_ice(self):
+        for index in range(self.ice_candidates):
+            await self.send({"type": "ice-candidate",
+                             "candidate": {"candidate": f"candidate:{index} 1 udp 2122260223 10.0.0.{self.pair % 250} 5{index:04d} typ host",
+                                           "sdpMid": "0", "sdpMLineIndex": 0}})
+
+    async def negotiate(self):
+        """Customer side: send an offer and remember when, for the round trip"""
+        self._sequence += 1
+        self.pending_offers[self._sequence] = time.perf_counter()
+        self.stats.count("negotiations")
+        await self.send({"type": "offer", "offer_id": self._sequence,
+                         "sdp": {"type": "offer", "sdp": "v=0\r\n" + "a=load-test\r\n" * 20}})
+        await self.send_ice()
+
+    async def receive_loop(self):
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                self.stats.count("delivered")
+                if "sent_at" in message:
+                    self.stats.delivery.append(max(0.0, time.time() - message["sent_at"]))
+                if message.get("pair") != self.pair:
+                    continue
+                kind = message.get("type")
+                if kind == "offer" and self.role == "agent":
+                    await self.send({"type": "answer", "offer_id": message.get("offer_id"),
+                                     "sdp": {"type": "answer", "sdp": "v=0\r\n" + "a=load-test\r\n" * 20}})
+                    await self.send_ice()
+                elif kind == "answer" and self.role == "customer":
+                    started = self.pending_offers.pop(message.get("offer_id"), None)
+                    if started is not None:
+                        self.stats.round_trip.append(time.perf_counter() - started)
+                        self.stats.count("answered")
+        except ConnectionClosed:
+            self.stats.count("disconnects")
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+
+async def open_listener(url: str, stats: LoadStats):
+    try:
+        return await connect(f"{url}/ws/suggestions", ping_interval=None, max_queue=None)
+    except Exception:
+        stats.count("connect_failures")
+        return None
+
+
+async def listen_for_suggestions(ws, stats: LoadStats):
+    try:
+        async for raw in ws:
+            stats.count("suggestions")
+            try:
+                sent_at = json.loads(json.loads(raw)["suggestion"])["bench_sent_at"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            stats.suggestion.append(max(0.0, time.time() - sent_at))
+    except ConnectionClosed:
+        stats.count("disconnects")
+
+
+async def customer_traffic(peer: SignalingPeer, rate: float, stop: asyncio.Event):
+    """Offers at `rate` per second with jitter, so pairs don't fire in lockstep"""
+    if rate <= 0:
+        return
+    await asyncio.sleep(random.uniform(0, 1 / rate))
+    while not stop.is_set():
+        try:
+            await peer.negotiate()
+        except ConnectionClosed:
+            return
+        await asyncio.sleep(random.expovariate(rate))
+
+
+async def broadcaster(client: httpx.AsyncClient, every: float, stop: asyncio.Event):
+    while not stop.is_set():
+        await asyncio.sleep(every)
+        try:
+            await client.post("/bench/broadcast")
+        except httpx.HTTPError:
+            pass
+
+
+# ==========================================
+#  RUN
+# ==========================================
+
+async def run_load(args) -> Dict:
+    base = f"http://{args.host}:{args.port}"
+    ws_url = f"ws://{args.host}:{args.port}"
+    stats = LoadStats()
+    client_lag = LagSampler()
+    client_lag.start()
+    stop = asyncio.Event()
+    tasks: List[asyncio.Task] = []
+    peers: List[SignalingPeer] = []
+    listeners: List = []
+    report = {"config": vars(args), "windows": []}
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0) as client:
+        await wait_for_server(client)
+        await asyncio.sleep(1.0)
+        baseline = (await client.get("/bench/stats")).json()
+
+        # Ramp up connections in batches spread over --ramp seconds
+        ramp_started = time.perf_counter()
+        batches = max(1, int(args.ramp / 0.25)) if args.ramp > 0 else 1
+        batch_size = max(1, -(-args.pairs // batches))
+        for start in range(0, args.pairs, batch_size):
+            batch = []
+            for pair in range(start, min(args.pairs, start + batch_size)):
+                batch += [SignalingPeer(ws_url, "agent", pair, stats, args.ice),
+                          SignalingPeer(ws_url, "customer", pair, stats, args.ice)]
+            opened = await asyncio.gather(*(peer.open() for peer in batch))
+            for peer, ok in zip(batch, opened):
+                if ok:
+                    peers.append(peer)
+                    tasks.append(asyncio.create_task(peer.receive_loop()))
+            if args.ramp > 0:
+                await asyncio.sleep(0.25)
+
+        for start in range(0, args.listeners, batch_size):
+            opened = await asyncio.gather(*(open_listener(ws_url, stats)
+                                            for _ in range(start, min(args.listeners, start + batch_size))))
+            for ws in filter(None, opened):
+                listeners.append(ws)
+                tasks.append(asyncio.create_task(listen_for_suggestions(ws, stats)))
+
+        # Let connection setup settle before attributing memory to it
+        await asyncio.sleep(1.0)
+        connected = (await client.get("/bench/stats")).json()
+        connections = connected["signaling_connections"] + connected["suggestion_connections"]
+        report["connections"] = {
+            "signaling": connected["signaling_connections"],
+            "suggestions": connected["suggestion_connections"],
+            "connect_failures": stats.totals["connect_failures"],
+            "ramp_seconds": round(time.perf_counter() - ramp_started, 2),
+            "server_rss_before_mb": round(baseline["rss_bytes"] / 2**20, 1),
+            "server_rss_connected_mb": round(connected["rss_bytes"] / 2**20, 1),
+            "rss_per_connection_kb": (
+                round((connected["rss_bytes"] - baseline["rss_bytes"]) / connections / 1024, 1) if connections else None
+            ),
+        }
+        print(json.dumps(report["connections"]))
+        stats.take_window()
+
+        # Soak
+        for peer in peers:
+            if peer.role == "customer":
+                tasks.append(asyncio.create_task(customer_traffic(peer, args.rate, stop)))
+        if args.broadcast_every > 0 and args.listeners:
+            tasks.append(asyncio.create_task(broadcaster(client, args.broadcast_every, stop)))
+
+        soak_started = time.perf_counter()
+        while time.perf_counter() - soak_started < args.duration:
+            await asyncio.sleep(min(args.interval, args.duration - (time.perf_counter() - soak_started)))
+            server = (await client.get("/bench/stats")).json()
+            window = stats.take_window()
+            window.update({
+                "elapsed_s": round(time.perf_counter() - soak_started, 1),
+                "server_rss_mb": round(server["rss_bytes"] / 2**20, 1),
+                "server_loop_lag": server["loop_lag"],
+                "client_loop_lag": distribution(client_lag.drain()),
+                "signaling_connections": server["signaling_connections"],
+            })
+            report["windows"].append(window)
+            print_window(window)
+
+        stop.set()
+        await asyncio.sleep(0.5)  # let in-flight answers arrive
+        soak_seconds = time.perf_counter() - soak_started
+        stats.take_window()
+        final = (await client.get("/bench/stats")).json()
+
+        for peer in peers:
+            await peer.close()
+        for ws in listeners:
+            await ws.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    windows = report["windows"]
+    report["summary"] = {
+        "totals": stats.totals,
+        "fan_out": round(stats.totals["delivered"] / stats.totals["sent"], 1) if stats.totals["sent"] else 0.0,
+        "delivered_per_second": round(stats.totals["delivered"] / soak_seconds, 1),
+        "delivery": distribution(stats.all_delivery.values),
+        "offer_answer": distribution(stats.all_round_trip.values),
+        "suggestion": distribution(stats.all_suggestion.values),
+        "server_loop_lag_max_ms": max((w["server_loop_lag"]["max_ms"] for w in windows), default=0.0),
+        "server_rss_final_mb": round(final["rss_bytes"] / 2**20, 1),
+        # Growth across the soak with connection count unchanged points at a leak
+        "server_rss_drift_mb": round(windows[-1]["server_rss_mb"] - windows[0]["server_rss_mb"], 1) if windows else 0.0,
+    }
+    return report
+
+
+def print_window(window: Dict):
+    counts = window["counts"]
+    print(
+        f"[{window['elapsed_s']:>7.1f}s] conns={window['signaling_connections']} "
+        f"sent={counts.get('sent', 0)} delivered={counts.get('delivered', 0)} "
+        f"delivery p50/p99={window['delivery']['p50_ms']}/{window['delivery']['p99_ms']}ms "
+        f"offer->answer p95={window['offer_answer']['p95_ms']}ms "
+        f"suggestion p95={window['suggestion']['p95_ms']}ms "
+        f"rss={window['server_rss_mb']}MB "
+        f"server lag p95/max={window['server_loop_lag']['p95_ms']}/{window['server_loop_lag']['max_ms']}ms "
+        f"client lag max={window['client_loop_lag']['max_ms']}ms"
+    )
+
+
+def raise_file_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        if target < needed:
+            print(f"Warning: open file limit {target} is below the {needed} sockets this run needs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and soak test for /ws/signaling and /ws/suggestions")
+    parser.add_argument("--pairs", type=int, default=100, help="Agent/customer pairs on /ws/signaling")
+    parser.add_argument("--listeners", type=int, default=None, help="Clients on /ws/suggestions (default: one per pair)")
+    parser.add_argument("--rate", type=float, default=0.2, help="Offers per second per customer")
+    parser.add_argument("--ice", type=int, default=3, help="ICE candidates sent after each offer and answer")
+    parser.add_argument("--broadcast-every", type=float, default=1.0, help="Seconds between suggestion broadcasts (0 disables)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which to open connections")
+    parser.add_argument("--duration", type=float, default=30.0, help="Soak duration in seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between window reports")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write the full report (all windows) as JSON")
+    args = parser.parse_args()
+    if args.listeners is None:
+        args.listeners = args.pairs
+
+    # Both ends of every socket live on this machine
+    raise_file_limit(2 * (2 * args.pairs + args.listeners) + 256)
+
+    server = multiprocessing.get_context("spawn").Process(target=run_server, args=(args.host, args.port), daemon=True)
+    server.start()
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        server.terminate()
+        server.join(timeout=10)
+
+    print(json.dumps(report["summary"], indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Single-call suggestion pipeline.
+
+The default two-stage path makes two sequential model round trips: Claude
+classifies the transcript and cleans up the query, then Mistral answers it
+over the retrieved context. With PIPELINE_MODE=single_call:
+- Retrieval runs directly on the tail of the raw transcript (BM25/vector,
+  no intent partition, since the intent is not known yet)
+- One Claude call with structured output returns the intent, the cleaned
+  query and the suggestion together
+
+benchmarks/compare_pipelines.py compares both paths side by side.
+"""
+
+import logging
+import time
+from typing import Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+from config import (SINGLE_CALL_WINDOW_CHARS, SINGLE_CALL_MODEL, GENERATE_DEADLINE_SECONDS,
+                    CLASSIFY_TRANSCRIPT_TOKENS, RAG_CONTEXT_TOKENS)
+from intent_classifier import INTENTS, keyword_fallback
+from llm_clients import get_chat_anthropic, invoke_chat, shared_client, usage_of
+from prompt_budget import trim_transcript, compress_context, estimate_tokens, cached_system, prompt_stats
+from main_llm import ANSWER_GUIDELINES, retrieve_documents, fallback_suggestion, remember_answer
+from resilience import resilient_call
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+NON_ACTIONABLE_INTENTS = {"irrelevant", "other", "error"}
+
+
+class CombinedSuggestion(BaseModel):
+    """Intent, cleaned query and agent suggestion for one transcript window"""
+
+    intent: str = Field(description="Exactly one intent from the valid intent list")
+    cleaned_query: str = Field(description="The customer's banking request as one clean, professional question, or an empty string if there is none")
+    suggestion: str = Field(description="The answer for the agent, following the style rules; empty if the intent is irrelevant")
+
+
+# Static instructions, sent as a cached system prefix
+SYSTEM_PROMPT = f"""You are an assistant for customer service agents at a fictional bank called Bank-AI.
+
+From the customer transcript you are given:
+1. Identify the customer's intent from this list: {", ".join(INTENTS)}
+   Use "irrelevant" if there is no banking-related content.
+2. Rewrite the banking-related part into a single clean, professional query.
+3. Write the suggestion the agent should give, using the retrieved context:
+{ANSWER_GUIDELINES}"""
+
+SYSTEM_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+USER_PROMPT = """Retrieved context:
+{context}
+
+--- Customer Transcript ---
+{transcript}
+---------------------------
+"""
+
+
+@shared_client
+def get_structured_llm():
+    # max_tokens covers classification + a 512-token answer
+    llm = get_chat_anthropic(SINGLE_CALL_MODEL, 0.1, 700, GENERATE_DEADLINE_SECONDS)
+    return llm.with_structured_output(CombinedSuggestion, include_raw=True)
+
+
+def invoke_structured(messages) -> dict:
+    output = invoke_chat(get_structured_llm(), messages, model=SINGLE_CALL_MODEL)
+    if output["parsed"] is None:
+        raise ValueError(f"Unparseable structured output: {output['parsing_error']}")
+    return output
+
+
+def classify_and_suggest(full_transcript: str, session_id: str = None) -> Tuple[str, str, str]:
+    """Return (intent, cleaned_query, suggestion) from one model call"""
+    window = full_transcript[-SINGLE_CALL_WINDOW_CHARS:]
+
+    try:
+        with tracer.span(session_id, "retrieve"):
+            docs = retrieve_documents(window)
+
+        original = USER_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs) or "(none)",
+            transcript=full_transcript,
+        )
+        docs = compress_context(window, docs, RAG_CONTEXT_TOKENS)
+        user_prompt = USER_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs) or "(none)",
+            transcript=trim_transcript(full_transcript, CLASSIFY_TRANSCRIPT_TOKENS),
+        )
+        messages = [SystemMessage(content=cached_system(SYSTEM_PROMPT)), HumanMessage(content=user_prompt)]
+
+        started = time.perf_counter()
+        with tracer.span(session_id, "combined"):
+            output = resilient_call("claude_combined", invoke_structured, messages)
+        usage = usage_of(output)
+        prompt_stats.record(
+            "combined", SYSTEM_TOKENS + estimate_tokens(user_prompt), SYSTEM_TOKENS + estimate_tokens(original),
+            time.perf_counter() - started,
+            input_tokens=usage["input_tokens"] + usage["cache_read_tokens"] + usage["cache_write_tokens"],
+            cache_read_tokens=usage["cache_read_tokens"], session_id=session_id,
+        )
+        result = output["parsed"]
+
+    except Exception as e:
+        logger.error("Error in single-call pipeline: %s", e, extra={"session_id": session_id})
+        intent, query = keyword_fallback(full_transcript, e)
+        if intent == "error":
+            return intent, query, ""
+        return intent, query, fallback_suggestion(intent, query)
+
+    intent = result.intent.strip().lower()
+    if intent not in INTENTS:
+        logger.warning("Intent '%s' not in valid list, defaulting to 'other'", intent, extra={"session_id": session_id})
+        intent = "other"
+    query = result.cleaned_query.strip()
+    if query.lower() == "none":
+        query = ""
+
+    suggestion = result.suggestion.strip()
+    if intent not in NON_ACTIONABLE_INTENTS and query:
+        if suggestion:
+            remember_answer(intent, query, suggestion)
+        else:
+            suggestion = fallback_suggestion(intent, query)
+
+    logger.info("Classified as: %s", intent, extra={"session_id": session_id, "query": query})
+    return intent, query, suggestion
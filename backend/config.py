@@ -31,4 +31,117 @@ DEFAULT_AGENTS = {
         "role": "agent",
         "full_name": "Jane Agent"
     }
-}
\ No newline at end of file
+}
+
+# Pipeline latency
+SUGGESTION_SLO_SECONDS = float(os.getenv("SUGGESTION_SLO_SECONDS", "4.0"))
+
+# Live session lifecycle
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "120"))  # no uploads for this long ends the session
+SESSION_END_GRACE_SECONDS = float(os.getenv("SESSION_END_GRACE_SECONDS", "10"))  # time for the transcriber to flush on end
+SESSION_REAP_INTERVAL_SECONDS = float(os.getenv("SESSION_REAP_INTERVAL_SECONDS", "15"))
+
+# Draining for deploys: live sessions are checkpointed here and resumed by the next process
+SESSION_CHECKPOINT_DIR = os.getenv("SESSION_CHECKPOINT_DIR", "data/session_checkpoints")
+SESSION_CHECKPOINT_MAX_AGE_SECONDS = float(os.getenv("SESSION_CHECKPOINT_MAX_AGE_SECONDS", "300"))  # older ones are archived instead
+SESSION_INDEX_MAX_SESSIONS = int(os.getenv("SESSION_INDEX_MAX_SESSIONS", "10000"))  # oldest summaries drop out of /audio-sessions past this
+DRAIN_ON_SHUTDOWN = os.getenv("DRAIN_ON_SHUTDOWN", "true").lower() == "true"  # checkpoint rather than end sessions on SIGTERM
+
+# Session transcript/suggestion writers
+SESSION_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "1.0"))
+SESSION_FLUSH_BYTES = int(os.getenv("SESSION_FLUSH_BYTES", "8192"))
+
+# Transcript/suggestion store
+TRANSCRIPT_DB_PATH = os.getenv("TRANSCRIPT_DB_PATH", "data/transcripts.db")
+LEGACY_TEXT_LOGS = os.getenv("LEGACY_TEXT_LOGS", "false").lower() == "true"
+
+# Post-call audio archiving
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", "2"))
+ARCHIVE_OPUS_BITRATE = os.getenv("ARCHIVE_OPUS_BITRATE", "24k")
+ARCHIVE_KEEP_SOURCE = os.getenv("ARCHIVE_KEEP_SOURCE", "false").lower() == "true"
+
+# Knowledge base
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))
+KB_PERSIST_DIR = os.getenv("KB_PERSIST_DIR", "chromaVectorStore")
+KB_MANIFEST_NAME = "kb_manifest.json"
+# Chunk sources are recorded relative to this directory, so a file keeps one key
+# whichever directory kb_ingest runs from
+KB_SOURCE_ROOT = os.path.abspath(os.getenv("KB_SOURCE_ROOT", os.path.dirname(os.path.abspath(__file__))))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+INTENT_MIN_HITS = int(os.getenv("INTENT_MIN_HITS", "2"))  # fewer partition hits than this triggers a global search
+
+# Precomputed suggestion catalogue
+SUGGESTION_CATALOGUE_PATH = os.getenv("SUGGESTION_CATALOGUE_PATH", "data/suggestion_catalogue.json")
+CATALOGUE_MATCH_THRESHOLD = float(os.getenv("CATALOGUE_MATCH_THRESHOLD", "0.6"))  # token-set Jaccard
+CATALOGUE_FALLBACK_THRESHOLD = float(os.getenv("CATALOGUE_FALLBACK_THRESHOLD", "0.3"))  # looser match once providers failed
+
+# Retrieval mode: "hybrid" (BM25 + vector, fused), "vector" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+EMBED_BUDGET_SECONDS = float(os.getenv("EMBED_BUDGET_SECONDS", "0.35"))  # hybrid: wait this long for the query embedding
+EMBED_PROBE_SECONDS = float(os.getenv("EMBED_PROBE_SECONDS", "5.0"))  # while embeds run over budget, try one this often
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Resilience for Bedrock and Anthropic calls
+EMBED_DEADLINE_SECONDS = float(os.getenv("EMBED_DEADLINE_SECONDS", "2.0"))
+CLASSIFY_DEADLINE_SECONDS = float(os.getenv("CLASSIFY_DEADLINE_SECONDS", "4.0"))
+GENERATE_DEADLINE_SECONDS = float(os.getenv("GENERATE_DEADLINE_SECONDS", "8.0"))
+EMBED_HEDGE_AFTER_SECONDS = float(os.getenv("EMBED_HEDGE_AFTER_SECONDS", "0.5"))
+CLASSIFY_HEDGE_AFTER_SECONDS = float(os.getenv("CLASSIFY_HEDGE_AFTER_SECONDS", "1.5"))
+GENERATE_HEDGE_AFTER_SECONDS = float(os.getenv("GENERATE_HEDGE_AFTER_SECONDS", "0"))  # 0 = no hedging
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Suggestion pipeline: "two_stage" (Claude classify, then Mistral RAG) or
+# "single_call" (retrieve on the raw transcript, one Claude call for everything)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_stage").lower()
+SINGLE_CALL_WINDOW_CHARS = int(os.getenv("SINGLE_CALL_WINDOW_CHARS", "800"))  # transcript tail used for retrieval
+SINGLE_CALL_MODEL = os.getenv("SINGLE_CALL_MODEL", "claude-3-5-haiku-latest")
+
+# Shared model provider clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))  # keep-alive pool size per client
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # in-flight requests per client kind
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+# Prompt token budgets (estimated at ~4 characters per token)
+CLASSIFY_TRANSCRIPT_TOKENS = int(os.getenv("CLASSIFY_TRANSCRIPT_TOKENS", "300"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "true").lower() == "true"  # Anthropic cache_control on static prefixes
+
+# Event-loop monitoring and profiling
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.1"))
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.25"))  # capture the stack past this
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Admin endpoints: users with role "admin" or one of these emails (comma-separated)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")  # X-Admin-Token for deploy scripts; empty disables it
+
+# Admission control for live sessions
+ADMISSION_MAX_SESSIONS = int(os.getenv("ADMISSION_MAX_SESSIONS", "50"))
+ADMISSION_MAX_PER_CUSTOMER = int(os.getenv("ADMISSION_MAX_PER_CUSTOMER", "2"))
+ADMISSION_URGENT_HEADROOM = int(os.getenv("ADMISSION_URGENT_HEADROOM", "5"))  # extra slots only urgent calls may use
+ADMISSION_URGENT_MEMORY_SECONDS = float(os.getenv("ADMISSION_URGENT_MEMORY_SECONDS", "900"))  # a customer stays urgent this long after an urgent call
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))  # queue this long before a 429
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_CPU_HIGH = float(os.getenv("ADMISSION_CPU_HIGH", "0.85"))  # process + ffmpeg CPU per core
+ADMISSION_QUEUE_DEPTH_HIGH = float(os.getenv("ADMISSION_QUEUE_DEPTH_HIGH", "20"))  # mean chunks waiting per session
+ADMISSION_PROVIDER_HIGH = float(os.getenv("ADMISSION_PROVIDER_HIGH", "0.9"))  # share of LLM concurrency in use
+URGENT_INTENTS = {
+    intent.strip() for intent in os.getenv("URGENT_INTENTS", "fraud_reporting,card_lost_stolen").split(",") if intent.strip()
+}
+
+# Suggestion scheduling across sessions
+SUGGESTION_CONCURRENCY = int(os.getenv("SUGGESTION_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))  # suggestion jobs in flight
+SUGGESTION_DEADLINE_SECONDS = float(os.getenv("SUGGESTION_DEADLINE_SECONDS", "15"))  # queued longer than this is stale
+
+# Load provider SDKs and build shared clients in the background once the server is listening
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+# Readiness (/ready): slow probes run in the background every interval; the endpoint reads their results
+READY_PROBE_INTERVAL_SECONDS = float(os.getenv("READY_PROBE_INTERVAL_SECONDS", "10"))
+READY_PROBE_TIMEOUT_SECONDS = float(os.getenv("READY_PROBE_TIMEOUT_SECONDS", "2"))
+READY_ASR_ENDPOINT = os.getenv("READY_ASR_ENDPOINT", "transcribestreaming.us-east-1.amazonaws.com:443")
+READY_MAX_LOOP_LAG_MS = float(os.getenv("READY_MAX_LOOP_LAG_MS", "250"))  # p95 over the last few seconds
+READY_MAX_STREAM_QUEUE = int(os.getenv("READY_MAX_STREAM_QUEUE", "20"))  # chunks waiting in any one session
+READY_MAX_SUGGESTION_BACKLOG = int(os.getenv("READY_MAX_SUGGESTION_BACKLOG", "50"))  # suggestion jobs waiting
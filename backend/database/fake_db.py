@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime
 from passlib.context import CryptContext
 from config import DEFAULT_AGENTS
@@ -6,16 +7,27 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class FakeDB:
     def __init__(self):
-        self.agents_db = {}
+        self._agents_db = None  # built on first access; bcrypt-hashing the agents is slow
+        self._agents_lock = threading.Lock()
         self.customers_db = {}
         self.verification_codes = {}
-        self.active_connections = {}
-        self.audio_storage = {}
-        self._init_agents()
+        self.active_connections = {}  # WebSocket -> records.ConnectionRecord
+        self.audio_storage = {}  # audio_id -> records.UploadRecord
     
-    def _init_agents(self):
+    @property
+    def agents_db(self):
+        if self._agents_db is None:
+            with self._agents_lock:
+                if self._agents_db is None:
+                    # Published only once complete, so no caller sees a partial table
+                    self._agents_db = self._build_agents()
+        return self._agents_db
+    
+    @staticmethod
+    def _build_agents():
+        agents = {}
         for username, data in DEFAULT_AGENTS.items():
-            self.agents_db[username] = {
+            agents[username] = {
                 "username": data["username"],
                 "email": data["email"],
                 "hashed_password": pwd_context.hash(data["password"]),
@@ -23,6 +35,7 @@ class FakeDB:
                 "is_active": True,
                 "full_name": data["full_name"]
             }
+        return agents
 
 # Global instance
 db = FakeDB()
\ No newline at end of file
@@ -6,14 +6,24 @@ and extracts clean queries for further processing. It uses Claude (Anthropic) AP
 to analyze transcripts and identify the customer's intent from a predefined list.
 """
 
-from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, SystemMessage
+import logging
 import os
+import time
 from dotenv import load_dotenv
+from tracing import tracer
+from resilience import resilient_call, aresilient_call, CircuitOpenError
+from llm_clients import get_chat_anthropic, invoke_chat, create_message, acreate_message, usage_of
+from prompt_budget import trim_transcript, estimate_tokens, cached_system, prompt_stats
+from config import CLASSIFY_DEADLINE_SECONDS, CLASSIFY_TRANSCRIPT_TOKENS
 
 load_dotenv(override=True)
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_MODEL = "claude-3-5-haiku-latest"  # You can also use claude-3-haiku-20240307 for faster/cheaper responses
+
 INTENTS = [
     "account_opening", "account_closure", "balance_inquiry", "card_lost_stolen", "card_block_unblock",
     "fund_transfer", "loan_application", "loan_status", "internet_banking_help", "mobile_banking_help",
@@ -21,27 +31,31 @@ INTENTS = [
     "international_banking", "investment_query", "charges_fees", "fraud_reporting", "bank_related", "irrelevant"
 ]
 
-def classify_intent_and_giveQuery(full_transcript: str):
-    """
-    Intent classification using Claude API
-    """
-    if not anthropic_api_key:
-        print("❌ ANTHROPIC_API_KEY not found in environment variables")
-        return "error", "Missing API key"
-    
-    prompt = f"""
+# Transcript tail used as the query when classification falls back to keywords
+FALLBACK_QUERY_CHARS = 300
+
+def keyword_fallback(full_transcript: str, error: Exception):
+    """Keyword-rule intent when Claude is failing or its circuit is open"""
+    from kb_ingest import infer_intent  # same rules that tag the knowledge base
+
+    intent = infer_intent(full_transcript)
+    if intent == "bank_related":
+        return "error", str(error) or type(error).__name__
+    if not isinstance(error, CircuitOpenError):
+        logger.info("Using keyword intent %s after classification failure", intent)
+    return intent, full_transcript[-FALLBACK_QUERY_CHARS:].strip()
+
+# Static instructions: identical on every call, so they are sent as a cached
+# system prefix and only the transcript varies
+CLASSIFIER_SYSTEM = f"""
 You are a banking AI assistant. Your job is to:
-1. Extract only the banking-related sentences from the following customer conversation.
+1. Extract only the banking-related sentences from the customer conversation you are given.
 2. Rewrite them into a single clean, professional query.
 3. Identify the correct intent from the list.
 
 Valid Intents:
 {", ".join(INTENTS)}
 
---- Customer Transcript ---
-{full_transcript}
----------------------------
-
 Instructions:
 - If the transcript contains banking-related content, extract and clean it into a professional query
 - If there's no banking-related content, mark as "irrelevant"
@@ -63,59 +77,119 @@ Intent: irrelevant
 Cleaned_Query: None
 """
 
+def transcript_message(full_transcript: str):
+    """User turn for a transcript trimmed to the token budget, and its (trimmed, original) size"""
+    trimmed = trim_transcript(full_transcript, CLASSIFY_TRANSCRIPT_TOKENS)
+    content = f"--- Customer Transcript ---\n{trimmed}\n---------------------------"
+    system_tokens = estimate_tokens(CLASSIFIER_SYSTEM)
+    return content, system_tokens + estimate_tokens(content), system_tokens + estimate_tokens(full_transcript)
+
+def record_prompt(stage: str, sizes, started: float, response, session_id: str = None):
+    usage = usage_of(response)
+    prompt_stats.record(
+        stage, sizes[0], sizes[1], time.perf_counter() - started,
+        input_tokens=usage["input_tokens"] + usage["cache_read_tokens"] + usage["cache_write_tokens"],
+        cache_read_tokens=usage["cache_read_tokens"], session_id=session_id,
+    )
+
+def parse_classification(text: str, session_id: str = None):
+    """Parse Claude's "Intent: / Cleaned_Query:" response"""
+    intent = "other"
+    cleaned_query = ""
+
+    for line in text.splitlines():
+        line = line.strip()
+        if line.lower().startswith("intent:"):
+            intent = line.split(":", 1)[1].strip().lower()
+        elif line.lower().startswith("cleaned_query:"):
+            cleaned_query = line.split(":", 1)[1].strip()
+            if cleaned_query.lower() == "none":
+                cleaned_query = ""
+
+    # Validate intent against our list
+    if intent not in [i.lower() for i in INTENTS]:
+        logger.warning("Intent '%s' not in valid list, defaulting to 'other'", intent, extra={"session_id": session_id})
+        intent = "other"
+
+    return intent, cleaned_query
+
+def classify_intent_and_giveQuery(full_transcript: str, session_id: str = None):
+    """
+    Intent classification using Claude API
+    """
+    if not anthropic_api_key:
+        logger.error("ANTHROPIC_API_KEY not found in environment variables")
+        return "error", "Missing API key"
+
     try:
-        # Initialize Claude
-        llm = ChatAnthropic(
-            api_key=anthropic_api_key,
-            model="claude-3-5-haiku-latest",  # You can also use claude-3-haiku-20240307 for faster/cheaper responses
-            temperature=0.1,  # Low temperature for consistent classification
-            max_tokens=200   # Short response needed
-        )
+        # Shared, pooled client (created on first use)
+        llm = get_chat_anthropic(CLASSIFIER_MODEL, 0.1, 200, CLASSIFY_DEADLINE_SECONDS)
+        
+        content, *sizes = transcript_message(full_transcript)
+        messages = [SystemMessage(content=cached_system(CLASSIFIER_SYSTEM)), HumanMessage(content=content)]
         
-        response = llm.invoke([HumanMessage(content=prompt)])
+        started = time.perf_counter()
+        with tracer.span(session_id, "classify"):
+            response = resilient_call("claude_classify", invoke_chat, llm, messages)
+        record_prompt("classify", sizes, started, response, session_id)
         text = response.content.strip()
         
-        print(f"Claude Response:\n{text}")
+        logger.debug("Claude response: %s", text, extra={"session_id": session_id})
         
-        intent = "other"
-        cleaned_query = ""
-
-        # Parse Claude's response
-        for line in text.splitlines():
-            line = line.strip()
-            if line.lower().startswith("intent:"):
-                intent = line.split(":", 1)[1].strip().lower()
-            elif line.lower().startswith("cleaned_query:"):
-                cleaned_query = line.split(":", 1)[1].strip()
-                if cleaned_query.lower() == "none":
-                    cleaned_query = ""
-
-        # Validate intent against our list
-        if intent not in [i.lower() for i in INTENTS]:
-            print(f"Intent '{intent}' not in valid list, defaulting to 'other'")
-            intent = "other"
-            
-        print(f"Classified as: {intent} | Query: {cleaned_query}")
+        intent, cleaned_query = parse_classification(text, session_id)
+        logger.info("Classified as: %s", intent, extra={"session_id": session_id, "query": cleaned_query})
         return intent, cleaned_query
         
     except Exception as e:
-        print(f"Error in Claude intent classification: {e}")
-        return "error", str(e)
+        logger.error("Error in Claude intent classification: %s", e, extra={"session_id": session_id})
+        return keyword_fallback(full_transcript, e)
+
+async def aclassify_intent_and_giveQuery(full_transcript: str, session_id: str = None):
+    """
+    Async intent classification on the shared AsyncAnthropic client (no thread hop)
+    """
+    if not anthropic_api_key:
+        logger.error("ANTHROPIC_API_KEY not found in environment variables")
+        return "error", "Missing API key"
+
+    try:
+        content, *sizes = transcript_message(full_transcript)
+
+        started = time.perf_counter()
+        with tracer.span(session_id, "classify"):
+            message = await aresilient_call(
+                "claude_classify",
+                acreate_message,
+                timeout=CLASSIFY_DEADLINE_SECONDS,
+                model=CLASSIFIER_MODEL,
+                max_tokens=200,
+                temperature=0.1,
+                system=cached_system(CLASSIFIER_SYSTEM),
+                messages=[{"role": "user", "content": content}],
+            )
+        record_prompt("classify", sizes, started, message, session_id)
+        text = message.content[0].text.strip()
+
+        logger.debug("Claude response: %s", text, extra={"session_id": session_id})
+
+        intent, cleaned_query = parse_classification(text, session_id)
+        logger.info("Classified as: %s", intent, extra={"session_id": session_id, "query": cleaned_query})
+        return intent, cleaned_query
+
+    except Exception as e:
+        logger.error("Error in Claude intent classification: %s", e, extra={"session_id": session_id})
+        return keyword_fallback(full_transcript, e)
 
 # Alternative using direct Anthropic API (without LangChain)
-def classify_intent_and_giveQuery_direct(full_transcript: str):
+def classify_intent_and_giveQuery_direct(full_transcript: str, session_id: str = None):
     """
     Direct Anthropic API implementation (alternative to LangChain)
     """
-    import anthropic
-    
     if not anthropic_api_key:
-        print("ANTHROPIC_API_KEY not found in environment variables")
+        logger.error("ANTHROPIC_API_KEY not found in environment variables")
         return "error", "Missing API key"
     
     try:
-        client = anthropic.Anthropic(api_key=anthropic_api_key)
-        
         prompt = f"""
 You are a banking AI assistant. Analyze this customer conversation and:
 
@@ -125,42 +199,30 @@ You are a banking AI assistant. Analyze this customer conversation and:
 
 Valid Intents: {", ".join(INTENTS)}
 
-Customer Transcript: {full_transcript}
+Customer Transcript: {trim_transcript(full_transcript, CLASSIFY_TRANSCRIPT_TOKENS)}
 
 Respond in exactly this format:
 Intent: <intent>
 Cleaned_Query: <query_or_None>
 """
         
-        message = client.messages.create(
-            model="claude-3-5-haiku-latest",
-            max_tokens=200,
-            temperature=0.1,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        with tracer.span(session_id, "classify"):
+            message = resilient_call(
+                "claude_classify",
+                create_message,
+                timeout=CLASSIFY_DEADLINE_SECONDS,
+                model=CLASSIFIER_MODEL,
+                max_tokens=200,
+                temperature=0.1,
+                messages=[{"role": "user", "content": prompt}]
+            )
         
         text = message.content[0].text.strip()
-        
-        intent = "other"
-        cleaned_query = ""
-        
-        for line in text.splitlines():
-            line = line.strip()
-            if line.lower().startswith("intent:"):
-                intent = line.split(":", 1)[1].strip().lower()
-            elif line.lower().startswith("cleaned_query:"):
-                cleaned_query = line.split(":", 1)[1].strip()
-                if cleaned_query.lower() == "none":
-                    cleaned_query = ""
-        
-        if intent not in [i.lower() for i in INTENTS]:
-            intent = "other"
-            
-        return intent, cleaned_query
+        return parse_classification(text, session_id)
         
     except Exception as e:
-        print(f"Error in direct Anthropic API call: {e}")
-        return "error", str(e)
+        logger.error("Error in direct Anthropic API call: %s", e, extra={"session_id": session_id})
+        return keyword_fallback(full_transcript, e)
 
 # Test function
 def test_classification():
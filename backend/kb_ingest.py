@@ -0,0 +1,356 @@
+"""
+Knowledge-base ingestion for the Chroma vector store used by main_llm.
+
+This module:
+- Streams FAQ source documents (.json, .jsonl, .md, .txt) one file at a time
+- Splits them into chunks with RecursiveCharacterTextSplitter
+- Identifies every chunk by a content hash, so only new or changed chunks are
+  embedded and upserted; chunks that disappeared from a source are deleted
+- Records each chunk's source relative to KB_SOURCE_ROOT, so the same file
+  has one key whatever the working directory; chunks whose source file no
+  longer exists are pruned on every run (or alone with --prune)
+- Tags every chunk with an `intent` from the classifier's taxonomy (taken
+  from the source entry, or inferred from keywords) so retrieval can be
+  restricted to the relevant partition; --retag tags existing chunks in place
+- Writes kb_manifest.json next to the store with a version hash that other
+  modules use to detect knowledge-base changes
+- Reports throughput for each run
+
+Usage:
+    python kb_ingest.py faq/ extra_faq.jsonl [--chunk-size 1000] [--dry-run]
+    python kb_ingest.py --retag
+    python kb_ingest.py --prune
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import KB_SOURCE_ROOT
+from intent_classifier import INTENTS
+from kb_manifest import manifest_path, read_kb_manifest
+from main_llm import get_vectorstore
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTENSIONS = (".json", ".jsonl", ".md", ".txt")
+QUESTION_KEYS = ("question", "query", "title")
+ANSWER_KEYS = ("answer", "response", "content", "text")
+METADATA_KEYS = ("intent", "category", "question")
+
+# Keyword rules used when a source entry does not name a known intent; the
+# first rule (in intent_classifier.INTENTS order) with the most hits wins
+_KEYWORD_RULES = {
+    "account_opening": ("open an account", "open account", "new account", "opening", "salary account"),
+    "account_closure": ("close my account", "close account", "closure", "closing"),
+    "balance_inquiry": ("balance", "mini statement", "available funds"),
+    "card_lost_stolen": ("lost card", "stolen", "lost my card", "card lost", "missing card"),
+    "card_block_unblock": ("block", "unblock", "hotlist", "freeze card"),
+    "fund_transfer": ("transfer", "neft", "rtgs", "imps", "upi", "beneficiary", "payee"),
+    "loan_application": ("apply for a loan", "loan application", "personal loan", "home loan", "eligibility"),
+    "loan_status": ("loan status", "emi", "repayment", "sanction", "disbursement"),
+    "internet_banking_help": ("internet banking", "net banking", "online banking", "login", "password"),
+    "mobile_banking_help": ("mobile banking", "mobile app", "app", "mpin"),
+    "transaction_issue": ("failed transaction", "debited", "not credited", "refund", "transaction"),
+    "kyc_update": ("kyc", "aadhaar", "pan", "address proof", "update address"),
+    "atm_nearby": ("atm", "branch locator", "nearest branch", "cash withdrawal"),
+    "fd_rd_info": ("fixed deposit", "recurring deposit", "fd", "rd", "deposit rate"),
+    "complaint_filing": ("complaint", "grievance", "ombudsman", "escalate"),
+    "international_banking": ("international", "forex", "foreign", "swift", "remittance"),
+    "investment_query": ("mutual fund", "investment", "demat", "insurance", "bonds"),
+    "charges_fees": ("charges", "fee", "fees", "penalty", "minimum balance"),
+    "fraud_reporting": ("fraud", "unauthorized", "phishing", "scam", "suspicious"),
+}
+
+_unknown = set(_KEYWORD_RULES) - set(INTENTS)
+if _unknown:
+    raise ValueError(f"Keyword rules for intents the classifier does not know: {sorted(_unknown)}")
+
+INTENT_KEYWORDS = {intent: _KEYWORD_RULES[intent] for intent in INTENTS if intent in _KEYWORD_RULES}
+
+
+def _keyword_pattern(keyword: str) -> Pattern:
+    """Whole words only ("app" must not match "happy"), allowing a plural or verb ending"""
+    words = r"\s+".join(re.escape(word) for word in keyword.split())
+    return re.compile(rf"\b{words}(?:s|es|ed|ing)?\b")
+
+
+_KEYWORD_PATTERNS: List[Tuple[str, List[Pattern]]] = [
+    (intent, [_keyword_pattern(keyword) for keyword in keywords]) for intent, keywords in INTENT_KEYWORDS.items()
+]
+
+
+def source_key(path: str) -> str:
+    """Location-independent key for a source file: its path relative to KB_SOURCE_ROOT"""
+    return os.path.relpath(os.path.abspath(path), KB_SOURCE_ROOT).replace(os.sep, "/")
+
+
+def _legacy_keys(path: str) -> List[str]:
+    """Keys earlier runs may have stored for this file (normalised as given, or absolute)"""
+    return sorted({os.path.normpath(path), os.path.abspath(path)} - {source_key(path)})
+
+
+def _source_exists(source: str) -> bool:
+    if os.path.isabs(source):
+        return os.path.isfile(source)
+    return os.path.isfile(os.path.join(KB_SOURCE_ROOT, source))
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Stable id for a chunk: changes whenever its content changes"""
+    return hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()
+
+
+def infer_intent(text: str) -> str:
+    """Best-matching intent for a chunk, or "bank_related" if nothing matches"""
+    lowered = text.lower()
+    best, best_hits = "bank_related", 0
+    for intent, patterns in _KEYWORD_PATTERNS:
+        hits = sum(1 for pattern in patterns if pattern.search(lowered))
+        if hits > best_hits:
+            best, best_hits = intent, hits
+    return best
+
+
+def _entry_to_document(entry, source: str, position: int) -> Optional[Document]:
+    if isinstance(entry, str):
+        return Document(page_content=entry, metadata={"source": source, "entry": position})
+    if not isinstance(entry, dict):
+        return None
+
+    question = next((entry[key] for key in QUESTION_KEYS if entry.get(key)), None)
+    answer = next((entry[key] for key in ANSWER_KEYS if entry.get(key)), None)
+    if question and answer:
+        content = f"Q: {question}\nA: {answer}"
+    elif answer or question:
+        content = answer or question
+    else:
+        content = json.dumps(entry, ensure_ascii=False)
+
+    metadata = {"source": source, "entry": position}
+    for key in METADATA_KEYS:
+        if isinstance(entry.get(key), (str, int, float, bool)):
+            metadata[key] = entry[key]
+    return Document(page_content=content, metadata=metadata)
+
+
+def iter_file_documents(path: str) -> Iterator[Document]:
+    """Documents from a single source file"""
+    source = source_key(path)
+
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for position, line in enumerate(f):
+                if line.strip():
+                    document = _entry_to_document(json.loads(line), source, position)
+                    if document:
+                        yield document
+
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            # Either {"faqs": [...]} or a single entry
+            data = next((value for value in data.values() if isinstance(value, list)), [data])
+        for position, entry in enumerate(data):
+            document = _entry_to_document(entry, source, position)
+            if document:
+                yield document
+
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield Document(page_content=f.read(), metadata={"source": source, "entry": 0})
+
+
+def iter_source_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    if filename.endswith(SOURCE_EXTENSIONS):
+                        yield os.path.join(root, filename)
+        elif path.endswith(SOURCE_EXTENSIONS):
+            yield path
+
+
+def ingest(paths: List[str], chunk_size: int = 1000, chunk_overlap: int = 100,
+           batch_size: int = 32, dry_run: bool = False) -> Dict:
+    """Upsert new/changed chunks from the given sources into Chroma"""
+    started = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    vectorstore = get_vectorstore()
+    stats = {"files": 0, "chunks": 0, "added": 0, "unchanged": 0, "deleted": 0, "pruned": 0, "embed_seconds": 0.0}
+
+    for path in iter_source_files(paths):
+        source = source_key(path)
+        chunks = splitter.split_documents(iter_file_documents(path))
+
+        # Deduplicate identical chunks within the file and tag their partition
+        by_id = {}
+        for chunk in chunks:
+            if chunk.metadata.get("intent") not in INTENTS:
+                chunk.metadata["intent"] = infer_intent(chunk.page_content)
+            by_id.setdefault(chunk_id(source, chunk.page_content), chunk)
+
+        # Chunks stored under an older key for this file are replaced by the new keys
+        keys = [source] + _legacy_keys(path)
+        existing = set(vectorstore.get(where={"source": {"$in": keys}}, include=[])["ids"])
+        new_ids = [cid for cid in by_id if cid not in existing]
+        stale_ids = [cid for cid in existing if cid not in by_id]
+
+        stats["files"] += 1
+        stats["chunks"] += len(by_id)
+        stats["unchanged"] += len(by_id) - len(new_ids)
+
+        if dry_run:
+            stats["added"] += len(new_ids)
+            stats["deleted"] += len(stale_ids)
+            continue
+
+        for start in range(0, len(new_ids), batch_size):
+            batch = new_ids[start:start + batch_size]
+            embed_started = time.perf_counter()
+            vectorstore.add_texts(
+                texts=[by_id[cid].page_content for cid in batch],
+                metadatas=[by_id[cid].metadata for cid in batch],
+                ids=batch,
+            )
+            stats["embed_seconds"] += time.perf_counter() - embed_started
+            stats["added"] += len(batch)
+
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+            stats["deleted"] += len(stale_ids)
+
+        logger.info(f"{source}: {len(by_id)} chunks, {len(new_ids)} new, {len(stale_ids)} removed")
+
+    stats["pruned"] = prune_missing_sources(vectorstore, dry_run=dry_run)["deleted"]
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+    stats["chunks_per_second"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    stats["embedded_per_second"] = (
+        round(stats["added"] / stats["embed_seconds"], 1) if stats["embed_seconds"] else 0.0
+    )
+
+    if not dry_run and (stats["added"] or stats["deleted"] or stats["pruned"] or not read_kb_manifest()):
+        write_manifest(vectorstore, stats)
+
+    return stats
+
+
+def prune_missing_sources(vectorstore=None, batch_size: int = 500, dry_run: bool = False) -> Dict:
+    """Delete stored chunks whose source file no longer exists"""
+    vectorstore = vectorstore or get_vectorstore()
+    collection = vectorstore._collection
+    by_source: Dict[str, List[str]] = {}
+    offset = 0
+
+    while True:
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+        for cid, metadata in zip(page["ids"], page["metadatas"]):
+            source = (metadata or {}).get("source")
+            if source:
+                by_source.setdefault(source, []).append(cid)
+
+    missing = sorted(source for source in by_source if not _source_exists(source))
+    stats = {"sources": len(by_source), "missing": len(missing), "deleted": 0}
+    for source in missing:
+        ids = by_source[source]
+        if not dry_run:
+            for start in range(0, len(ids), batch_size):
+                vectorstore.delete(ids=ids[start:start + batch_size])
+        stats["deleted"] += len(ids)
+        logger.info(f"{source}: source is gone, {len(ids)} chunks removed")
+    return stats
+
+
+def retag_existing(batch_size: int = 500) -> Dict:
+    """Add an inferred intent to stored chunks that have none (no re-embedding)"""
+    collection = get_vectorstore()._collection
+    stats = {"checked": 0, "tagged": 0}
+    offset = 0
+
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+
+        ids, metadatas = [], []
+        for cid, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            stats["checked"] += 1
+            metadata = dict(metadata or {})
+            if not metadata.get("intent"):
+                metadata["intent"] = infer_intent(document or "")
+                ids.append(cid)
+                metadatas.append(metadata)
+
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            stats["tagged"] += len(ids)
+
+    return stats
+
+
+def write_manifest(vectorstore, stats: Dict):
+    """Record a version hash over every chunk id currently in the store"""
+    ids = sorted(vectorstore.get(include=[])["ids"])
+    version = hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+    manifest = {
+        "version": version,
+        "chunks": len(ids),
+        "updated_at": datetime.utcnow().isoformat(),
+        "last_run": stats,
+    }
+    with open(manifest_path(), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest FAQ documents into the Chroma store")
+    parser.add_argument("paths", nargs="*", help="Source files or directories (.json, .jsonl, .md, .txt)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without embedding")
+    parser.add_argument("--retag", action="store_true", help="Tag existing chunks that have no intent")
+    parser.add_argument("--prune", action="store_true", help="Only remove chunks whose source file is gone")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.retag:
+        tagged = retag_existing()
+        print(f"Retagged {tagged['tagged']} of {tagged['checked']} stored chunks")
+        if not args.paths and not args.prune:
+            raise SystemExit(0)
+    if args.prune and not args.paths:
+        pruned = prune_missing_sources(dry_run=args.dry_run)
+        if pruned["deleted"] and not args.dry_run:
+            write_manifest(get_vectorstore(), {"pruned": pruned["deleted"]})
+        print(f"Pruned {pruned['deleted']} chunks from {pruned['missing']} of {pruned['sources']} sources")
+        raise SystemExit(0)
+    if not args.paths:
+        parser.error("at least one source path is required")
+
+    result = ingest(args.paths, args.chunk_size, args.chunk_overlap, args.batch_size, args.dry_run)
+    print(
+        f"Ingested {result['files']} files: {result['chunks']} chunks "
+        f"({result['added']} embedded, {result['unchanged']} unchanged, {result['deleted']} deleted, "
+        f"{result['pruned']} pruned) "
+        f"in {result['seconds']}s - {result['chunks_per_second']} chunks/s, "
+        f"{result['embedded_per_second']} embeddings/s"
+    )
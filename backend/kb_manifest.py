@@ -0,0 +1,30 @@
+"""
+Knowledge-base manifest shared by ingestion and the suggestion caches.
+
+kb_ingest writes kb_manifest.json next to the Chroma store after every run
+that changes it; its `version` hash is what cached answers are keyed on, so
+they are ignored as soon as the knowledge base changes.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+from config import KB_PERSIST_DIR, KB_MANIFEST_NAME
+
+
+def manifest_path() -> str:
+    return os.path.join(KB_PERSIST_DIR, KB_MANIFEST_NAME)
+
+
+def read_kb_manifest() -> Dict:
+    """Current manifest, or an empty dict if the store was never ingested"""
+    try:
+        with open(manifest_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def kb_version() -> Optional[str]:
+    return read_kb_manifest().get("version")
@@ -0,0 +1,165 @@
+"""
+Local BM25 index over the knowledge-base chunks.
+
+Vector retrieval needs a Titan round trip to embed the query before Chroma
+can search. This module keeps an in-process lexical index over the same
+chunks so retrieval can start without any network call:
+- BM25 (Okapi) scoring over an inverted index built from the Chroma
+  collection, restricted to an intent partition when one is given
+- Rebuilt automatically when the knowledge-base version changes
+- reciprocal_rank_fusion() merges lexical and vector result lists
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from kb_manifest import kb_version
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+KB_VERSION_CHECK_SECONDS = 30.0
+PAGE_SIZE = 1000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an the i me my we our you your it its is are was were be been am do does did can could
+would should will shall may might to of in on at for from with by about into and or if so
+this that these those there how what where when which who why please
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over a fixed set of documents"""
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self.intents = [doc.metadata.get("intent") for doc in documents]
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for position, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, k: int, intent: Optional[str] = None) -> List[Tuple[Document, float]]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                if intent and self.intents[position] != intent:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / self.average_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.documents[position], score) for position, score in ranked]
+
+
+class LexicalIndex:
+    """BM25 index kept in step with the Chroma store's knowledge-base version"""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self._index: Optional[BM25Index] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load_documents(self) -> List[Document]:
+        from main_llm import get_vectorstore  # main_llm searches through this index
+
+        collection = get_vectorstore()._collection
+        documents, offset = [], 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            for text, metadata in zip(page["documents"], page["metadatas"]):
+                if text:
+                    documents.append(Document(page_content=text, metadata=dict(metadata or {})))
+        return documents
+
+    def ensure_current(self) -> BM25Index:
+        """Build on first use and rebuild when the knowledge base changes"""
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < KB_VERSION_CHECK_SECONDS:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and now - self._checked_at < KB_VERSION_CHECK_SECONDS:
+                return self._index
+            self._checked_at = now
+            version = kb_version()
+            if self._index is None or version != self.version:
+                started = time.perf_counter()
+                self._index = BM25Index(self._load_documents())
+                self.version = version
+                self.built_at = time.time()
+                self.build_seconds = round(time.perf_counter() - started, 3)
+                logger.info("Built lexical index: %d chunks in %.2fs (kb version %s)",
+                            len(self._index), self.build_seconds, version)
+            return self._index
+
+    def search(self, query: str, k: int, intent: Optional[str] = None) -> List[Document]:
+        return [doc for doc, _ in self.ensure_current().search(query, k, intent)]
+
+    def summary(self) -> Dict:
+        return {
+            "chunks": len(self._index) if self._index is not None else 0,
+            "terms": len(self._index.postings) if self._index is not None else 0,
+            "kb_version": self.version,
+            "build_seconds": self.build_seconds,
+        }
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """Merge ranked lists by summed 1/(rrf_k + rank), de-duplicating on content"""
+    scores: Dict[str, float] = {}
+    by_content: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            by_content.setdefault(doc.page_content, doc)
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (rrf_k + rank)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [by_content[content] for content in ranked]
+
+
+# Global index instance (built lazily on first search)
+lexical_index = LexicalIndex()
@@ -5,7 +5,7 @@ This module handles:
 - Converting WebM audio chunks to PCM format for Amazon Transcribe
 - Streaming audio to Amazon Transcribe for real-time transcription
 - Processing transcript events and generating AI suggestions
-- Writing transcripts and suggestions to files
+- Persisting transcripts and suggestions to the indexed transcript store
 - Broadcasting suggestions via WebSocket callbacks
 
 The transcription service processes customer audio in real-time and generates
@@ -13,26 +13,36 @@ helpful suggestions for agents based on the conversation content.
 """
 
 import asyncio
+import logging
 import subprocess
 from amazon_transcribe.client import TranscribeStreamingClient
 from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import AudioEvent
-import aiofiles
 import os
 import time
-from intent_classifier import classify_intent_and_giveQuery
+from intent_classifier import aclassify_intent_and_giveQuery
 from main_llm import generate_suggestion
+from combined_pipeline import classify_and_suggest
+from admission import admission_controller, priority_for, URGENT, NORMAL, PRIORITY_NAMES
+from suggestion_scheduler import suggestion_scheduler, JobExpired, suggestion_seconds
+from tracing import tracer
+from metrics import ffmpeg_processes, ffmpeg_runs
+from session_writer import SessionFileWriter
+from transcript_store import SessionStoreWriter, transcript_store
+from config import LEGACY_TEXT_LOGS, PIPELINE_MODE
+
+logger = logging.getLogger(__name__)
 
 PCM_FRAME_SIZE = 3200  # 100ms for 16-bit 16kHz mono audio
+FRAME_LOG_SAMPLE_EVERY = 100  # log one in N per-frame messages (~10s of audio)
 
 async def convert_webm_to_pcm(webm_bytes: bytes) -> bytes:
-    print("[convert_webm_to_pcm] Converting webm chunk to PCM...")
-
     if not webm_bytes:
-        print("[convert_webm_to_pcm] Empty webm bytes received")
+        logger.debug("Empty webm bytes received")
         return b""
 
     try:
+        ffmpeg_processes.inc("decode")
         process = await asyncio.create_subprocess_exec(
             "ffmpeg",
             "-f", "webm",
@@ -51,18 +61,23 @@ async def convert_webm_to_pcm(webm_bytes: bytes) -> bytes:
         stdout, stderr = await process.communicate(input=webm_bytes)
 
         if process.returncode != 0:
-            print("FFmpeg error:", stderr.decode())
+            ffmpeg_runs.inc("decode", "error")
+            logger.warning("FFmpeg error: %s", stderr.decode(errors="replace"))
             return b""
         else:
-            print(f"[convert_webm_to_pcm] PCM chunk size: {len(stdout)} bytes")
+            ffmpeg_runs.inc("decode", "ok")
+            logger.debug("Converted %d webm bytes to %d PCM bytes", len(webm_bytes), len(stdout))
             return stdout
             
     except Exception as e:
-        print(f"[convert_webm_to_pcm] Exception: {e}")
+        ffmpeg_runs.inc("decode", "error")
+        logger.error("WebM to PCM conversion failed: %s", e)
         return b""
+    finally:
+        ffmpeg_processes.dec("decode")
 
-async def audio_stream_generator(audio_queue: asyncio.Queue, input_stream):
-    print("[audio_stream_generator] Started")
+async def audio_stream_generator(audio_queue: asyncio.Queue, input_stream, session_id: str = None):
+    logger.info("Audio stream generator started", extra={"session_id": session_id})
 
     buffer = bytearray()
     total_bytes_sent = 0
@@ -71,19 +86,20 @@ async def audio_stream_generator(audio_queue: asyncio.Queue, input_stream):
         while True:
             chunk = await audio_queue.get()
             if chunk is None:
-                print("[audio_stream_generator] Received None, ending stream.")
+                logger.info("Received end-of-stream sentinel", extra={"session_id": session_id})
                 break
 
-            print(f"[audio_stream_generator] Received chunk: {len(chunk)} bytes")
+            logger.debug("Received chunk: %d bytes", len(chunk), extra={"session_id": session_id})
             
             if len(chunk) == 0:
-                print("[audio_stream_generator] Skipping empty chunk")
+                logger.debug("Skipping empty chunk", extra={"session_id": session_id})
                 continue
                 
-            pcm_chunk = await convert_webm_to_pcm(chunk)
+            with tracer.span(session_id, "decode"):
+                pcm_chunk = await convert_webm_to_pcm(chunk)
 
             if not pcm_chunk:
-                print("Skipping empty PCM chunk")
+                logger.debug("Skipping empty PCM chunk", extra={"session_id": session_id})
                 continue
 
             buffer.extend(pcm_chunk)
@@ -95,10 +111,15 @@ async def audio_stream_generator(audio_queue: asyncio.Queue, input_stream):
                 
                 try:
                     await input_stream.send_audio_event(audio_chunk=frame)
+                    # Latest frame, so "transcribe" runs from the audio that closes an utterance
+                    tracer.mark(session_id, "audio_sent", latest=True)
                     total_bytes_sent += len(frame)
-                    print(f"[audio_stream_generator] Sent {len(frame)} bytes to Transcribe (Total: {total_bytes_sent})")
+                    logger.debug(
+                        "Sent %d bytes to Transcribe (Total: %d)", len(frame), total_bytes_sent,
+                        extra={"session_id": session_id, "sample_every": FRAME_LOG_SAMPLE_EVERY},
+                    )
                 except Exception as e:
-                    print(f"[audio_stream_generator] Error sending audio: {e}")
+                    logger.error("Error sending audio: %s", e, extra={"session_id": session_id})
                     break
 
         # Flush remaining bytes (if any)
@@ -106,15 +127,18 @@ async def audio_stream_generator(audio_queue: asyncio.Queue, input_stream):
             try:
                 await input_stream.send_audio_event(audio_chunk=bytes(buffer))
                 total_bytes_sent += len(buffer)
-                print(f"[audio_stream_generator] Flushed remaining {len(buffer)} bytes (Total sent: {total_bytes_sent})")
+                logger.debug(
+                    "Flushed remaining %d bytes (Total sent: %d)", len(buffer), total_bytes_sent,
+                    extra={"session_id": session_id},
+                )
             except Exception as e:
-                print(f"[audio_stream_generator] Error flushing buffer: {e}")
+                logger.error("Error flushing buffer: %s", e, extra={"session_id": session_id})
 
         await input_stream.end_stream()
-        print("[audio_stream_generator] Ended stream")
+        logger.info("Ended stream after %d bytes", total_bytes_sent, extra={"session_id": session_id})
         
-    except Exception as e:
-        print(f"[audio_stream_generator] Exception: {e}")
+    except Exception:
+        logger.exception("Audio stream generator failed", extra={"session_id": session_id})
 
 class MyTranscriptHandler(TranscriptResultStreamHandler):
     def __init__(self, output_stream, session_id: str, broadcast_callback):
@@ -127,13 +151,25 @@ class MyTranscriptHandler(TranscriptResultStreamHandler):
         self.last_transcript_time = time.time()
         self.event_count = 0
         self.accumulated_text = ""  # Track all text for suggestions
+        # Scheduling priority: urgent if the customer's recent call was, raised once this call classifies as urgent
+        slot = admission_controller.active.get(session_id)
+        self.priority = slot.priority if slot is not None else NORMAL
         
-        # Create suggestions directory
-        os.makedirs("suggestions", exist_ok=True)
+        # Transcripts and suggestions are batched into the indexed store;
+        # the old text files are only written when LEGACY_TEXT_LOGS is on
+        self.store_writer = SessionStoreWriter(transcript_store, session_id)
+        self.transcript_writer = None
+        self.suggestion_writer = None
+        if LEGACY_TEXT_LOGS:
+            self.transcript_writer = SessionFileWriter(f"transcripts/{session_id}.txt")
+            self.suggestion_writer = SessionFileWriter(f"suggestions/{session_id}_suggestions.txt")
 
     async def handle_transcript_event(self, transcript_event):
         self.event_count += 1
-        print(f"[handle_transcript_event] Received transcript event #{self.event_count}")
+        logger.debug(
+            "Received transcript event #%d", self.event_count,
+            extra={"session_id": self.session_id, "sample_every": FRAME_LOG_SAMPLE_EVERY},
+        )
 
         try:
             if hasattr(transcript_event, 'transcript'):
@@ -151,28 +187,30 @@ class MyTranscriptHandler(TranscriptResultStreamHandler):
                                 
                                 if transcript_text:  # Only process non-empty transcripts
                                     if not is_partial:  # Final result
-                                        print(f"[handle_transcript_event] Final transcript: {transcript_text}")
+                                        logger.info("Final transcript: %s", transcript_text, extra={"session_id": self.session_id})
                                         self.final_transcripts.append(transcript_text)
                                         self.accumulated_text += f" {transcript_text}"
                                         self.last_transcript_time = time.time()
+                                        tracer.record_since(self.session_id, "audio_sent", "transcribe")
                                         await self.write_transcript(transcript_text)
                                         
                                         # Try to generate suggestion immediately after final transcript
                                         await self.try_generate_suggestion()
                                         
                                     else:  # Partial result
-                                        print(f"[handle_transcript_event] Partial transcript: {transcript_text}")
+                                        logger.debug("Partial transcript: %s", transcript_text, extra={"session_id": self.session_id})
                 else:
-                    print("[handle_transcript_event] No results in transcript")
+                    logger.debug(
+                        "No results in transcript",
+                        extra={"session_id": self.session_id, "sample_every": FRAME_LOG_SAMPLE_EVERY},
+                    )
                     
                     # Even if no results, check if we should generate suggestions based on time
                     if time.time() - self.last_suggestion_time > 10:
                         await self.try_generate_suggestion()
                         
-        except Exception as e:
-            print(f"[handle_transcript_event] Error processing event: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error processing transcript event", extra={"session_id": self.session_id})
 
     async def try_generate_suggestion(self):
         """Try to generate suggestion based on current state"""
@@ -194,68 +232,120 @@ class MyTranscriptHandler(TranscriptResultStreamHandler):
                     full_transcript = await self.read_transcript_file()
                 
                 if full_transcript:
-                    print(f"[suggestion] Processing transcript: {full_transcript}")
-                    
-                    intent, cleaned_query = classify_intent_and_giveQuery(full_transcript)
-                    
-                    if intent not in ["irrelevant", "other", "error"] and cleaned_query:
-                        suggestion = generate_suggestion(intent, cleaned_query)
-                        print("[suggestion] Intent:", intent)
-                        print("[suggestion] Query:", cleaned_query)
-                        print("[suggestion] Final Suggestion:\n", suggestion)
+                    logger.debug("Processing transcript: %s", full_transcript, extra={"session_id": self.session_id})
+                    round_started = time.monotonic()
+                    # Time-to-suggestion counts from the transcript that triggered this round
+                    tracer.mark(self.session_id, "suggestion_round", latest=True)
+
+                    # Provider work waits for a scheduler slot, urgent calls first.
+                    # If it expires, keep the window and try again with more transcript
+                    try:
+                        async with suggestion_scheduler.slot(self.session_id, self.priority, "classify"):
+                            # Provider calls are blocking; keep them off the event loop
+                            if PIPELINE_MODE == "single_call":
+                                intent, cleaned_query, suggestion = await asyncio.to_thread(
+                                    classify_and_suggest, full_transcript, session_id=self.session_id
+                                )
+                            else:
+                                intent, cleaned_query = await aclassify_intent_and_giveQuery(
+                                    full_transcript, session_id=self.session_id
+                                )
+                                suggestion = None
+                    except JobExpired:
+                        return
+                    if priority_for(intent) == URGENT and self.priority != URGENT:
+                        self.priority = URGENT
+                        admission_controller.mark_urgent(self.session_id)
+
+                    actionable = intent not in ["irrelevant", "other", "error"] and cleaned_query
+                    if actionable and suggestion is None:
+                        try:
+                            async with suggestion_scheduler.slot(self.session_id, self.priority, "generate"):
+                                suggestion = await asyncio.to_thread(
+                                    generate_suggestion, intent, cleaned_query, session_id=self.session_id
+                                )
+                        except JobExpired:
+                            pass  # stale by now; start a fresh window below
+                    if actionable and suggestion is not None:
+                        suggestion_seconds.observe(time.monotonic() - round_started, PRIORITY_NAMES[self.priority])
+                        logger.info(
+                            "Suggestion generated (%d chars)", len(suggestion),
+                            extra={"session_id": self.session_id, "intent": intent, "query": cleaned_query},
+                        )
+                        logger.debug("Suggestion text: %s", suggestion, extra={"session_id": self.session_id})
                         
                         await self.write_suggestion(intent, cleaned_query, suggestion)
-                    else:
-                        print(f"[suggestion] No actionable intent found: {intent}")
+                    elif not actionable:
+                        logger.info("No actionable intent found: %s", intent, extra={"session_id": self.session_id})
                         if intent == "error":
-                            print(f"[suggestion] Error in classification: {cleaned_query}")
+                            logger.warning("Error in classification: %s", cleaned_query, extra={"session_id": self.session_id})
                     
                     # Reset for next round
                     self.final_transcripts = []
                     self.accumulated_text = ""
                     self.last_suggestion_time = current_time
+                    tracer.clear_mark(self.session_id, "suggestion_round")
                 else:
-                    print("[suggestion] No transcript text available")
+                    logger.debug("No transcript text available", extra={"session_id": self.session_id})
                     
-        except Exception as e:
-            print(f"[try_generate_suggestion] Error in suggestion generation: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error in suggestion generation", extra={"session_id": self.session_id})
+
+    def checkpoint(self) -> dict:
+        """Transcript window not yet turned into a suggestion, for resuming elsewhere"""
+        now = time.time()
+        return {
+            "final_transcripts": list(self.final_transcripts),
+            "accumulated_text": self.accumulated_text,
+            "seconds_since_suggestion": round(now - self.last_suggestion_time, 3),
+            "seconds_since_transcript": round(now - self.last_transcript_time, 3),
+        }
+
+    def restore(self, state: dict):
+        """Continue from a checkpoint taken by another process"""
+        now = time.time()
+        self.final_transcripts = list(state.get("final_transcripts", []))
+        self.accumulated_text = state.get("accumulated_text", "")
+        self.last_suggestion_time = now - state.get("seconds_since_suggestion", 0)
+        self.last_transcript_time = now - state.get("seconds_since_transcript", 0)
+
+    async def close(self):
+        """Flush and close the session's store and legacy file writers"""
+        for writer in (self.store_writer, self.transcript_writer, self.suggestion_writer):
+            if writer is None:
+                continue
+            try:
+                await writer.close()
+            except Exception as e:
+                logger.error("Error closing session writer: %s", e, extra={"session_id": self.session_id})
 
     async def read_transcript_file(self):
-        """Read existing transcript file as fallback"""
+        """Read the session's stored transcript as fallback"""
         try:
-            transcript_path = f"transcripts/{self.session_id}.txt"
-            if os.path.exists(transcript_path):
-                async with aiofiles.open(transcript_path, mode="r") as f:
-                    content = await f.read()
-                    lines = content.strip().split('\n')
-                    text_parts = []
-                    for line in lines:
-                        if '] ' in line:
-                            text_part = line.split('] ', 1)[1] if '] ' in line else line
-                            text_parts.append(text_part)
-                    return ' '.join(text_parts)
+            await self.store_writer.flush()
+            return await asyncio.to_thread(transcript_store.session_text, self.session_id)
         except Exception as e:
-            print(f"[read_transcript_file] Error reading transcript file: {e}")
+            logger.error("Error reading stored transcript: %s", e, extra={"session_id": self.session_id})
         return ""
 
     async def write_transcript(self, text: str):
-        """Write transcript to file"""
+        """Queue transcript line for the session store"""
         try:
-            os.makedirs("transcripts", exist_ok=True)
-            async with aiofiles.open(f"transcripts/{self.session_id}.txt", mode="a") as f:
+            await self.store_writer.write_transcript(text)
+            if self.transcript_writer:
                 timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                await f.write(f"[{timestamp}] {text}\n")
-                await f.flush()
+                await self.transcript_writer.write_text(f"[{timestamp}] {text}\n")
         except Exception as e:
-            print(f"[write_transcript] Error writing to file: {e}")
+            logger.error("Error writing transcript: %s", e, extra={"session_id": self.session_id})
 
     async def write_suggestion(self, intent: str, query: str, suggestion: str):
-        """Write suggestion to file and broadcast via WebSocket"""
+        """Store suggestion and broadcast via WebSocket"""
         try:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            suggestion_data = f"""
+            await self.store_writer.write_suggestion(intent, query, suggestion)
+
+            if self.suggestion_writer:
+                timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+                suggestion_data = f"""
 === SUGGESTION GENERATED ===
 Timestamp: {timestamp}
 Session ID: {self.session_id}
@@ -266,26 +356,31 @@ Suggestion:
 ================================
 
 """
-            
-            async with aiofiles.open(f"suggestions/{self.session_id}_suggestions.txt", mode="a") as f:
-                await f.write(suggestion_data)
-                await f.flush()
-                
-            print(f"[write_suggestion] Suggestion saved to suggestions/{self.session_id}_suggestions.txt")
+                await self.suggestion_writer.write_text(suggestion_data)
             
             # Broadcast suggestion via WebSocket to connected agents
             try:
                 if self.broadcast_callback:
-                    await self.broadcast_callback(suggestion)
-                    print(f"[write_suggestion] Suggestion broadcasted via callback")
+                    with tracer.span(self.session_id, "broadcast"):
+                        await self.broadcast_callback(suggestion)
+                    tracer.record_since(self.session_id, "suggestion_round", "time_to_suggestion")
+                    logger.debug("Suggestion broadcasted via callback", extra={"session_id": self.session_id})
             except Exception as ws_error:
-                print(f"[write_suggestion] WebSocket broadcast failed: {ws_error}")
+                logger.error("WebSocket broadcast failed: %s", ws_error, extra={"session_id": self.session_id})
             
         except Exception as e:
-            print(f"[write_suggestion] Error writing suggestion: {e}")
+            logger.error("Error writing suggestion: %s", e, extra={"session_id": self.session_id})
+
+async def stream_to_transcribe(session_id: str, audio_queue: asyncio.Queue, broadcast_callback,
+                               resume: dict = None, on_handler=None):
+    """Transcribe the queued audio until the None sentinel.
 
-async def stream_to_transcribe(session_id: str, audio_queue: asyncio.Queue, broadcast_callback):
-    print(f"[stream_to_transcribe] Starting transcription stream for session {session_id}")
+    resume is a handler checkpoint to continue from; on_handler receives the
+    handler once it exists, so the owner can checkpoint it later.
+    """
+    logger.info("Starting transcription stream", extra={"session_id": session_id})
+    handler = None
+    stream = None
 
     try:
         client = TranscribeStreamingClient(region="us-east-1")
@@ -299,13 +394,17 @@ async def stream_to_transcribe(session_id: str, audio_queue: asyncio.Queue, broa
             partial_results_stability="medium"
         )
 
-        print("[stream_to_transcribe] Connected to Amazon Transcribe")
+        logger.info("Connected to Amazon Transcribe", extra={"session_id": session_id})
 
         # Pass the callback down to the handler
         handler = MyTranscriptHandler(stream.output_stream, session_id, broadcast_callback)
+        if resume:
+            handler.restore(resume)
+        if on_handler is not None:
+            on_handler(handler)
 
         await asyncio.gather(
-            audio_stream_generator(audio_queue, stream.input_stream),
+            audio_stream_generator(audio_queue, stream.input_stream, session_id),
             handler.handle_events(),
             return_exceptions=True
         )
@@ -313,12 +412,22 @@ async def stream_to_transcribe(session_id: str, audio_queue: asyncio.Queue, broa
         # Final attempt to generate suggestion when stream ends
         await handler.try_generate_suggestion()
         
-        print("[stream_to_transcribe] Transcription finished")
+        logger.info("Transcription finished", extra={"session_id": session_id})
         
-    except Exception as e:
-        print(f"[stream_to_transcribe] Exception: {e}")
-        import traceback
-        traceback.print_exc()
+    except asyncio.CancelledError:
+        # Torn down by the session manager: close the ASR stream instead of leaving it to time out
+        logger.info("Transcription cancelled", extra={"session_id": session_id})
+        if stream is not None:
+            try:
+                await asyncio.wait_for(stream.input_stream.end_stream(), timeout=2)
+            except Exception:
+                pass
+        raise
+    except Exception:
+        logger.exception("Transcription stream failed", extra={"session_id": session_id})
+    finally:
+        if handler is not None:
+            await handler.close()
 
 # Test function to debug audio processing
 async def test_audio_conversion():
@@ -0,0 +1,239 @@
+"""
+Process-wide model provider clients.
+
+Building a client per call pays for a new connection pool, and with it a TCP
+and TLS handshake, on every request. This module keeps:
+- One sync and one async Anthropic client, each with a keep-alive httpx pool
+- ChatAnthropic instances cached per configuration (each keeps its own
+  Anthropic client once created)
+- shared_client, an lru_cache for client builders that builds each client
+  once even when the warm-up and the first request ask for it together
+- Semaphores capping in-flight requests, so bursts queue locally instead of
+  opening ever more connections
+- Token usage accounting per model
+
+The anthropic and langchain_anthropic packages (about 1.5s to import) are
+imported when the first client is built, not when this module loads.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional
+
+from dotenv import load_dotenv
+
+from config import LLM_MAX_CONNECTIONS, LLM_MAX_CONCURRENCY, LLM_KEEPALIVE_SECONDS
+from metrics import registry
+
+if TYPE_CHECKING:
+    import anthropic
+    import httpx
+    from langchain_anthropic import ChatAnthropic
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+_sync_limit = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_async_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class TokenUsage:
+    """Running totals of requests and tokens per model"""
+
+    def __init__(self):
+        self.by_model: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, input_tokens: int = 0, output_tokens: int = 0,
+               cache_read_tokens: int = 0, cache_write_tokens: int = 0):
+        with self._lock:
+            totals = self.by_model.setdefault(model, {
+                "requests": 0, "input_tokens": 0, "output_tokens": 0,
+                "cache_read_tokens": 0, "cache_write_tokens": 0,
+            })
+            totals["requests"] += 1
+            totals["input_tokens"] += input_tokens or 0
+            totals["output_tokens"] += output_tokens or 0
+            totals["cache_read_tokens"] += cache_read_tokens or 0
+            totals["cache_write_tokens"] += cache_write_tokens or 0
+
+    def record_response(self, model: str, response):
+        """Usage of an Anthropic message or LangChain chat response"""
+        self.record(model, **usage_of(response))
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {model: dict(totals) for model, totals in self.by_model.items()}
+
+
+token_usage = TokenUsage()
+
+
+def usage_of(response) -> Dict[str, int]:
+    """Token counts from an Anthropic Messages API response or a LangChain chat
+    response (including with_structured_output(..., include_raw=True) output)"""
+    if isinstance(response, dict):
+        response = response.get("raw")
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        }
+
+    metadata = getattr(response, "usage_metadata", None) or {}
+    details = metadata.get("input_token_details") or {}
+    return {
+        # LangChain already folds cached tokens into input_tokens
+        "input_tokens": metadata.get("input_tokens", 0) - details.get("cache_read", 0) - details.get("cache_creation", 0),
+        "output_tokens": metadata.get("output_tokens", 0),
+        "cache_read_tokens": details.get("cache_read", 0),
+        "cache_write_tokens": details.get("cache_creation", 0),
+    }
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+    )
+
+
+_sync_clients: Dict[Optional[float], "anthropic.Anthropic"] = {}
+_async_clients: Dict[Optional[float], "anthropic.AsyncAnthropic"] = {}
+_clients_lock = threading.Lock()
+
+
+def get_anthropic(timeout: Optional[float] = None) -> "anthropic.Anthropic":
+    """Shared sync client for a request timeout"""
+    with _clients_lock:
+        client = _sync_clients.get(timeout)
+        if client is None:
+            import anthropic
+            import httpx
+
+            # Retries are handled by the resilience layer
+            client = _sync_clients[timeout] = anthropic.Anthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,
+                timeout=timeout,
+                http_client=httpx.Client(limits=_limits(), timeout=timeout),
+            )
+        return client
+
+
+def get_async_anthropic(timeout: Optional[float] = None) -> "anthropic.AsyncAnthropic":
+    """Shared async client for a request timeout"""
+    with _clients_lock:
+        client = _async_clients.get(timeout)
+        if client is None:
+            import anthropic
+            import httpx
+
+            client = _async_clients[timeout] = anthropic.AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,
+                timeout=timeout,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=timeout),
+            )
+        return client
+
+
+def shared_client(builder):
+    """lru_cache(maxsize=None) for a client builder, serialised by a lock so
+    concurrent first calls wait for one build instead of each running it"""
+    cached = lru_cache(maxsize=None)(builder)
+    lock = threading.RLock()
+
+    @functools.wraps(builder)
+    def get(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    get.cache_clear = cached.cache_clear
+    return get
+
+
+@shared_client
+def get_chat_anthropic(model: str, temperature: float, max_tokens: int,
+                       timeout: Optional[float] = None) -> "ChatAnthropic":
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        default_request_timeout=timeout,
+        max_retries=0,
+    )
+
+
+def create_message(timeout: Optional[float] = None, **kwargs):
+    """messages.create on the shared sync client, within the concurrency limit"""
+    with _sync_limit:
+        message = get_anthropic(timeout).messages.create(**kwargs)
+    token_usage.record_response(kwargs.get("model", "unknown"), message)
+    return message
+
+
+async def acreate_message(timeout: Optional[float] = None, **kwargs):
+    """messages.create on the shared async client, within the concurrency limit"""
+    async with _async_limit:
+        message = await get_async_anthropic(timeout).messages.create(**kwargs)
+    token_usage.record_response(kwargs.get("model", "unknown"), message)
+    return message
+
+
+def provider_saturation() -> float:
+    """Share of the concurrency limit in use (0-1), the busier of the sync and async paths"""
+    # Both semaphore types keep their free slots in _value
+    in_use = max(LLM_MAX_CONCURRENCY - _sync_limit._value, LLM_MAX_CONCURRENCY - _async_limit._value)
+    return in_use / LLM_MAX_CONCURRENCY if LLM_MAX_CONCURRENCY else 0.0
+
+
+def invoke_chat(llm, messages, model: Optional[str] = None):
+    """Invoke a cached ChatAnthropic (or a runnable built on one) within the concurrency limit"""
+    with _sync_limit:
+        response = llm.invoke(messages)
+    token_usage.record_response(model or llm.model, response)
+    return response
+
+
+async def close_clients():
+    """Close the pooled connections (application shutdown)"""
+    with _clients_lock:
+        sync_clients = list(_sync_clients.values())
+        async_clients = list(_async_clients.values())
+        _sync_clients.clear()
+        _async_clients.clear()
+    for client in sync_clients:
+        client.close()
+    for client in async_clients:
+        await client.close()
+
+
+def _collect_token_usage():
+    usage = token_usage.summary()
+    return [
+        ("bankai_llm_requests_total", "counter", "Model requests with reported usage",
+         [({"model": model}, totals["requests"]) for model, totals in usage.items()]),
+        ("bankai_llm_tokens_total", "counter", "Tokens reported by the provider",
+         [({"model": model, "kind": kind[:-len("_tokens")]}, totals[kind])
+          for model, totals in usage.items()
+          for kind in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")]),
+    ]
+
+
+registry.register_collector(_collect_token_usage)
@@ -0,0 +1,261 @@
+"""
+Event-loop health monitoring and on-demand sampling profiles.
+
+Blocking work on the event loop (sync model calls, Supabase, bcrypt, file
+writes) stalls every WebSocket and stream at once. This module makes it
+visible:
+- A heartbeat task sleeps for a fixed interval and records how late it wakes
+  up; that delay is the event-loop lag
+- A watchdog thread notices when the heartbeat has not run for longer than
+  LOOP_BLOCK_THRESHOLD_SECONDS and captures the loop thread's stack while it
+  is still blocked, so the offending callback is named, not just timed
+- A sampling profiler walks the loop thread's (or every thread's) stack at a
+  fixed interval for a few seconds and aggregates the samples into hot
+  stacks and functions, or collapsed stacks for flame graph tools
+
+Stacks are read with sys._current_frames(), so nothing is patched and the
+monitor costs one short sleep per interval when the loop is healthy. The
+profiler runs in its own thread and can only sample when it holds the GIL,
+so a long C call that keeps the GIL shows up as fewer samples in the Python
+frame that made it; the watchdog's lag figures are not affected by this.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from config import (
+    LOOP_MONITOR_INTERVAL_SECONDS,
+    LOOP_BLOCK_THRESHOLD_SECONDS,
+    PROFILE_MAX_SECONDS,
+)
+from metrics import registry
+from tracing import percentile
+
+logger = logging.getLogger(__name__)
+
+LAG_HISTORY = 3000     # lag samples kept (5 minutes at the default interval)
+BLOCK_HISTORY = 50     # blocked-loop events kept with their stacks
+STACK_DEPTH = 40       # innermost frames kept per stack
+
+
+def frame_stack(frame, depth: int = STACK_DEPTH) -> List[str]:
+    """Outermost-first "file:line function" entries for a frame"""
+    entries = []
+    while frame is not None and len(entries) < depth:
+        code = frame.f_code
+        entries.append(f"{code.co_filename}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    entries.reverse()
+    return entries
+
+
+def frame_key(entry: str) -> str:
+    """Drop the line number so samples from one function aggregate together"""
+    location, _, function = entry.partition(" ")
+    return f"{location.rsplit(':', 1)[0]}:{function}"
+
+
+class LoopMonitor:
+    """Lag heartbeat plus a watchdog thread that catches long blocking callbacks"""
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_SECONDS,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_SECONDS):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = deque(maxlen=LAG_HISTORY)
+        self.max_lag = 0.0
+        self.ticks = 0
+        self.blocked_events = deque(maxlen=BLOCK_HISTORY)
+        self.blocked_by_stack: Counter = Counter()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._current_block: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._profile_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Loop monitor started (interval %.3fs, block threshold %.3fs)", self.interval, self.threshold)
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- Lag heartbeat ---
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self.lag.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self.ticks += 1
+            self._last_beat = now
+
+    # --- Watchdog ---
+
+    def _watch(self):
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(poll):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled > self.threshold:
+                if self._current_block is None:
+                    self._capture_block(stalled)
+                else:
+                    self._current_block["blocked_seconds"] = round(stalled, 3)
+            elif self._current_block is not None:
+                block = self._current_block
+                self._current_block = None
+                logger.warning(
+                    "Event loop blocked for %.3fs in %s", block["blocked_seconds"], block["culprit"],
+                    extra={"stack": block["stack"][-8:]},
+                )
+
+    def _capture_block(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = frame_stack(frame) if frame is not None else []
+        culprit = self._culprit(stack)
+        self._current_block = {
+            "at": time.time(),
+            "blocked_seconds": round(stalled, 3),
+            "culprit": culprit,
+            "stack": stack,
+        }
+        self.blocked_events.append(self._current_block)
+        self.blocked_by_stack[culprit] += 1
+
+    @staticmethod
+    def _culprit(stack: List[str]) -> str:
+        """Innermost frame from application code, else the innermost frame"""
+        for entry in reversed(stack):
+            if "site-packages" not in entry and "/lib/python" not in entry:
+                return entry
+        return stack[-1] if stack else "unknown"
+
+    # --- Reporting ---
+
+    def summary(self) -> Dict:
+        samples = sorted(self.lag)
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "block_threshold_seconds": self.threshold,
+            "lag_ms": {
+                "samples": len(samples),
+                "p50": round(percentile(samples, 50) * 1000, 2),
+                "p95": round(percentile(samples, 95) * 1000, 2),
+                "p99": round(percentile(samples, 99) * 1000, 2),
+                "last": round(self.lag[-1] * 1000, 2) if self.lag else 0.0,
+                "max": round(self.max_lag * 1000, 2),
+            },
+            "blocked": {
+                "total": sum(self.blocked_by_stack.values()),
+                "in_progress": self._current_block is not None,
+                "top_culprits": [
+                    {"culprit": culprit, "count": count} for culprit, count in self.blocked_by_stack.most_common(10)
+                ],
+            },
+        }
+
+    def recent_blocks(self, limit: int = 10) -> List[Dict]:
+        return list(self.blocked_events)[-limit:][::-1]
+
+    # --- Sampling profiler ---
+
+    def profile_running(self) -> bool:
+        return self._profile_lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005, all_threads: bool = False, top: int = 25) -> Dict:
+        """Sample stacks for `seconds`; blocking, so run it in a worker thread.
+
+        Raises RuntimeError if a profile is already running.
+        """
+        if not self._profile_lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            return self._sample(min(seconds, PROFILE_MAX_SECONDS), interval, all_threads, top)
+        finally:
+            self._profile_lock.release()
+
+    def _sample(self, seconds: float, interval: float, all_threads: bool, top: int) -> Dict:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        inclusive: Counter = Counter()
+        leaf: Counter = Counter()
+        samples = 0
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread or (not all_threads and thread_id != self._loop_thread_id):
+                    continue
+                keys = [frame_key(entry) for entry in frame_stack(frame)]
+                if not keys:
+                    continue
+                if all_threads:
+                    keys.insert(0, names.get(thread_id, str(thread_id)))
+                stacks[";".join(keys)] += 1
+                inclusive.update(set(keys))
+                leaf[keys[-1]] += 1
+                samples += 1
+            time.sleep(interval)
+
+        def share(count: int) -> float:
+            return round(100.0 * count / samples, 1) if samples else 0.0
+
+        return {
+            "seconds": seconds,
+            "interval_seconds": interval,
+            "samples": samples,
+            "threads": "all" if all_threads else "event_loop",
+            "top_functions_self": [{"function": key, "samples": n, "percent": share(n)} for key, n in leaf.most_common(top)],
+            "top_functions_total": [{"function": key, "samples": n, "percent": share(n)} for key, n in inclusive.most_common(top)],
+            "top_stacks": [{"stack": key.split(";"), "samples": n, "percent": share(n)} for key, n in stacks.most_common(top)],
+            # One "frame;frame;frame count" line per stack, for flamegraph.pl / speedscope
+            "collapsed": "\n".join(f"{key} {n}" for key, n in stacks.most_common()),
+        }
+
+
+# Global monitor instance (started with the app)
+loop_monitor = LoopMonitor()
+
+
+def _collect_loop():
+    summary = loop_monitor.summary()
+    return [
+        ("bankai_event_loop_lag_seconds", "gauge", "Recent event-loop lag",
+         [({"quantile": q}, summary["lag_ms"][key] / 1000) for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))]),
+        ("bankai_event_loop_blocked_total", "counter", "Times the loop was blocked past the threshold",
+         [({}, summary["blocked"]["total"])]),
+    ]
+
+
+registry.register_collector(_collect_loop)
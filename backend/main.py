@@ -14,22 +14,42 @@ between agents and customers for real-time audio communication.
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 import json
 import logging
 import os
 import asyncio
-from typing import Dict, List
+from typing import Dict, List, Optional
 import uuid
+from collections import Counter
 from datetime import datetime
 
-from auth.routes import router as auth_router, get_current_user
+from auth.routes import router as auth_router, get_current_user, require_admin
 from auth.models import User
 from supabase_service import supabase_service
-from live_transcriber import stream_to_transcribe
+from tracing import tracer
+from logging_config import setup_logging
+from transcript_store import transcript_store
+from audio_index import audio_file_index, session_index
+from audio_archive import audio_archiver, combine_chunks
+from main_llm import retrieval_stats, fallback_stats, query_embedder
+from resilience import resilience_summary
+from llm_clients import token_usage, close_clients
+from prompt_budget import prompt_stats
+from lexical_index import lexical_index
+from suggestion_catalogue import suggestion_catalogue
+from loop_monitor import loop_monitor
+from session_manager import session_manager, SessionNotActive, SessionDraining, CHECKPOINTED
+from admission import admission_controller, AdmissionRejected
+from records import ConnectionRecord, UploadRecord
+from warmup import warm_up
+from readiness import readiness
+from suggestion_scheduler import suggestion_scheduler
+from metrics import registry, signaling_messages, suggestion_broadcasts, audio_chunks_received, CONTENT_TYPE
+from config import RETRIEVAL_MODE, LOOP_MONITOR_ENABLED, PROFILE_MAX_SECONDS, WARMUP_ENABLED
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
@@ -47,15 +67,73 @@ app.add_middleware(
 # Include auth router (Supabase)
 app.include_router(auth_router)
 
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Watch the event loop for lag and blocking callbacks"""
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Load provider SDKs and open the knowledge base in the background instead of at import"""
+    if WARMUP_ENABLED:
+        warm_up.start()
+
+@app.on_event("startup")
+async def start_readiness_probes():
+    """Probe ffmpeg and the ASR endpoint in the background for /ready"""
+    readiness.start()
+
+@app.on_event("startup")
+async def resume_archiving():
+    """Transcode recordings the previous process saved but did not finish archiving"""
+    audio_archiver.resume()
+
+@app.on_event("startup")
+async def resume_sessions():
+    """Continue live sessions checkpointed by the previous process during a deploy"""
+    await session_manager.resume_from_checkpoints(broadcast_suggestion)
+
+DRAINING_RETRY_AFTER = "5"  # seconds; the replacement process is usually up by then
+
+def draining_error() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server is draining for a deploy; retry shortly",
+                         headers={"Retry-After": DRAINING_RETRY_AFTER})
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Release pooled model provider connections"""
+    await session_manager.shutdown()
+    await readiness.stop()
+    await loop_monitor.stop()
+    await close_clients()
+
 # --- Global State ---
-active_connections: Dict[WebSocket, Dict] = {}
-audio_storage: Dict[str, Dict] = {}
-audio_stream_queues: Dict[str, asyncio.Queue] = {}
-audio_chunks: Dict[str, List] = {}
+active_connections: Dict[WebSocket, ConnectionRecord] = {}
+audio_storage: Dict[str, UploadRecord] = {}
 
 # Store active suggestion WebSocket connections (From Version 1)
 suggestion_connections: List[WebSocket] = []
 
+# Scrape-time gauges over the state above
+def connections_by_role() -> Dict[str, int]:
+    counts = {"agent": 0, "customer": 0}
+    for info in list(active_connections.values()):
+        counts[info.role] = counts.get(info.role, 0) + 1
+    return counts
+
+registry.gauge_callback("signaling_connections", "Open signaling WebSockets", connections_by_role, labelname="role")
+registry.gauge_callback("suggestion_connections", "Open suggestion WebSockets", lambda: len(suggestion_connections))
+registry.gauge_callback("stream_sessions", "Live audio sessions by lifecycle state",
+                        lambda: dict(Counter(s.state for s in list(session_manager.sessions.values()))), labelname="state")
+registry.gauge_callback("stream_queue_depth", "Audio chunks waiting in transcription queues (sum and max)",
+                        lambda: {"sum": sum(s.queue.qsize() for s in list(session_manager.sessions.values())),
+                                 "max": max((s.queue.qsize() for s in list(session_manager.sessions.values())), default=0)},
+                        labelname="aggregate")
+registry.gauge_callback("buffered_chunk_bytes", "Uploaded audio held in memory for download/archiving",
+                        lambda: sum(s.bytes_received for s in list(session_manager.sessions.values()) if s.chunks))
+registry.gauge_callback("traced_sessions", "Sessions with live latency traces", lambda: len(tracer.sessions))
+
 # ==========================================
 #  1. SIGNALING WEBSOCKET (WebRTC)
 # ==========================================
@@ -80,12 +158,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
         return
 
     await websocket.accept()
-    active_connections[websocket] = {
-        "user_id": user_id,
-        "username": username,
-        "role": role,
-        "connected_at": datetime.utcnow()
-    }
+    active_connections[websocket] = ConnectionRecord(username, role, user_id=user_id)
 
     logger.info(f"WebSocket connected: {username} ({role})")
 
@@ -98,6 +171,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                 "username": username, 
                 "role": role
             }
+            signaling_messages.inc("received")
             await forward_message(websocket, message)
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {username}")
@@ -110,19 +184,20 @@ async def forward_message(sender_ws: WebSocket, message: Dict):
     if not sender_info:
         return
 
-    sender_role = sender_info["role"]
+    sender_role = sender_info.role
 
     for ws, user_info in active_connections.items():
         if ws != sender_ws:
             try:
                 should_forward = (
-                    (sender_role == "agent" and user_info["role"] == "customer") or
-                    (sender_role == "customer" and user_info["role"] == "agent") or
+                    (sender_role == "agent" and user_info.role == "customer") or
+                    (sender_role == "customer" and user_info.role == "agent") or
                     message.get("type") in ["peer-ready", "peer-disconnected"]
                 )
 
                 if should_forward:
                     await ws.send_text(json.dumps(message))
+                    signaling_messages.inc("delivered")
             except:
                 pass
 
@@ -165,8 +240,10 @@ async def broadcast_suggestion(suggestion: str):
     for i, websocket in enumerate(suggestion_connections):
         try:
             await websocket.send_text(message)
-            logger.info(f"[broadcast_suggestion] Successfully sent to connection {i}")
+            suggestion_broadcasts.inc("sent")
+            logger.debug("[broadcast_suggestion] Successfully sent to connection %d", i)
         except Exception as e:
+            suggestion_broadcasts.inc("failed")
             logger.error(f"[broadcast_suggestion] Failed to send: {e}")
             disconnected.append(websocket)
     
@@ -193,16 +270,10 @@ async def upload_audio(
     with open(file_path, "wb") as f:
         f.write(audio_data)
 
-    audio_storage[audio_id] = {
-        "audio_id": audio_id,
-        "filename": file.filename,
-        "file_path": file_path,
-        "uploaded_by": current_user.customer_id,
-        "user_email": current_user.email,
-        "role": current_user.role,
-        "size_bytes": len(audio_data),
-        "uploaded_at": datetime.utcnow()
-    }
+    audio_storage[audio_id] = UploadRecord(
+        audio_id, file.filename, file_path, current_user.customer_id, current_user.role,
+        len(audio_data), user_email=current_user.email,
+    )
 
     logger.info(f"Audio saved: {file_path} ({len(audio_data)} bytes) by {current_user.email}")
 
@@ -221,10 +292,10 @@ async def download_audio(audio_id: str, current_user: User = Depends(get_current
     audio_info = audio_storage[audio_id]
     
     # Check permissions
-    if current_user.role != "agent" and audio_info["uploaded_by"] != current_user.customer_id:
+    if current_user.role != "agent" and audio_info.uploaded_by != current_user.customer_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    file_path = audio_info["file_path"]
+    file_path = audio_info.file_path
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
 
@@ -238,22 +309,41 @@ async def start_audio_session(
     session_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    """Start audio streaming session"""
+    """Start audio streaming session.
+
+    Admission uses only server-side state: the customer id from the token, and
+    urgent priority when that customer's recent call was classified as urgent.
+    Priority is never taken from the request, since a customer could claim an
+    urgent intent to jump the queue.
+    """
     if current_user.role != "customer":
         raise HTTPException(status_code=403, detail="Only customers can start audio sessions")
-
-    if session_id in audio_stream_queues:
+    if session_manager.draining:
+        raise draining_error()
+    if session_manager.get(session_id) is not None:
         raise HTTPException(status_code=400, detail="Session already exists")
 
-    queue = asyncio.Queue()
-    audio_stream_queues[session_id] = queue
-
     os.makedirs("transcripts", exist_ok=True)
-    
-    # IMPORTANT: Pass the broadcast_suggestion callback here!
-    asyncio.create_task(stream_to_transcribe(session_id, queue, broadcast_suggestion))
 
-    audio_chunks[session_id] = []
+    # May wait in the admission queue for a few seconds before giving up
+    try:
+        await admission_controller.admit(session_id, current_user.customer_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Session already exists")
+    except AdmissionRejected as e:
+        detail = {"message": "Too many live sessions; retry later", "reason": e.reason,
+                  "queue_position": e.position, "estimated_wait_seconds": e.retry_after}
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+    # The manager owns the queue, transcription task and chunks until the session ends
+    try:
+        session_manager.start_session(session_id, current_user.customer_id, current_user.email, broadcast_suggestion)
+    except ValueError:
+        admission_controller.release(session_id)
+        raise HTTPException(status_code=400, detail="Session already exists")
+    except SessionDraining:
+        admission_controller.release(session_id)
+        raise draining_error()
 
     logger.info(f"Audio session started: {session_id} by {current_user.email}")
 
@@ -274,32 +364,30 @@ async def upload_audio_chunk(
     if current_user.role != "customer":
         raise HTTPException(status_code=403, detail="Only customers can upload audio chunks")
     
-    if session_id not in audio_stream_queues:
+    session = session_manager.active(session_id)
+    if session is None:
+        if session_manager.draining:
+            # Checkpointed; the next process resumes the session and accepts the retry
+            raise draining_error()
         raise HTTPException(status_code=404, detail="Session not found")
 
     chunk_data = await audio_chunk.read()
+    audio_chunks_received.inc()
 
-    # Feed transcription queue
-    await audio_stream_queues[session_id].put(chunk_data)
-
-    # Store chunk
-    if session_id not in audio_chunks:
-        audio_chunks[session_id] = []
-
-    audio_chunks[session_id].append({
-        "index": chunk_index,
-        "data": chunk_data,
-        "timestamp": datetime.utcnow(),
-        "size": len(chunk_data),
-        "customer_id": current_user.customer_id
-    })
+    # Feed the transcription queue and keep the chunk for download/archiving
+    try:
+        await session.add_chunk(chunk_data, chunk_index)
+    except SessionNotActive:
+        if session_manager.draining:
+            raise draining_error()
+        raise HTTPException(status_code=404, detail="Session not found")
 
-    logger.info(f"Audio chunk {chunk_index} uploaded for session {session_id}: {len(chunk_data)} bytes")
+    logger.debug("Audio chunk %d uploaded for session %s: %d bytes", chunk_index, session_id, len(chunk_data))
 
     return {
         "chunk_index": chunk_index,
         "size": len(chunk_data),
-        "session_chunks": len(audio_chunks[session_id])
+        "session_chunks": session.chunk_count
     }
 
 @app.post("/audio-stream/end/{session_id}")
@@ -307,68 +395,100 @@ async def end_audio_session(
     session_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    """End audio streaming session"""
-    if session_id not in audio_stream_queues:
+    """End audio streaming session (repeating the call is harmless)"""
+    # Ended and ending sessions resolve too, so check ownership on the same lookup
+    session = session_manager.lookup(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
+    if current_user.role != "agent" and session.customer_id != current_user.customer_id:
+        raise HTTPException(status_code=403, detail="Access denied")
 
-    # Clean up queues
-    del audio_stream_queues[session_id]
+    # Flushes the transcriber, archives the recording and releases the session's buffers
+    session = await session_manager.end(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.state == CHECKPOINTED:
+        # Handed to the next process; the retried call ends it there
+        raise draining_error()
 
     logger.info(f"Audio session ended: {session_id} by {current_user.email}")
 
-    return {"session_id": session_id, "status": "completed"}
+    archive_status = session.archive_record["status"] if session.archive_record else None
+    return {"session_id": session_id, "status": "completed", "archive_status": archive_status}
+
+@app.post("/audio-stream/abort/{session_id}")
+async def abort_audio_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Tear a session down without waiting for transcription to finish"""
+    session = session_manager.lookup(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if current_user.role != "agent" and session.customer_id != current_user.customer_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    session = await session_manager.abort(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    archive_status = session.archive_record["status"] if session.archive_record else None
+    return {"session_id": session_id, "status": session.state, "archive_status": archive_status}
+
+@app.get("/audio-stream/sessions")
+async def get_live_sessions(current_user: User = Depends(get_current_user)):
+    """Live sessions with their lifecycle state, buffers and reaper counters"""
+    if current_user.role != "agent":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return session_manager.summary()
 
 # ==========================================
 #  5. SESSION MANAGEMENT & DOWNLOADS
 # ==========================================
 @app.get("/audio-sessions")
-async def get_audio_sessions(current_user: User = Depends(get_current_user)):
-    """Get audio sessions for current user"""
-    sessions = []
-    
-    if current_user.role == "agent":
-        # Agents can see all sessions
-        for session_id, chunks in audio_chunks.items():
-            if chunks:
-                sessions.append({
-                    "session_id": session_id,
-                    "chunks_count": len(chunks),
-                    "customer_id": chunks[0].get("customer_id", "unknown"),
-                    "last_activity": chunks[-1]["timestamp"].isoformat()
-                })
-    else:
-        # Customers can only see their own sessions
-        for session_id, chunks in audio_chunks.items():
-            if chunks and chunks[0].get("customer_id") == current_user.customer_id:
-                sessions.append({
-                    "session_id": session_id,
-                    "chunks_count": len(chunks),
-                    "customer_id": current_user.customer_id,
-                    "last_activity": chunks[-1]["timestamp"].isoformat()
-                })
-    
-    return {"sessions": sessions}
+async def get_audio_sessions(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get audio sessions for current user (newest first, cursor-paginated)"""
+    # Agents can see all sessions, customers only their own
+    customer_id = None if current_user.role == "agent" else current_user.customer_id
+
+    try:
+        sessions, next_cursor = session_index.page(customer_id=customer_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {"sessions": sessions, "next_cursor": next_cursor}
 
 @app.get("/audio-stream/download/{session_id}")
 async def download_session_audio(session_id: str, current_user: User = Depends(get_current_user)):
     """Download complete session audio"""
-    if session_id not in audio_chunks:
+    session = session_manager.active(session_id)
+    if session is not None:
+        # Live session: serve straight from memory instead of writing another copy
+        if current_user.role != "agent" and session.customer_id != current_user.customer_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        chunks = list(session.chunks)
+        combined_data = await asyncio.to_thread(combine_chunks, chunks)
+        return Response(
+            content=combined_data,
+            media_type="audio/webm",
+            headers={"Content-Disposition": f'attachment; filename="session_{session_id}.webm"'}
+        )
+
+    record = audio_archiver.get(session_id)
+    if not record or not os.path.exists(record["file_path"]):
         raise HTTPException(status_code=404, detail="Session not found")
 
-    chunks = audio_chunks[session_id]
-    if chunks and current_user.role != "agent" and chunks[0].get("customer_id") != current_user.customer_id:
+    if current_user.role != "agent" and record["customer_id"] != current_user.customer_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    all_chunks = sorted(chunks, key=lambda x: x["index"])
-    combined_data = b"".join([chunk["data"] for chunk in all_chunks])
-
-    os.makedirs("sessions", exist_ok=True)
-    file_path = f"sessions/{session_id}_complete.webm"
-
-    with open(file_path, "wb") as f:
-        f.write(combined_data)
-
-    return FileResponse(path=file_path, filename=f"session_{session_id}.webm")
+    extension = os.path.splitext(record["file_path"])[1]
+    return FileResponse(path=record["file_path"], filename=f"session_{session_id}{extension}")
 
 @app.post("/audio-stream/save-local/{session_id}")
 async def save_session_to_local(
@@ -376,72 +496,61 @@ async def save_session_to_local(
     current_user: User = Depends(get_current_user)
 ):
     """Save session to local audio_files directory"""
-    if session_id not in audio_chunks:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    chunks = audio_chunks[session_id]
-    if not chunks:
-        raise HTTPException(status_code=400, detail="No audio chunks found")
-
-    if current_user.role != "agent" and chunks[0].get("customer_id") != current_user.customer_id:
-        raise HTTPException(status_code=403, detail="Access denied")
-
-    sorted_chunks = sorted(chunks, key=lambda x: x["index"])
-    combined_data = b"".join([chunk["data"] for chunk in sorted_chunks])
+    session = session_manager.active(session_id)
+    if session is not None:
+        chunks = list(session.chunks)
+        if not chunks:
+            raise HTTPException(status_code=400, detail="No audio chunks found")
 
-    audio_dir = "audio_files"
-    os.makedirs(audio_dir, exist_ok=True)
+        if current_user.role != "agent" and session.customer_id != current_user.customer_id:
+            raise HTTPException(status_code=403, detail="Access denied")
 
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"customer_{current_user.customer_id}_{session_id}_{timestamp}.webm"
-    file_path = f"{audio_dir}/{filename}"
+        # Identical content is deduplicated against an earlier save
+        record = await audio_archiver.archive_session(session_id, session.customer_id, chunks)
+    else:
+        # Ended sessions were already archived when they finished
+        record = audio_archiver.get(session_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="Session not found")
 
-    with open(file_path, "wb") as f:
-        f.write(combined_data)
+        if current_user.role != "agent" and record["customer_id"] != current_user.customer_id:
+            raise HTTPException(status_code=403, detail="Access denied")
 
-    file_size = os.path.getsize(file_path)
-    logger.info(f"Audio session saved: {file_path} ({file_size} bytes)")
+    logger.info(f"Audio session saved: {record['file_path']} ({record['file_size']} bytes)")
 
     return {
         "session_id": session_id,
-        "filename": filename,
-        "file_path": file_path,
-        "file_size": file_size,
-        "total_chunks": len(sorted_chunks),
-        "customer_id": current_user.customer_id,
-        "saved_at": datetime.utcnow().isoformat()
+        "filename": record["filename"],
+        "file_path": record["file_path"],
+        "file_size": record["file_size"],
+        "total_chunks": record["total_chunks"],
+        "customer_id": record["customer_id"],
+        "saved_at": record["saved_at"],
+        "archive_status": record["status"]
     }
 
 @app.get("/audio-stream/local-files")
-async def list_local_audio_files(current_user: User = Depends(get_current_user)):
-    """List all audio files in the audio_files directory"""
+async def list_local_audio_files(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """List audio files in the audio_files directory (newest first, cursor-paginated)"""
     if current_user.role != "agent":
          raise HTTPException(status_code=403, detail="Access denied")
 
-    audio_dir = "audio_files"
-    if not os.path.exists(audio_dir):
-        return {"files": [], "count": 0}
-    
-    files = []
-    for filename in os.listdir(audio_dir):
-        if filename.endswith(('.webm', '.wav', '.mp3', '.mp4')):
-            file_path = os.path.join(audio_dir, filename)
-            file_stat = os.stat(file_path)
-            files.append({
-                "filename": filename,
-                "size": file_stat.st_size,
-                "created": datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
-                "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                "path": file_path
-            })
-    
-    files.sort(key=lambda x: x["created"], reverse=True)
-    
+    try:
+        # The first call (or an external change to the directory) rescans it
+        files, next_cursor = await asyncio.to_thread(audio_file_index.page, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
     return {
         "files": files,
-        "count": len(files),
-        "total_size": sum(f["size"] for f in files),
-        "directory": audio_dir
+        "count": audio_file_index.count,
+        "total_size": audio_file_index.total_size,
+        "directory": audio_file_index.directory,
+        "next_cursor": next_cursor
     }
 
 @app.get("/audio-stream/download-local/{filename}")
@@ -461,6 +570,229 @@ async def download_local_audio_file(filename: str, current_user: User = Depends(
     
     return FileResponse(path=file_path, filename=filename)
 
+@app.get("/audio-stream/archive-stats")
+async def get_archive_stats(current_user: User = Depends(get_current_user)):
+    """Background archiving totals and compression ratio"""
+    if current_user.role != "agent":
+         raise HTTPException(status_code=403, detail="Access denied")
+
+    return audio_archiver.stats()
+
+# ==========================================
+#  6. METRICS
+# ==========================================
+@app.get("/metrics")
+async def get_metrics():
+    """All counters, gauges and histograms in Prometheus text format"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/metrics/latency")
+async def get_latency_metrics():
+    """Per-stage latency percentiles and time-to-suggestion SLO status"""
+    return tracer.summary()
+
+@app.get("/metrics/latency/{session_id}")
+async def get_session_latency(session_id: str, current_user: User = Depends(get_current_user)):
+    """Recent stage spans for a single streaming session"""
+    if current_user.role != "agent":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if session_id not in tracer.sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return tracer.sessions[session_id].summary()
+
+@app.get("/metrics/retrieval")
+async def get_retrieval_metrics():
+    """How retrievals were served, plus lexical index and catalogue state"""
+    return {
+        "mode": RETRIEVAL_MODE,
+        "served": dict(retrieval_stats),
+        "query_embedding": query_embedder.summary(),
+        "lexical_index": lexical_index.summary(),
+        "catalogue": suggestion_catalogue.summary(),
+    }
+
+@app.get("/metrics/llm-usage")
+async def get_llm_usage():
+    """Requests and tokens per model since startup"""
+    return token_usage.summary()
+
+@app.get("/metrics/prompts")
+async def get_prompt_metrics():
+    """Per-stage prompt size before/after compaction, reported input tokens and latency"""
+    return prompt_stats.summary()
+
+@app.get("/metrics/resilience")
+async def get_resilience_metrics():
+    """Circuit breaker state and call counters per model provider"""
+    return {
+        "breakers": resilience_summary(),
+        "fallbacks": dict(fallback_stats),
+    }
+
+@app.get("/metrics/admission")
+async def get_admission_metrics():
+    """Live session limits, admission queue, load signals and decisions"""
+    return admission_controller.summary()
+
+@app.get("/metrics/warmup")
+async def get_warm_up():
+    """Progress and timing of the background warm-up"""
+    return warm_up.summary()
+
+@app.get("/metrics/suggestions")
+async def get_suggestion_scheduling():
+    """Suggestion job slots, queue by priority and per-priority outcomes"""
+    return suggestion_scheduler.summary()
+
+# ==========================================
+#  7. TRANSCRIPT & SUGGESTION QUERIES
+# ==========================================
+def parse_cursor(cursor: Optional[str]):
+    """Decode a "<ts>:<id>" pagination cursor"""
+    if not cursor:
+        return None
+    try:
+        ts, row_id = cursor.split(":", 1)
+        return float(ts), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def make_cursor(rows: List[Dict], limit: int) -> Optional[str]:
+    if len(rows) < limit:
+        return None
+    return f"{rows[-1]['ts']}:{rows[-1]['id']}"
+
+@app.get("/suggestions")
+async def query_suggestions(
+    intent: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Query stored suggestions by intent, session and time range (newest first)"""
+    if current_user.role != "agent":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    limit = max(1, min(limit, 500))
+    rows = await asyncio.to_thread(
+        transcript_store.query_suggestions,
+        intent=intent,
+        session_id=session_id,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+        before=parse_cursor(cursor),
+    )
+
+    return {"suggestions": rows, "count": len(rows), "next_cursor": make_cursor(rows, limit)}
+
+@app.get("/transcripts/{session_id}")
+async def query_session_transcript(
+    session_id: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stored transcript lines for a session (oldest first)"""
+    if current_user.role != "agent":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    limit = max(1, min(limit, 500))
+    rows = await asyncio.to_thread(
+        transcript_store.query_transcripts,
+        session_id,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+        after=parse_cursor(cursor),
+    )
+
+    return {"session_id": session_id, "lines": rows, "count": len(rows), "next_cursor": make_cursor(rows, limit)}
+
+# ==========================================
+#  8. ADMIN: EVENT-LOOP HEALTH & PROFILING
+# ==========================================
+@app.get("/admin/loop")
+async def get_loop_health(limit: int = 10, current_user: User = Depends(require_admin)):
+    """Event-loop lag and the most recent blocking callbacks with their stacks"""
+    return {
+        **loop_monitor.summary(),
+        "recent_blocks": loop_monitor.recent_blocks(max(1, min(limit, 50))),
+    }
+
+@app.post("/admin/profile")
+async def run_profile(
+    seconds: float = 5.0,
+    interval_ms: float = 5.0,
+    all_threads: bool = False,
+    format: str = "json",
+    current_user: User = Depends(require_admin)
+):
+    """Sample the running server's stacks for a few seconds (format=collapsed for flame graphs)"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}]")
+    if not loop_monitor.running:
+        raise HTTPException(status_code=503, detail="Loop monitor is not running")
+    if loop_monitor.profile_running():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    try:
+        result = await asyncio.to_thread(
+            loop_monitor.profile, seconds, max(interval_ms, 1.0) / 1000, all_threads
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    logger.info("Profile by %s: %d samples over %.1fs", current_user.email, result["samples"], seconds)
+    if format == "collapsed":
+        return Response(content=result["collapsed"], media_type="text/plain")
+    result.pop("collapsed")
+    return result
+
+# ==========================================
+#  9. ADMIN: DRAINING FOR DEPLOYS
+# ==========================================
+@app.post("/admin/drain")
+async def drain_server(current_user: User = Depends(require_admin)):
+    """Refuse new sessions and checkpoint live ones for the next process to resume"""
+    logger.warning("Drain requested by %s", current_user.email)
+    return await session_manager.drain()
+
+@app.get("/admin/drain")
+async def get_drain_status(current_user: User = Depends(require_admin)):
+    """Whether the server is draining and what is still live"""
+    summary = session_manager.summary()
+    return {"draining": summary["draining"], "active": summary["active"], "ending": summary["ending"],
+            "totals": summary["totals"]}
+
+@app.delete("/admin/drain")
+async def cancel_drain(current_user: User = Depends(require_admin)):
+    """Accept sessions again (a deploy was called off) and resume what was checkpointed"""
+    session_manager.draining = False
+    resumed = await session_manager.resume_from_checkpoints(broadcast_suggestion)
+    return {"draining": False, **resumed}
+
+# ==========================================
+#  10. HEALTH & READINESS
+# ==========================================
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and its event loop is answering"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 when this instance can take low-latency calls, else 503 with the failing checks"""
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9795)
\ No newline at end of file
@@ -8,117 +8,388 @@ This module generates helpful suggestions for customer service agents using:
 
 The system retrieves relevant context from a knowledge base and generates
 actionable suggestions to help agents assist customers.
+
+boto3, langchain_aws and Chroma take over a second to import, so they are
+imported where the clients are built (first use, or the startup warm-up in
+warmup.py) rather than when this module loads.
 """
 
 import os
 import json
-import boto3
-from langchain_aws import BedrockLLM
-from langchain_chroma import Chroma
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from langchain_community.document_loaders import JSONLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.prompts import PromptTemplate
-from langchain.chains import create_retrieval_chain 
-from langchain.chains.combine_documents import create_stuff_documents_chain
+from tracing import tracer
+from llm_clients import shared_client
+from suggestion_catalogue import suggestion_catalogue, normalize_query
+from resilience import resilient_call, breakers, OPEN
+from prompt_budget import compress_context, estimate_tokens, prompt_stats
+from lexical_index import lexical_index, reciprocal_rank_fusion
+from config import (EMBED_CONCURRENCY, RETRIEVAL_K, INTENT_MIN_HITS, KB_PERSIST_DIR,
+                    RETRIEVAL_MODE, EMBED_BUDGET_SECONDS, EMBED_PROBE_SECONDS, RRF_K,
+                    EMBED_DEADLINE_SECONDS, GENERATE_DEADLINE_SECONDS, LLM_MAX_CONNECTIONS,
+                    RAG_CONTEXT_TOKENS, CATALOGUE_FALLBACK_THRESHOLD)
+
+chroma_dir = KB_PERSIST_DIR
+persist_dir = KB_PERSIST_DIR
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+# Intents too broad to have their own knowledge-base partition
+GENERIC_INTENTS = {"bank_related", "irrelevant", "other", "error"}
+
+# How each retrieval was served (hybrid, or lexical only and why)
+retrieval_stats = Counter()
+
+# Recent generated answers, served again when generation is failing
+RECENT_ANSWERS_SIZE = 256
+_recent_answers = OrderedDict()
+
+# How suggestions were served when generation failed
+fallback_stats = Counter()
+
+# Served when neither a recent nor a catalogue answer exists: the best
+# knowledge-base passage from the local BM25 index, or a generic prompt
+FALLBACK_PASSAGE_CHARS = 600
+KB_FALLBACK = "Suggestions are temporarily unavailable. From the knowledge base: {passage}"
+DEFAULT_FALLBACK = (
+    "Suggestions are temporarily unavailable. Confirm the customer's request and follow the standard "
+    "procedure for it: {query}"
+)
+
+# Style rules for suggestions, shared with the single-call pipeline
+ANSWER_GUIDELINES = """- Speak like a digital assistant guiding the user through Bank-AI's website or app.
+- Use terms like "click", "select", "enter account number", etc.
+- Never repeat the same instruction more than once.
+- Never copy the same line or step again.
+- If there are multiple UI terms for the same action (e.g., 'Check Status' and 'Know Status'), pick one.
+- If the answer has more than 2 steps, format them as a numbered list.
+- DO NOT include the source text or reference section. Only respond with the actual helpful answer.
+- Be brief, clear, and professional.
+"""
+
+# Fixed prompt template
+RAG_PROMPT = """
+You are an assistant for customer service of a fictional bank called Bank-AI.
+
+Use the following retrieved context to help the customer service expert answer the customer's question:
+""" + ANSWER_GUIDELINES + """
+Context:
+{context}
+
+Question:
+{input}
+
+Answer:
+"""
+RAG_PROMPT_TOKENS = estimate_tokens(RAG_PROMPT)
+
+def remember_answer(intent: str, query: str, answer: str):
+    key = (intent, normalize_query(query))
+    _recent_answers[key] = answer
+    _recent_answers.move_to_end(key)
+    while len(_recent_answers) > RECENT_ANSWERS_SIZE:
+        _recent_answers.popitem(last=False)
+
+def fallback_suggestion(intent: str, query: str) -> str:
+    """Cached or templated answer used when retrieval or generation fails"""
+    recent = _recent_answers.get((intent, normalize_query(query)))
+    if recent:
+        fallback_stats["recent"] += 1
+        return recent
+
+    # A looser catalogue match than the normal lookup, but still about the same question;
+    # anything weaker is left to the knowledge base passage below
+    cached = suggestion_catalogue.lookup(intent, query, threshold=CATALOGUE_FALLBACK_THRESHOLD)
+    if cached:
+        fallback_stats["catalogue"] += 1
+        return cached
+
+    # Local BM25 lookup: no provider call, so it works while Bedrock is down
+    docs = _lexical_search(query, intent, 1)
+    if docs:
+        fallback_stats["knowledge_base"] += 1
+        text = docs[0].page_content
+        passage = text.split("A:", 1)[1] if text.startswith("Q:") and "A:" in text else text
+        return KB_FALLBACK.format(passage=passage.strip()[:FALLBACK_PASSAGE_CHARS])
+
+    fallback_stats["template"] += 1
+    return DEFAULT_FALLBACK.format(query=query)
 
-chroma_dir = "chromaVectorStore"
-persist_dir = "chromaVectorStore"
+def bedrock_client(read_timeout: float):
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    # Retries and deadlines are handled by the resilience layer
+    return boto3.client(
+        "bedrock-runtime",
+        region_name="us-east-1",
+        config=BotoConfig(connect_timeout=2, read_timeout=read_timeout, retries={"max_attempts": 1},
+                          max_pool_connections=LLM_MAX_CONNECTIONS),
+    )
 
 class BedrockTitanEmbeddings(Embeddings):
-    def __init__(self, region_name="us-east-1"):
+    def __init__(self, region_name="us-east-1", max_workers=EMBED_CONCURRENCY):
         try:
-            self.client = boto3.client("bedrock-runtime", region_name=region_name)
+            self.client = bedrock_client(read_timeout=EMBED_DEADLINE_SECONDS)
             self.model_id = "amazon.titan-embed-text-v2:0"
+            self.max_workers = max_workers
         except Exception as e:
-            print(f"Error initializing Bedrock client: {e}")
+            logger.error("Error initializing Bedrock client: %s", e)
             raise
     
     def embed_documents(self, texts):
-        return [self.embed(t) for t in texts]
+        # Titan embeds one text per request, so batches are sent concurrently
+        if len(texts) <= 1 or self.max_workers <= 1:
+            return [self.embed(t) for t in texts]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(texts))) as pool:
+            return list(pool.map(self.embed, texts))
     
     def embed_query(self, text):
         return self.embed(text)
     
     def embed(self, text):
+        # Failures raise: a zero vector would silently return arbitrary matches
+        return resilient_call("titan_embed", self._invoke, text)
+
+    def _invoke(self, text):
+        request = json.dumps({"inputText": text[:8000]})  # Limit text length
+        response = self.client.invoke_model(modelId=self.model_id, body=request)
+        model_response = json.loads(response["body"].read())
+        return model_response["embedding"]
+
+@shared_client
+def get_vectorstore() -> "Chroma":
+    """Process-wide Chroma handle over the persisted knowledge base"""
+    from langchain_chroma import Chroma
+
+    embeddings = BedrockTitanEmbeddings(region_name="us-east-1")
+    return Chroma(
+        persist_directory=persist_dir,
+        embedding_function=embeddings
+    )
+
+def _partitioned_search(search, intent: str, k: int):
+    """Search the intent's partition first, topping up from the whole store"""
+    docs = []
+    if intent and intent not in GENERIC_INTENTS:
+        docs = search(k, intent)
+
+    if len(docs) < min(INTENT_MIN_HITS, k):
+        # Untagged or sparse partition: fall back to a global search
+        seen = {doc.page_content for doc in docs}
+        for doc in search(k, None):
+            if len(docs) >= k:
+                break
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                docs.append(doc)
+
+    return docs
+
+def _vector_search(query_vector, intent: str, k: int):
+    vectorstore = get_vectorstore()
+    return _partitioned_search(
+        lambda n, partition: vectorstore.similarity_search_by_vector(
+            query_vector, k=n, filter={"intent": partition} if partition else None
+        ),
+        intent, k,
+    )
+
+def _lexical_search(query: str, intent: str, k: int):
+    try:
+        return _partitioned_search(lambda n, partition: lexical_index.search(query, n, partition), intent, k)
+    except Exception as e:
+        logger.error("Lexical search failed: %s", e)
+        return []
+
+class QueryEmbedder:
+    """Query embeddings for hybrid retrieval, run in a small pool so retrieval can stop waiting.
+
+    An embedding is only started when it can plausibly arrive within the
+    budget: not while the titan_embed breaker is open, not while every worker
+    is busy (so nothing queues behind a slow Bedrock), and not while recent
+    embeddings run over budget, apart from one probe every probe_interval
+    seconds to notice recovery.
+    """
+
+    SMOOTHING = 0.2
+
+    def __init__(self, workers: int = 4, budget: float = EMBED_BUDGET_SECONDS,
+                 probe_interval: float = EMBED_PROBE_SECONDS):
+        self.workers = workers
+        self.budget = budget
+        self.probe_interval = probe_interval
+        self.latency: Optional[float] = None  # moving average of completed embeddings
+        self.in_flight = 0
+        self._last_probe = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query-embed")
+        self._lock = threading.Lock()
+
+    def _skip_reason(self) -> Optional[str]:
+        if breakers["titan_embed"].state == OPEN:
+            return "embed_breaker_open"
+        if self.in_flight >= self.workers:
+            return "embed_pool_busy"
+        if self.latency is not None and self.latency > self.budget:
+            now = time.monotonic()
+            if now - self._last_probe < self.probe_interval:
+                return "embed_slow"
+            self._last_probe = now
+        return None
+
+    def submit(self, query: str) -> Tuple[Optional[Future], Optional[str]]:
+        """Future of the query vector, or None and the reason it was not started"""
+        with self._lock:
+            reason = self._skip_reason()
+            if reason:
+                return None, reason
+            self.in_flight += 1
+        return self._pool.submit(self._embed, query), None
+
+    def _embed(self, query: str):
+        started = time.perf_counter()
         try:
-            request = json.dumps({"inputText": text[:8000]})  # Limit text length
-            response = self.client.invoke_model(modelId=self.model_id, body=request)
-            model_response = json.loads(response["body"].read())
-            return model_response["embedding"]
-        except Exception as e:
-            print(f"Error in embedding: {e}")
-            return [0.0] * 1024  # Return zero vector as fallback
+            vector = get_vectorstore().embeddings.embed_query(query)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.latency = seconds if self.latency is None else self.latency + self.SMOOTHING * (seconds - self.latency)
+        return vector
 
-def generate_suggestion(intent: str, query: str) -> str:
-    """Generate suggestion using RAG"""
+    def summary(self) -> Dict:
+        return {
+            "latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "budget_seconds": self.budget,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+        }
+
+query_embedder = QueryEmbedder()
+
+def retrieve_documents(query: str, intent: str = None, k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE):
+    """Retrieve context chunks with BM25, vector search, or both fused"""
+    if mode == "vector":
+        retrieval_stats["vector"] += 1
+        return _vector_search(get_vectorstore().embeddings.embed_query(query), intent, k)
+
+    if mode == "lexical":
+        retrieval_stats["lexical"] += 1
+        return _lexical_search(query, intent, k)
+
+    # Hybrid: embed the query while BM25 runs locally, but only wait for the
+    # embedding within the latency budget
+    started = time.perf_counter()
+    embedding, skipped = query_embedder.submit(query)
+    lexical_docs = _lexical_search(query, intent, k)
+
+    if embedding is None and lexical_docs:
+        retrieval_stats[f"lexical_{skipped}"] += 1
+        return lexical_docs
+
+    remaining = EMBED_BUDGET_SECONDS - (time.perf_counter() - started)
     try:
-        # Setup vector store
-        embeddings = BedrockTitanEmbeddings(region_name="us-east-1") 
-        vectorstore = Chroma(
-            persist_directory=persist_dir,
-            embedding_function= embeddings
-        )
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-        
-        # Initialize LLM
-        llm = BedrockLLM(
-            model_id="mistral.mistral-large-2402-v1:0",
-            client=boto3.client("bedrock-runtime", region_name="us-east-1"),
-            model_kwargs={
-                "temperature": 0.1,
-                "max_tokens": 512
-            }
-        )
-        
-        # Fixed prompt template
-        prompt = """
-You are an assistant for customer service of a fictional bank called Bank-AI.
+        if embedding is None:
+            # Nothing to fall back to: embed here rather than wait for a worker
+            query_vector = get_vectorstore().embeddings.embed_query(query)
+        else:
+            # Without lexical results there is nothing to fall back to, so wait
+            query_vector = embedding.result(timeout=max(remaining, 0) if lexical_docs else None)
+    except FuturesTimeout:
+        retrieval_stats["lexical_over_budget"] += 1
+        logger.debug("Query embedding over %.2fs budget; using lexical results only", EMBED_BUDGET_SECONDS)
+        return lexical_docs
+    except Exception as e:
+        retrieval_stats["lexical_embed_failed"] += 1
+        logger.warning("Query embedding failed; using lexical results only: %s", e)
+        return lexical_docs
 
-Use the following retrieved context to help the customer service expert answer the customer's question:
-- Speak like a digital assistant guiding the user through Bank-AI's website or app.
-- Use terms like "click", "select", "enter account number", etc.
-- Never repeat the same instruction more than once.
-- Never copy the same line or step again.
-- If there are multiple UI terms for the same action (e.g., 'Check Status' and 'Know Status'), pick one.
-- If the answer has more than 2 steps, format them as a numbered list.
-- DO NOT include the source text or reference section. Only respond with the actual helpful answer.
-- Be brief, clear, and professional.
+    retrieval_stats["hybrid"] += 1
+    vector_docs = _vector_search(query_vector, intent, k)
+    return reciprocal_rank_fusion([lexical_docs, vector_docs], k, RRF_K)
 
-Context:
-{context}
+@shared_client
+def get_rag_chain():
+    """Process-wide Mistral chain; the Bedrock client keeps its connections alive"""
+    from langchain_aws import BedrockLLM
+    from langchain.prompts import PromptTemplate
+    from langchain.chains.combine_documents import create_stuff_documents_chain
 
-Question:
-{input}
+    # Initialize LLM
+    llm = BedrockLLM(
+        model_id="mistral.mistral-large-2402-v1:0",
+        client=bedrock_client(read_timeout=GENERATE_DEADLINE_SECONDS),
+        model_kwargs={
+            "temperature": 0.1,
+            "max_tokens": 512
+        }
+    )
+    
+    # Fixed input variables
+    sanitized_template = PromptTemplate(
+        input_variables=['context', 'input'],  # Fixed variable names
+        template=RAG_PROMPT,
+    ) 
 
-Answer:
-"""
-        
-        # Fixed input variables
-        sanitized_template = PromptTemplate(
-            input_variables=['context', 'input'],  # Fixed variable names
-            template=prompt,
-        ) 
-
-        # Create chains
-        rag_chain = create_stuff_documents_chain(
-            llm=llm,
-            prompt=sanitized_template,
-        )
-        
-        full_rag = create_retrieval_chain(
-            retriever=retriever,
-            combine_docs_chain=rag_chain,
-        )
-
-        # Generate response
-        response = full_rag.invoke({'input': query})
-        return response.get('answer', 'I apologize, but I could not generate a helpful response.')
+    # Create chain
+    return create_stuff_documents_chain(
+        llm=llm,
+        prompt=sanitized_template,
+    )
+
+def rag_answer(intent: str, query: str, session_id: str = None) -> str:
+    """Retrieve and generate one answer; raises instead of falling back"""
+    rag_chain = get_rag_chain()
+
+    # Retrieve and generate as separate steps so each can be traced
+    with tracer.span(session_id, "retrieve"):
+        docs = retrieve_documents(query, intent)
+
+    # Keep only the passages that matter for this query
+    original_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+    docs = compress_context(query, docs, RAG_CONTEXT_TOKENS)
+    base_tokens = RAG_PROMPT_TOKENS + estimate_tokens(query)
+
+    started = time.perf_counter()
+    with tracer.span(session_id, "generate"):
+        answer = resilient_call("mistral_generate", rag_chain.invoke, {'input': query, 'context': docs})
+    # Bedrock Mistral reports no token usage here, so only estimates are recorded
+    prompt_stats.record(
+        "generate", base_tokens + sum(estimate_tokens(doc.page_content) for doc in docs),
+        base_tokens + original_tokens, time.perf_counter() - started, session_id=session_id,
+    )
+
+    if not answer or not answer.strip():
+        raise ValueError("empty answer from the RAG chain")
+    return answer
+
+def generate_suggestion(intent: str, query: str, session_id: str = None, use_catalogue: bool = True) -> str:
+    """Generate suggestion using RAG"""
+    if use_catalogue:
+        # Precomputed answer for a common phrasing of a high-frequency intent
+        with tracer.span(session_id, "catalogue"):
+            cached = suggestion_catalogue.lookup(intent, query)
+        if cached:
+            return cached
+
+    try:
+        answer = rag_answer(intent, query, session_id)
+        remember_answer(intent, query, answer)
+        return answer
         
     except Exception as e:
-        print(f"Error generating suggestion: {e}")
-        return f"I apologize, but I'm experiencing technical difficulties. Please contact customer support directly for assistance with: {query}"
+        logger.error("Error generating suggestion: %s", e, extra={"session_id": session_id, "intent": intent})
+        return fallback_suggestion(intent, query)
 
 # Test function
 def test_suggestion():
@@ -0,0 +1,244 @@
+"""
+Low-overhead metrics registry served in the Prometheus text exposition format.
+
+Hot paths only ever touch memory owned by their own thread:
+- Counter, Gauge (inc/dec) and Histogram keep one shard per thread; an update
+  is a dict lookup and an add on that shard, with no lock. Shards are summed
+  only when /metrics is scraped
+- Values that already live somewhere (connection maps, queue sizes, breaker
+  counters, token usage) are read at scrape time by collector callbacks, so
+  they cost nothing between scrapes
+
+Label values are passed positionally in the order the metric declared its
+label names, e.g. ffmpeg_runs.inc("decode", "ok").
+"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "bankai_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A collector returns families of (name, type, help, [(labels, value), ...])
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Sharded:
+    """Per-thread shards of {label values: value}"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._shards: List[Dict] = []
+        self._local = threading.local()
+        self._register_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._register_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _merged(self) -> Dict:
+        merged: Dict = {}
+        with self._register_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in shard.copy().items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def _labels(self, key: Tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._merged().get(labels, 0)
+
+    def collect(self) -> List[Family]:
+        samples = [(self._labels(key), value) for key, value in sorted(self._merged().items())]
+        return [(self.name + "_total", self.kind, self.help, samples)]
+
+
+class Gauge(_Sharded):
+    """Up/down gauge (e.g. processes in flight); each thread's net change is summed"""
+
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str):
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def collect(self) -> List[Family]:
+        samples = [(self._labels(key), value) for key, value in sorted(self._merged().items())]
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class Histogram(_Sharded):
+    """Cumulative-bucket histogram; each shard entry is [bucket counts..., +Inf count, sum]"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _merged(self) -> Dict:
+        merged: Dict = {}
+        with self._register_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, counts in shard.copy().items():
+                total = merged.setdefault(key, [0] * (len(self.buckets) + 2))
+                for index, count in enumerate(list(counts)):
+                    total[index] += count
+        return merged
+
+    def collect(self) -> List[Family]:
+        samples: List[Sample] = []
+        for key, counts in sorted(self._merged().items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                samples.append(({**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append(({**labels, "__suffix": "_sum"}, counts[-1]))
+            samples.append(({**labels, "__suffix": "_count"}, cumulative))
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class MetricsRegistry:
+    """Metrics and scrape-time collectors, rendered together"""
+
+    def __init__(self):
+        self._metrics: List[_Sharded] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        self._collectors.append(collector)
+
+    def gauge_callback(self, name: str, help_text: str, fn: Callable[[], object], labelname: Optional[str] = None):
+        """Gauge read at scrape time; fn returns a number, or {label value: number} with labelname"""
+        def collect():
+            value = fn()
+            if labelname:
+                samples = [({labelname: key}, number) for key, number in sorted(value.items())]
+            else:
+                samples = [({}, value)]
+            return [(PREFIX + name, "gauge", help_text, samples)]
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        families: List[Family] = []
+        for metric in self._metrics:
+            families.extend(metric.collect())
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", getattr(collector, "__name__", collector), e)
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                suffix = labels.pop("__suffix", "_bucket" if kind == "histogram" else "")
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics shared across modules
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram("stage_seconds", "Pipeline stage durations", ("stage",))
+provider_calls = registry.counter("provider_calls", "Model provider calls by outcome", ("dependency", "outcome"))
+provider_call_seconds = registry.histogram("provider_call_seconds", "Model provider call latency including retries",
+                                           ("dependency",))
+ffmpeg_processes = registry.gauge("ffmpeg_processes", "ffmpeg processes currently running", ("purpose",))
+ffmpeg_runs = registry.counter("ffmpeg_runs", "Completed ffmpeg runs by outcome", ("purpose", "outcome"))
+signaling_messages = registry.counter("signaling_messages", "Signaling messages received and delivered",
+                                      ("direction",))
+suggestion_broadcasts = registry.counter("suggestion_broadcasts", "Suggestion messages sent to agents",
+                                         ("outcome",))
+audio_chunks_received = registry.counter("audio_chunks_received", "Live audio chunks uploaded")
@@ -0,0 +1,193 @@
+"""
+Token budgeting for the classifier and RAG prompts.
+
+This module keeps prompts small and their cost visible:
+- trim_transcript(): keeps the most recent sentences plus earlier sentences
+  that mention banking terms, within a token budget
+- compress_context(): splits retrieved chunks into passages, scores them
+  against the query and keeps the best ones within a token budget, instead
+  of stuffing whole documents
+- cached_system(): marks a static prompt prefix for Anthropic prompt caching
+  (the provider only caches prefixes above its minimum length; Bedrock
+  Mistral has no prompt caching, so only compaction applies there)
+- prompt_stats: per-stage prompt size before/after compaction, provider
+  reported input tokens, cache reads and latency
+
+Token counts are estimated from character length, which is close enough for
+budgeting; provider-reported counts are recorded alongside when available.
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from config import PROMPT_CACHING
+from lexical_index import tokenize
+from tracing import StageHistogram
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+RECENT_SENTENCES = 2        # always kept, relevant or not
+MAX_PASSAGE_TOKENS = 120    # longer paragraphs are split into sentences
+RANK_PRIOR = 0.25           # weight of the retriever's ranking in passage scores
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+BANKING_TERMS = frozenset(tokenize("""
+account balance card debit credit atm branch loan emi transfer payment upi neft rtgs imps
+beneficiary deposit fd rd interest kyc aadhaar pan statement transaction refund charge fee
+fraud block unblock lost stolen pin otp password login app netbanking cheque withdraw
+withdrawal money cash bank open close complaint investment insurance forex
+"""))
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def is_relevant(sentence: str) -> bool:
+    return any(token in BANKING_TERMS for token in tokenize(sentence))
+
+
+def trim_transcript(transcript: str, max_tokens: int) -> str:
+    """Recent and banking-related sentences of a transcript, in order, within budget"""
+    transcript = transcript.strip()
+    if estimate_tokens(transcript) <= max_tokens:
+        return transcript
+
+    sentences = [s for s in SENTENCE_SPLIT.split(transcript) if s.strip()]
+    kept = []
+    budget = max_tokens
+    for position in range(len(sentences) - 1, -1, -1):
+        sentence = sentences[position].strip()
+        if position < len(sentences) - RECENT_SENTENCES and not is_relevant(sentence):
+            continue
+        cost = estimate_tokens(sentence)
+        if cost > budget:
+            if not kept:
+                # A single run-on sentence: keep its tail
+                kept.append((position, sentence[-budget * CHARS_PER_TOKEN:]))
+            break
+        kept.append((position, sentence))
+        budget -= cost
+
+    return " ".join(sentence for _, sentence in sorted(kept))
+
+
+def split_passages(text: str) -> List[str]:
+    passages = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= MAX_PASSAGE_TOKENS:
+            passages.append(paragraph)
+        else:
+            passages.extend(s.strip() for s in SENTENCE_SPLIT.split(paragraph) if s.strip())
+    return passages
+
+
+def compress_context(query: str, docs: List[Document], max_tokens: int) -> List[Document]:
+    """Best-scoring passages of the retrieved documents within budget"""
+    if sum(estimate_tokens(doc.page_content) for doc in docs) <= max_tokens:
+        return docs
+
+    query_terms = set(tokenize(query))
+    scored, seen = [], set()
+    for rank, doc in enumerate(docs):
+        for order, passage in enumerate(split_passages(doc.page_content)):
+            if passage in seen:
+                continue
+            seen.add(passage)
+            overlap = len(query_terms & set(tokenize(passage))) / (len(query_terms) or 1)
+            scored.append((overlap + RANK_PRIOR / (rank + 1), rank, order, passage))
+
+    selected = []
+    budget = max_tokens
+    for score, rank, order, passage in sorted(scored, key=lambda item: item[0], reverse=True):
+        cost = estimate_tokens(passage)
+        if cost > budget:
+            if not selected:
+                selected.append((rank, order, passage[:budget * CHARS_PER_TOKEN]))
+                budget = 0
+            continue
+        selected.append((rank, order, passage))
+        budget -= cost
+
+    # Reassemble per source document, keeping the original passage order
+    by_rank: Dict[int, List[str]] = {}
+    for rank, order, passage in sorted(selected):
+        by_rank.setdefault(rank, []).append(passage)
+    return [
+        Document(page_content="\n".join(passages), metadata=docs[rank].metadata)
+        for rank, passages in sorted(by_rank.items())
+    ]
+
+
+def cached_system(text: str) -> List[Dict]:
+    """System prompt blocks, with the static prefix marked for prompt caching"""
+    block = {"type": "text", "text": text}
+    if PROMPT_CACHING:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
+
+
+class PromptStats:
+    """Per-stage prompt sizes, provider token counts and latency"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, prompt_tokens: int, original_tokens: int, seconds: float,
+               input_tokens: Optional[int] = None, cache_read_tokens: int = 0, session_id: Optional[str] = None):
+        """prompt_tokens/original_tokens are estimates after/before compaction;
+        input_tokens is the provider's count when it reports one"""
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = {
+                    "calls": 0, "prompt_tokens": 0, "original_tokens": 0,
+                    "reported_calls": 0, "input_tokens": 0, "cache_read_tokens": 0,
+                    "latency": StageHistogram(),
+                }
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["original_tokens"] += original_tokens
+            if input_tokens is not None:
+                totals["reported_calls"] += 1
+                totals["input_tokens"] += input_tokens
+                totals["cache_read_tokens"] += cache_read_tokens or 0
+            totals["latency"].observe(seconds)
+
+        logger.debug(
+            "%s prompt: ~%d tokens (from ~%d), reported %s, %.3fs", stage, prompt_tokens, original_tokens,
+            input_tokens, seconds, extra={"session_id": session_id},
+        )
+
+    def summary(self) -> Dict:
+        with self._lock:
+            report = {}
+            for stage, totals in self.stages.items():
+                calls = totals["calls"]
+                reported = totals["reported_calls"]
+                report[stage] = {
+                    "calls": calls,
+                    "mean_prompt_tokens": round(totals["prompt_tokens"] / calls, 1),
+                    "mean_original_tokens": round(totals["original_tokens"] / calls, 1),
+                    "saved_pct": round(100 * (1 - totals["prompt_tokens"] / totals["original_tokens"]), 1)
+                    if totals["original_tokens"] else 0.0,
+                    "mean_input_tokens": round(totals["input_tokens"] / reported, 1) if reported else None,
+                    "cache_read_tokens": totals["cache_read_tokens"],
+                    "latency": totals["latency"].summary(),
+                }
+            return report
+
+
+# Global stats instance
+prompt_stats = PromptStats()
@@ -0,0 +1,176 @@
+"""
+Liveness and readiness for load balancers and deploy scripts.
+
+/health only says the process is up and its event loop answers. /ready says
+whether this instance can serve a low-latency call right now, and it must
+answer quickly even when a dependency is slow. So the checks are split:
+- Probes that touch the outside world (ffmpeg runs, a TCP connection to the
+  Amazon Transcribe streaming endpoint) run in a background task every
+  READY_PROBE_INTERVAL_SECONDS with a timeout; /ready reads their last result
+- Checks over in-process state (warm-up finished, event-loop lag, stream
+  and suggestion backlogs, draining) are computed on each request from
+  values that are already kept, so they cost a few comparisons
+
+An instance is ready when every check passes. Background probe results carry
+their age, and a result older than STALE_AFTER_INTERVALS intervals fails the
+check, so a stuck prober cannot keep an instance ready.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from config import (
+    READY_PROBE_INTERVAL_SECONDS, READY_PROBE_TIMEOUT_SECONDS, READY_ASR_ENDPOINT,
+    READY_MAX_LOOP_LAG_MS, READY_MAX_STREAM_QUEUE, READY_MAX_SUGGESTION_BACKLOG,
+    RETRIEVAL_MODE, WARMUP_ENABLED, LOOP_MONITOR_ENABLED,
+)
+from loop_monitor import loop_monitor
+from metrics import registry
+from session_manager import session_manager
+from suggestion_scheduler import suggestion_scheduler
+from tracing import percentile
+from warmup import warm_up
+
+logger = logging.getLogger(__name__)
+
+RECENT_LAG_SAMPLES = 50  # ~5s at the default monitor interval
+STALE_AFTER_INTERVALS = 3  # a probe result older than this many intervals no longer counts
+
+
+async def probe_ffmpeg(timeout: float) -> str:
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-version",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}")
+    return stdout.decode(errors="replace").splitlines()[0] if stdout else "ffmpeg"
+
+
+async def probe_asr(timeout: float) -> str:
+    """Resolve and open a TCP connection to the streaming endpoint (no stream is started)"""
+    host, _, port = READY_ASR_ENDPOINT.rpartition(":")
+    started = time.perf_counter()
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return f"connected to {READY_ASR_ENDPOINT} in {(time.perf_counter() - started) * 1000:.0f} ms"
+
+
+PROBES = {"ffmpeg": probe_ffmpeg, "asr": probe_asr}
+
+
+class Readiness:
+    """Cached background probes plus cheap in-process checks"""
+
+    def __init__(self, interval: float = READY_PROBE_INTERVAL_SECONDS, timeout: float = READY_PROBE_TIMEOUT_SECONDS):
+        self.interval = interval
+        self.timeout = timeout
+        self.probes: Dict[str, Dict] = {name: {"ok": False, "detail": "not probed yet"} for name in PROBES}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start probing on the running loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_forever(), name="readiness-probes")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _probe_forever(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self):
+        results = await asyncio.gather(*(fn(self.timeout) for fn in PROBES.values()), return_exceptions=True)
+        now = time.monotonic()
+        for name, result in zip(PROBES, results):
+            ok = not isinstance(result, BaseException)
+            detail = result if ok else (str(result) or type(result).__name__)
+            if ok != self.probes[name]["ok"]:
+                log = logger.info if ok else logger.warning
+                log("Readiness probe %s %s: %s", name, "passing" if ok else "failing", detail)
+            self.probes[name] = {"ok": ok, "detail": detail, "checked_at": now}
+
+    # --- In-process checks ---
+
+    @staticmethod
+    def _rag_warm() -> Dict:
+        if not WARMUP_ENABLED:
+            return {"ok": True, "detail": "warm-up disabled; clients load on first use"}
+        needed = ["rag_chain"]
+        needed += [] if RETRIEVAL_MODE == "vector" else ["lexical_index"]
+        needed += [] if RETRIEVAL_MODE == "lexical" else ["vector_store"]
+        if not warm_up.complete:
+            return {"ok": False, "detail": "warm-up in progress"}
+        failed = [name for name in needed if not warm_up.succeeded(name)]
+        return {"ok": not failed, "detail": f"failed: {', '.join(failed)}" if failed else "warm"}
+
+    @staticmethod
+    def _loop_lag() -> Dict:
+        if not LOOP_MONITOR_ENABLED:
+            return {"ok": True, "detail": "loop monitor disabled"}
+        recent = sorted(list(loop_monitor.lag)[-RECENT_LAG_SAMPLES:])
+        p95_ms = percentile(recent, 95) * 1000 if recent else 0.0
+        return {"ok": p95_ms <= READY_MAX_LOOP_LAG_MS, "detail": f"p95 {p95_ms:.1f} ms (max {READY_MAX_LOOP_LAG_MS:.0f})"}
+
+    @staticmethod
+    def _queues() -> Dict:
+        deepest = max((s.queue.qsize() for s in list(session_manager.sessions.values())), default=0)
+        backlog = sum(suggestion_scheduler.summary()["waiting"].values())
+        ok = deepest <= READY_MAX_STREAM_QUEUE and backlog <= READY_MAX_SUGGESTION_BACKLOG
+        return {"ok": ok, "detail": f"deepest stream queue {deepest} (max {READY_MAX_STREAM_QUEUE}), "
+                                    f"suggestion backlog {backlog} (max {READY_MAX_SUGGESTION_BACKLOG})"}
+
+    @staticmethod
+    def _not_draining() -> Dict:
+        return {"ok": not session_manager.draining, "detail": "draining" if session_manager.draining else "accepting"}
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        checks = {
+            "rag_warm": self._rag_warm(),
+            "loop_lag": self._loop_lag(),
+            "queues": self._queues(),
+            "not_draining": self._not_draining(),
+        }
+        for name, probe in self.probes.items():
+            checks[name] = {"ok": probe["ok"], "detail": probe["detail"]}
+            if "checked_at" in probe:
+                age = now - probe["checked_at"]
+                checks[name]["age_seconds"] = round(age, 1)
+                if age > STALE_AFTER_INTERVALS * self.interval + self.timeout:
+                    checks[name]["ok"] = False
+                    checks[name]["detail"] = f"stale: {probe['detail']}"
+        return {"ready": all(check["ok"] for check in checks.values()), "checks": checks}
+
+
+# Global readiness state (probes started with the app)
+readiness = Readiness()
+
+
+def _collect_readiness():
+    status = readiness.status()
+    return [
+        ("bankai_ready", "gauge", "1 when every readiness check passes", [({}, int(status["ready"]))]),
+        ("bankai_ready_check", "gauge", "Readiness checks (1 passing, 0 failing)",
+         [({"check": name}, int(check["ok"])) for name, check in status["checks"].items()]),
+    ]
+
+
+registry.register_collector(_collect_readiness)
@@ -0,0 +1,97 @@
+"""
+Compact record types for per-chunk and per-connection state.
+
+A live call keeps every uploaded chunk in memory until it is archived, and
+signaling keeps one entry per open WebSocket. As dicts, each of those
+carries a hash table plus a datetime object, which at thousands of chunks
+per call outweighs everything but the audio itself. These classes use
+__slots__ (no per-instance __dict__) and store time as an integer from
+time.monotonic_ns(), which is also safe to subtract when the wall clock
+steps. wall_clock() converts to a datetime at the edges that need one
+(checkpoints, indexes, API responses).
+
+benchmarks/record_memory.py measures the saving per record.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# Wall-clock time of monotonic zero in this process, for converting timestamps
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def wall_clock(monotonic_ns: int) -> datetime:
+    """UTC datetime (naive, like datetime.utcnow()) of a monotonic_ns timestamp"""
+    return datetime.utcfromtimestamp((monotonic_ns + _WALL_OFFSET_NS) / 1e9)
+
+
+def from_wall_clock(moment: datetime) -> int:
+    """monotonic_ns timestamp of a naive UTC datetime, e.g. read back from a checkpoint"""
+    epoch = (moment - datetime(1970, 1, 1)).total_seconds()
+    return int(epoch * 1e9) - _WALL_OFFSET_NS
+
+
+class ChunkRecord:
+    """One uploaded audio chunk of a live session (the session holds the customer id)"""
+
+    __slots__ = ("index", "data", "received_ns")
+
+    def __init__(self, index: int, data: bytes, received_ns: Optional[int] = None):
+        self.index = index
+        self.data = data
+        self.received_ns = time.monotonic_ns() if received_ns is None else received_ns
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def received_at(self) -> datetime:
+        return wall_clock(self.received_ns)
+
+
+class ConnectionRecord:
+    """An open signaling WebSocket's user"""
+
+    __slots__ = ("user_id", "username", "role", "connected_ns")
+
+    def __init__(self, username: str, role: str, user_id: Optional[str] = None):
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.connected_ns = time.monotonic_ns()
+
+    @property
+    def connected_seconds(self) -> float:
+        return (time.monotonic_ns() - self.connected_ns) / 1e9
+
+
+class UploadRecord:
+    """Metadata of a standalone audio upload"""
+
+    __slots__ = ("audio_id", "filename", "file_path", "uploaded_by", "user_email", "role", "size_bytes",
+                 "uploaded_ns")
+
+    def __init__(self, audio_id: str, filename: str, file_path: str, uploaded_by: str, role: str,
+                 size_bytes: int, user_email: Optional[str] = None):
+        self.audio_id = audio_id
+        self.filename = filename
+        self.file_path = file_path
+        self.uploaded_by = uploaded_by
+        self.user_email = user_email
+        self.role = role
+        self.size_bytes = size_bytes
+        self.uploaded_ns = time.monotonic_ns()
+
+    def to_dict(self) -> Dict:
+        return {
+            "audio_id": self.audio_id,
+            "filename": self.filename,
+            "file_path": self.file_path,
+            "uploaded_by": self.uploaded_by,
+            "user_email": self.user_email,
+            "role": self.role,
+            "size_bytes": self.size_bytes,
+            "uploaded_at": wall_clock(self.uploaded_ns).isoformat(),
+        }
@@ -0,0 +1,394 @@
+"""
+Deadlines, retries, hedging and circuit breaking for provider calls.
+
+Every outbound model call (Titan embeddings, Claude classification, Mistral
+generation, the single-call Claude pipeline) goes through a named CircuitBreaker:
+- Each call has an overall deadline; exceeding it raises DeadlineExceeded
+  instead of tying up the pipeline
+- Attempts that fail transiently (timeouts, connection errors, throttling,
+  5xx / overloaded) are retried with exponential backoff and full jitter
+  while the deadline allows; other errors (a malformed request, bad
+  credentials) are raised at once and do not count against the breaker
+- Optionally a duplicate (hedged) request is sent when the first has not
+  answered within hedge_after seconds; the first success wins
+- After a run of consecutive failed calls (each counted once, after its
+  last retry) the breaker opens and calls fail fast
+  with CircuitOpenError; after a cool-down one probe call is let through
+  (half-open) and its outcome closes or re-opens the breaker
+
+Synchronous calls (boto3 / LangChain clients) run their attempts on a shared
+thread pool, so callers on the event loop should use asyncio.to_thread; an
+attempt abandoned at the deadline keeps running in its worker until the
+client's own timeout and its result is discarded. Coroutine calls go through
+acall(), where abandoned attempts are cancelled.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import (
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS,
+    EMBED_DEADLINE_SECONDS, CLASSIFY_DEADLINE_SECONDS, GENERATE_DEADLINE_SECONDS,
+    EMBED_HEDGE_AFTER_SECONDS, CLASSIFY_HEDGE_AFTER_SECONDS, GENERATE_HEDGE_AFTER_SECONDS,
+)
+
+from metrics import registry, provider_calls, provider_call_seconds
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 0.1
+BACKOFF_MAX_SECONDS = 2.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Provider errors worth retrying, matched by class name (anywhere in the MRO)
+# or botocore error code so the SDKs need not be imported here
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ServiceUnavailableError", "OverloadedError",                           # anthropic
+    "EndpointConnectionError", "ConnectTimeoutError", "ReadTimeoutError",
+    "ConnectionClosedError",                                                # botocore
+    "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",  # httpx
+}
+TRANSIENT_ERROR_CODES = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+    "ServiceUnavailable", "InternalServerException", "InternalFailure", "ModelTimeoutException",
+    "ModelNotReadyException", "RequestTimeout", "RequestTimeoutException",
+}
+
+_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider-call")
+
+
+class CircuitOpenError(Exception):
+    """The dependency's breaker is open; the call was not attempted"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """No attempt succeeded before the call's deadline"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed attempt may succeed if repeated: a timeout, lost connection, throttling or 5xx.
+
+    Follows the cause chain, since LangChain re-raises provider errors as ValueError.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+            return True
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):  # botocore ClientError
+            if response.get("Error", {}).get("Code") in TRANSIENT_ERROR_CODES:
+                return True
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        else:
+            status = getattr(error, "status_code", None)
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker plus the call policy for one dependency"""
+
+    def __init__(self, name: str, deadline: float, retries: int = 1, hedge_after: Optional[float] = None,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge_after = hedge_after or None
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "rejected": 0,
+                         "client_errors": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "opened": 0}
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    # --- Breaker state ---
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state != CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._probe_in_flight = False
+
+    def record_client_error(self):
+        """The dependency answered but refused this request; it is healthy, so the breaker closes"""
+        with self._lock:
+            self.counters["client_errors"] += 1
+            self._consecutive_failures = 0
+            if self._state != CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self.counters["opened"] += 1
+                logger.warning("Circuit %s opened after %d consecutive failures",
+                               self.name, self._consecutive_failures)
+
+    # --- Calls ---
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn under this dependency's deadline, retry, hedge and breaker policy"""
+        with self._lock:
+            self.counters["calls"] += 1
+        if not self.allow():
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        expires = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            try:
+                result = self._attempt(fn, args, kwargs, remaining)
+            except DeadlineExceeded:
+                with self._lock:
+                    self.counters["timeouts"] += 1
+                self.record_failure()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    # Repeating a request the provider refused would fail the same way
+                    self.record_client_error()
+                    raise
+                backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                if attempt >= self.retries or backoff >= expires - time.monotonic() or not self.allow():
+                    # One failure per logical call, however many attempts it made
+                    self.record_failure()
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.counters["retries"] += 1
+                logger.debug("Retrying %s after %s (attempt %d)", self.name, e, attempt + 1)
+                time.sleep(backoff)
+                continue
+            self.record_success()
+            return result
+
+    def _attempt(self, fn: Callable, args, kwargs, remaining: float):
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{self.name} deadline of {self.deadline}s exceeded")
+        expires = time.monotonic() + remaining
+        first = _pool.submit(fn, *args, **kwargs)
+        pending = {first}
+
+        if self.hedge_after is not None and self.hedge_after < remaining:
+            done, _ = wait(pending, timeout=self.hedge_after)
+            if not done:
+                with self._lock:
+                    self.counters["hedges"] += 1
+                pending.add(_pool.submit(fn, *args, **kwargs))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, expires - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"{self.name} deadline of {self.deadline}s exceeded")
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        with self._lock:
+                            self.counters["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, fn: Callable[..., Awaitable], *args, **kwargs):
+        """Async counterpart of call() for coroutine functions; abandoned attempts are cancelled"""
+        with self._lock:
+            self.counters["calls"] += 1
+        if not self.allow():
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                result = await self._aattempt(fn, args, kwargs, expires - loop.time())
+            except DeadlineExceeded:
+                with self._lock:
+                    self.counters["timeouts"] += 1
+                self.record_failure()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    # Repeating a request the provider refused would fail the same way
+                    self.record_client_error()
+                    raise
+                backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                if attempt >= self.retries or backoff >= expires - loop.time() or not self.allow():
+                    # One failure per logical call, however many attempts it made
+                    self.record_failure()
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.counters["retries"] += 1
+                logger.debug("Retrying %s after %s (attempt %d)", self.name, e, attempt + 1)
+                await asyncio.sleep(backoff)
+                continue
+            self.record_success()
+            return result
+
+    async def _aattempt(self, fn: Callable[..., Awaitable], args, kwargs, remaining: float):
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{self.name} deadline of {self.deadline}s exceeded")
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + remaining
+        first = asyncio.ensure_future(fn(*args, **kwargs))
+        pending = {first}
+
+        try:
+            if self.hedge_after is not None and self.hedge_after < remaining:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+                if not done:
+                    with self._lock:
+                        self.counters["hedges"] += 1
+                    pending.add(asyncio.ensure_future(fn(*args, **kwargs)))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, expires - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceeded(f"{self.name} deadline of {self.deadline}s exceeded")
+                for future in done:
+                    if future.exception() is None:
+                        if future is not first:
+                            with self._lock:
+                                self.counters["hedge_wins"] += 1
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "deadline_seconds": self.deadline,
+                "retries": self.retries,
+                "hedge_after_seconds": self.hedge_after,
+                **self.counters,
+            }
+
+
+# One breaker per dependency
+breakers: Dict[str, CircuitBreaker] = {
+    "titan_embed": CircuitBreaker("titan_embed", EMBED_DEADLINE_SECONDS, retries=2,
+                                  hedge_after=EMBED_HEDGE_AFTER_SECONDS),
+    "claude_classify": CircuitBreaker("claude_classify", CLASSIFY_DEADLINE_SECONDS, retries=1,
+                                      hedge_after=CLASSIFY_HEDGE_AFTER_SECONDS),
+    "mistral_generate": CircuitBreaker("mistral_generate", GENERATE_DEADLINE_SECONDS, retries=1,
+                                       hedge_after=GENERATE_HEDGE_AFTER_SECONDS),
+    "claude_combined": CircuitBreaker("claude_combined", GENERATE_DEADLINE_SECONDS, retries=1,
+                                      hedge_after=GENERATE_HEDGE_AFTER_SECONDS),
+}
+
+
+def _outcome(error: Optional[BaseException]) -> str:
+    if error is None:
+        return "success"
+    if isinstance(error, CircuitOpenError):
+        return "rejected"
+    if isinstance(error, DeadlineExceeded):
+        return "timeout"
+    return "error"
+
+
+def resilient_call(name: str, fn: Callable, *args, **kwargs):
+    started = time.perf_counter()
+    error = None
+    try:
+        return breakers[name].call(fn, *args, **kwargs)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        provider_calls.inc(name, _outcome(error))
+        provider_call_seconds.observe(time.perf_counter() - started, name)
+
+
+async def aresilient_call(name: str, fn: Callable[..., Awaitable], *args, **kwargs):
+    started = time.perf_counter()
+    error = None
+    try:
+        return await breakers[name].acall(fn, *args, **kwargs)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        provider_calls.inc(name, _outcome(error))
+        provider_call_seconds.observe(time.perf_counter() - started, name)
+
+
+def resilience_summary() -> Dict:
+    return {name: breaker.summary() for name, breaker in breakers.items()}
+
+
+def _collect_breakers():
+    states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    summaries = resilience_summary()
+    return [
+        ("bankai_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+         [({"dependency": name}, states[summary["state"]]) for name, summary in summaries.items()]),
+        ("bankai_breaker_events_total", "counter", "Circuit breaker retries, hedges and openings",
+         [({"dependency": name, "event": event}, summary[event])
+          for name, summary in summaries.items() for event in ("retries", "hedges", "hedge_wins", "opened")]),
+    ]
+
+
+registry.register_collector(_collect_breakers)
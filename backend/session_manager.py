@@ -0,0 +1,456 @@
+"""
+Lifecycle of live audio streaming sessions.
+
+Each AudioSession owns everything a live call holds on to: the chunk queue
+feeding the decoder and Amazon Transcribe, the transcription task (decoder,
+ASR stream, transcript handler and its writers), the uploaded chunks kept
+for download and archiving, and the latency trace. SessionManager guarantees
+that all of it is released exactly once:
+- end() is graceful: it sends the end-of-stream sentinel, gives the
+  transcriber SESSION_END_GRACE_SECONDS to flush its final transcript and
+  suggestion, then cancels whatever is left
+- abort() cancels the transcription task straight away
+- Both are idempotent; concurrent or repeated calls wait for the same
+  teardown and return the same result
+- A reaper ends sessions with no uploads for SESSION_IDLE_TIMEOUT_SECONDS
+  (e.g. a closed browser tab) and sessions whose transcription task died
+- Teardown always hands the recording to the archiver and forgets the
+  session, so chunk buffers never outlive the call
+
+Sessions hold an admission slot (see admission.py) from start until
+teardown; _close() gives it back, which lets the next queued call start.
+
+For deploys, drain() stops new sessions and checkpoints the live ones
+instead of ending them: after the transcriber flushes, the session's
+metadata, chunk index, any audio still queued, the transcript window not yet
+turned into a suggestion and the uploaded chunks are written to
+SESSION_CHECKPOINT_DIR. The next process calls resume_from_checkpoints() at
+startup and carries on with the same session ids, so the client's uploads
+(retried after a 503 while the old process drains) land in the same call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from admission import admission_controller
+from audio_archive import audio_archiver
+from audio_index import session_index
+from records import ChunkRecord, from_wall_clock
+from config import (
+    SESSION_IDLE_TIMEOUT_SECONDS, SESSION_END_GRACE_SECONDS, SESSION_REAP_INTERVAL_SECONDS,
+    SESSION_CHECKPOINT_DIR, SESSION_CHECKPOINT_MAX_AGE_SECONDS, DRAIN_ON_SHUTDOWN,
+)
+from live_transcriber import stream_to_transcribe
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+ACTIVE, ENDING, ENDED, ABORTED, CHECKPOINTED = "active", "ending", "ended", "aborted", "checkpointed"
+RECENTLY_CLOSED = 256  # closed sessions remembered so a repeated end() gets the same answer
+
+
+class SessionNotActive(Exception):
+    """The session is unknown or is already being torn down"""
+
+
+class SessionDraining(Exception):
+    """The process is draining for a deploy and accepts no new sessions"""
+
+
+class AudioSession:
+    """One live call: its queue, transcription task and uploaded chunks"""
+
+    def __init__(self, session_id: str, customer_id: str, started_by: str):
+        self.session_id = session_id
+        self.customer_id = customer_id
+        self.started_by = started_by
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.chunks: List[ChunkRecord] = []
+        self.task: Optional[asyncio.Task] = None
+        self.handler = None  # set by the transcriber once connected, for checkpoints
+        self.resumed = False
+        self.next_chunk_index = 0
+        self.state = ACTIVE
+        self.end_reason: Optional[str] = None
+        self.archive_record: Optional[Dict] = None
+        self.started_at = datetime.utcnow()
+        self.last_activity = time.monotonic()
+        self.chunk_count = 0
+        self.bytes_received = 0
+        self._closed: Optional[asyncio.Future] = None
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_activity
+
+    async def add_chunk(self, data: bytes, index: int):
+        if self.state != ACTIVE:
+            raise SessionNotActive(self.session_id)
+        self.last_activity = time.monotonic()
+        self.chunk_count += 1
+        self.bytes_received += len(data)
+        self.next_chunk_index = max(self.next_chunk_index, index + 1)
+        await self.queue.put(data)
+
+        chunk = ChunkRecord(index, data)
+        self.chunks.append(chunk)
+        session_index.record_chunk(self.session_id, self.customer_id, chunk.received_at)
+
+    def summary(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "customer_id": self.customer_id,
+            "state": self.state,
+            "started_at": self.started_at.isoformat(),
+            "idle_seconds": round(self.idle_seconds, 1),
+            "chunks": self.chunk_count,
+            "bytes_received": self.bytes_received,
+            "queued_chunks": self.queue.qsize(),
+            "transcriber_running": self.task is not None and not self.task.done(),
+            "resumed": self.resumed,
+        }
+
+    def _on_handler(self, handler):
+        self.handler = handler
+
+
+class SessionManager:
+    """Registry of live sessions with idempotent teardown and an idle reaper"""
+
+    def __init__(self, idle_timeout: float = SESSION_IDLE_TIMEOUT_SECONDS,
+                 end_grace: float = SESSION_END_GRACE_SECONDS,
+                 reap_interval: float = SESSION_REAP_INTERVAL_SECONDS):
+        self.idle_timeout = idle_timeout
+        self.end_grace = end_grace
+        self.reap_interval = reap_interval
+        self.sessions: Dict[str, AudioSession] = {}
+        self.totals = {"started": 0, "ended": 0, "aborted": 0, "reaped_idle": 0, "reaped_failed": 0,
+                       "cancelled_on_end": 0, "checkpointed": 0, "resumed": 0, "expired_checkpoints": 0}
+        self.draining = False
+        self._reaper: Optional[asyncio.Task] = None
+        self._recently_closed: "OrderedDict[str, AudioSession]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[AudioSession]:
+        return self.sessions.get(session_id)
+
+    def lookup(self, session_id: str) -> Optional[AudioSession]:
+        """A live or recently closed session, as end/abort/checkpoint resolve it"""
+        return self.sessions.get(session_id) or self._recently_closed.get(session_id)
+
+    def active(self, session_id: str) -> Optional[AudioSession]:
+        session = self.sessions.get(session_id)
+        return session if session is not None and session.state == ACTIVE else None
+
+    def start_session(self, session_id: str, customer_id: str, started_by: str,
+                      broadcast_callback: Callable[[str], Awaitable]) -> AudioSession:
+        """Register a session and start its transcription task.
+
+        Raises ValueError if it exists and SessionDraining while draining.
+        """
+        if self.draining:
+            raise SessionDraining()
+        if session_id in self.sessions:
+            raise ValueError(f"Session {session_id} already exists")
+
+        session = AudioSession(session_id, customer_id, started_by)
+        self._start_transcriber(session, broadcast_callback)
+        self.sessions[session_id] = session
+        self.totals["started"] += 1
+        logger.info("Session started by %s", started_by, extra={"session_id": session_id})
+        return session
+
+    def _start_transcriber(self, session: AudioSession, broadcast_callback, resume: Optional[Dict] = None):
+        session.task = asyncio.create_task(
+            stream_to_transcribe(session.session_id, session.queue, broadcast_callback,
+                                 resume=resume, on_handler=session._on_handler),
+            name=f"transcribe-{session.session_id}",
+        )
+        self._ensure_reaper()
+
+    # --- Teardown ---
+
+    async def end(self, session_id: str, reason: str = "ended") -> Optional[AudioSession]:
+        """Finish transcription gracefully, then release everything; None if unknown"""
+        return await self._close(session_id, reason, ENDED)
+
+    async def abort(self, session_id: str, reason: str = "aborted") -> Optional[AudioSession]:
+        """Cancel transcription immediately, then release everything; None if unknown"""
+        return await self._close(session_id, reason, ABORTED)
+
+    async def checkpoint(self, session_id: str, reason: str = "drain") -> Optional[AudioSession]:
+        """Flush transcription, then save the session for another process to resume"""
+        return await self._close(session_id, reason, CHECKPOINTED)
+
+    async def _close(self, session_id: str, reason: str, outcome: str) -> Optional[AudioSession]:
+        session = self.lookup(session_id)
+        if session is None:
+            return None
+        if session._closed is not None:
+            # Teardown already under way (or done); share its outcome
+            await asyncio.shield(session._closed)
+            return session
+
+        session._closed = asyncio.get_running_loop().create_future()
+        session.state = ENDING
+        session.end_reason = reason
+        try:
+            await self._stop_transcriber(session, graceful=outcome != ABORTED)
+            if outcome == CHECKPOINTED and not await self._write_checkpoint(session):
+                outcome = ENDED  # could not save it; archive the recording instead
+            if outcome == CHECKPOINTED:
+                tracer.end_session(session_id)
+            else:
+                await self._release(session)
+        finally:
+            session.state = outcome
+            self.totals[outcome] += 1
+            self.sessions.pop(session_id, None)
+            admission_controller.release(session_id)
+            self._recently_closed[session_id] = session
+            while len(self._recently_closed) > RECENTLY_CLOSED:
+                self._recently_closed.popitem(last=False)
+            session._closed.set_result(None)
+            logger.info("Session %s (%s): %d chunks, %d bytes", session.state, reason,
+                        session.chunk_count, session.bytes_received, extra={"session_id": session_id})
+        return session
+
+    async def _stop_transcriber(self, session: AudioSession, graceful: bool):
+        task = session.task
+        if task is None or task.done():
+            return
+        if graceful:
+            # The generator flushes, ends the Transcribe stream and the handler writes its last suggestion
+            await session.queue.put(None)
+            done, _ = await asyncio.wait({task}, timeout=self.end_grace)
+            if done:
+                return
+            self.totals["cancelled_on_end"] += 1
+            logger.warning("Transcriber did not finish within %.1fs; cancelling", self.end_grace,
+                           extra={"session_id": session.session_id})
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def _release(self, session: AudioSession):
+        # Unblock anything still waiting on the queue and drop queued audio
+        while not session.queue.empty():
+            session.queue.get_nowait()
+        tracer.end_session(session.session_id)
+
+        chunks, session.chunks = session.chunks, []
+        if chunks:
+            try:
+                session.archive_record = await audio_archiver.archive_session(
+                    session.session_id, session.customer_id, chunks
+                )
+            except Exception as e:
+                logger.error("Archiving failed: %s", e, extra={"session_id": session.session_id})
+
+    # --- Drain, checkpoint and resume ---
+
+    @staticmethod
+    def _checkpoint_path(session_id: str, extension: str) -> str:
+        # Session ids come from the URL; never use them as file names
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(SESSION_CHECKPOINT_DIR, f"{name}{extension}")
+
+    async def _write_checkpoint(self, session: AudioSession) -> bool:
+        pending = []
+        while not session.queue.empty():
+            item = session.queue.get_nowait()
+            if item:
+                pending.append(item)
+
+        chunks = session.chunks
+        state = {
+            "session_id": session.session_id,
+            "customer_id": session.customer_id,
+            "started_by": session.started_by,
+            "started_at": session.started_at.isoformat(),
+            "checkpointed_at": time.time(),
+            "chunk_count": session.chunk_count,
+            "bytes_received": session.bytes_received,
+            "next_chunk_index": session.next_chunk_index,
+            "chunks": [{"index": c.index, "size": c.size, "timestamp": c.received_at.isoformat()} for c in chunks],
+            "pending_sizes": [len(item) for item in pending],
+            "transcript_window": session.handler.checkpoint() if session.handler is not None else None,
+        }
+
+        def write():
+            os.makedirs(SESSION_CHECKPOINT_DIR, exist_ok=True)
+            audio_path = self._checkpoint_path(session.session_id, ".audio")
+            with open(audio_path + ".tmp", "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk.data)
+                for item in pending:
+                    f.write(item)
+            os.replace(audio_path + ".tmp", audio_path)
+            # The JSON is written last; its presence marks a complete checkpoint
+            state_path = self._checkpoint_path(session.session_id, ".json")
+            with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(state_path + ".tmp", state_path)
+
+        try:
+            await asyncio.to_thread(write)
+        except Exception as e:
+            logger.error("Checkpoint failed: %s", e, extra={"session_id": session.session_id})
+            return False
+        session.chunks = []
+        logger.info("Checkpointed %d chunks, %d queued", len(chunks), len(pending),
+                    extra={"session_id": session.session_id})
+        return True
+
+    async def drain(self) -> Dict:
+        """Stop accepting sessions and checkpoint every live one (idempotent)"""
+        self.draining = True
+        session_ids = [sid for sid, session in self.sessions.items() if session.state == ACTIVE]
+        logger.warning("Draining: checkpointing %d live sessions", len(session_ids))
+        results = await asyncio.gather(*(self.checkpoint(sid) for sid in session_ids), return_exceptions=True)
+        return {
+            "draining": True,
+            "checkpointed": sum(1 for r in results if isinstance(r, AudioSession) and r.state == CHECKPOINTED),
+            "ended": sum(1 for r in results if isinstance(r, AudioSession) and r.state == ENDED),
+            "remaining": len(self.sessions),
+        }
+
+    async def resume_from_checkpoints(self, broadcast_callback: Callable[[str], Awaitable]) -> Dict:
+        """Pick up sessions checkpointed by a previous process (application startup)"""
+        result = {"resumed": 0, "expired": 0, "failed": 0}
+        if not os.path.isdir(SESSION_CHECKPOINT_DIR):
+            return result
+
+        for filename in sorted(os.listdir(SESSION_CHECKPOINT_DIR)):
+            if not filename.endswith(".json"):
+                continue
+            state_path = os.path.join(SESSION_CHECKPOINT_DIR, filename)
+            audio_path = state_path[:-len(".json")] + ".audio"
+            try:
+                state, data = await asyncio.to_thread(self._read_checkpoint, state_path, audio_path)
+                await self._resume(state, data, broadcast_callback, result)
+            except Exception as e:
+                result["failed"] += 1
+                logger.error("Could not resume checkpoint %s: %s", filename, e)
+                continue
+            for path in (state_path, audio_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        if result["resumed"] or result["expired"]:
+            logger.info("Checkpoints: %d sessions resumed, %d expired", result["resumed"], result["expired"])
+        return result
+
+    @staticmethod
+    def _read_checkpoint(state_path: str, audio_path: str):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        data = b""
+        if os.path.exists(audio_path):
+            with open(audio_path, "rb") as f:
+                data = f.read()
+        return state, data
+
+    async def _resume(self, state: Dict, data: bytes, broadcast_callback, result: Dict):
+        session_id = state["session_id"]
+        session = AudioSession(session_id, state["customer_id"], state["started_by"])
+        session.started_at = datetime.fromisoformat(state["started_at"])
+        session.chunk_count = state["chunk_count"]
+        session.bytes_received = state["bytes_received"]
+        session.next_chunk_index = state["next_chunk_index"]
+        session.resumed = True
+
+        offset = 0
+        for chunk in state["chunks"]:
+            session.chunks.append(ChunkRecord(
+                chunk["index"], data[offset:offset + chunk["size"]],
+                from_wall_clock(datetime.fromisoformat(chunk["timestamp"])),
+            ))
+            offset += chunk["size"]
+        pending = []
+        for size in state["pending_sizes"]:
+            pending.append(data[offset:offset + size])
+            offset += size
+
+        age = time.time() - state["checkpointed_at"]
+        if age > SESSION_CHECKPOINT_MAX_AGE_SECONDS or session_id in self.sessions:
+            # Too old for the client to still be sending; keep the recording and move on
+            self.totals["expired_checkpoints"] += 1
+            result["expired"] += 1
+            if session.chunks:
+                await audio_archiver.archive_session(session_id, session.customer_id, session.chunks)
+            return
+
+        for item in pending:
+            session.queue.put_nowait(item)
+        self._start_transcriber(session, broadcast_callback, resume=state.get("transcript_window"))
+        self.sessions[session_id] = session
+        # Already admitted by the previous process; only count it against capacity
+        admission_controller.force_admit(session_id, session.customer_id)
+        self.totals["resumed"] += 1
+        result["resumed"] += 1
+        logger.info("Resumed session checkpointed %.1fs ago", age, extra={"session_id": session_id})
+
+    # --- Reaper ---
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_forever(), name="session-reaper")
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("Session reaper failed")
+
+    async def reap(self):
+        """End idle sessions and sessions whose transcriber has stopped"""
+        for session in list(self.sessions.values()):
+            if session.state != ACTIVE:
+                continue
+            if session.idle_seconds > self.idle_timeout:
+                self.totals["reaped_idle"] += 1
+                logger.warning("Ending session idle for %.0fs", session.idle_seconds,
+                               extra={"session_id": session.session_id})
+                await self.end(session.session_id, reason="idle")
+            elif session.task is not None and session.task.done():
+                self.totals["reaped_failed"] += 1
+                logger.warning("Transcriber stopped on its own; ending session",
+                               extra={"session_id": session.session_id})
+                await self.end(session.session_id, reason="transcriber_stopped")
+
+    async def shutdown(self):
+        """Checkpoint (or, with DRAIN_ON_SHUTDOWN off, end) every session (application shutdown)"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        if DRAIN_ON_SHUTDOWN:
+            await self.drain()
+            return
+        await asyncio.gather(*(self.end(session_id, reason="shutdown") for session_id in list(self.sessions)),
+                             return_exceptions=True)
+
+    def summary(self) -> Dict:
+        return {
+            "draining": self.draining,
+            "active": sum(1 for session in self.sessions.values() if session.state == ACTIVE),
+            "ending": sum(1 for session in self.sessions.values() if session.state == ENDING),
+            "idle_timeout_seconds": self.idle_timeout,
+            "totals": dict(self.totals),
+            "sessions": [session.summary() for session in self.sessions.values()],
+        }
+
+
+# Global session manager
+session_manager = SessionManager()
+admission_controller.queue_depths = lambda: [
+    session.queue.qsize() for session in session_manager.sessions.values() if session.state == ACTIVE
+]
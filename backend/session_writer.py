@@ -0,0 +1,115 @@
+"""
+Buffered, batched writers for per-session transcript and suggestion files.
+
+This module provides:
+- BatchedWriter: collects items in memory and writes them in batches from a
+  worker thread, flushing when the buffer reaches a size limit or after a
+  short interval, whichever comes first
+- SessionFileWriter: a BatchedWriter that keeps one append-mode file open for
+  the lifetime of a session
+
+Compared to opening, appending, flushing and closing the file for every
+utterance, this keeps the per-utterance cost to a list append and moves all
+file I/O into one thread-pool hop per batch.
+"""
+
+import abc
+import asyncio
+import logging
+import os
+from typing import List, Optional
+
+from config import SESSION_FLUSH_INTERVAL_SECONDS, SESSION_FLUSH_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedWriter(abc.ABC):
+    """Buffers items and writes them in batches off the event loop"""
+
+    def __init__(self, flush_interval: float = SESSION_FLUSH_INTERVAL_SECONDS, max_batch_bytes: int = SESSION_FLUSH_BYTES):
+        self.flush_interval = flush_interval
+        self.max_batch_bytes = max_batch_bytes
+        self.closed = False
+        self._pending: List = []
+        self._pending_bytes = 0
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def write(self, item, size: int = 0):
+        """Queue an item; flushes immediately once the batch is large enough"""
+        if self.closed:
+            raise RuntimeError("Writer is closed")
+
+        self._pending.append(item)
+        self._pending_bytes += size
+
+        if self._pending_bytes >= self.max_batch_bytes:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            # Shielded so close() cancelling the timer never interrupts a write
+            await asyncio.shield(self.flush())
+        except Exception as e:
+            logger.error("Background flush failed: %s", e)
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = []
+            self._pending_bytes = 0
+            await asyncio.to_thread(self._write_batch, batch)
+
+    async def close(self):
+        """Flush remaining items and release the underlying resource"""
+        if self.closed:
+            return
+        # Set before any await: writes made while the final flush runs are
+        # rejected, so they cannot start a timer that reopens the resource
+        self.closed = True
+        timer = self._flush_task
+        self._flush_task = None
+        if timer and not timer.done():
+            timer.cancel()
+            await asyncio.gather(timer, return_exceptions=True)
+        await self.flush()
+        async with self._lock:
+            await asyncio.to_thread(self._close)
+
+    @abc.abstractmethod
+    def _write_batch(self, batch: List):
+        """Persist a batch of items (runs in a worker thread)"""
+
+    def _close(self):
+        """Release resources (runs in a worker thread)"""
+
+
+class SessionFileWriter(BatchedWriter):
+    """Appends text to a single file that stays open until the session ends"""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    async def write_text(self, text: str):
+        await self.write(text, len(text))
+
+    def _write_batch(self, batch: List[str]):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(batch))
+        self._file.flush()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,269 @@
+"""
+Precomputed suggestions for high-frequency intents.
+
+For intents such as balance_inquiry, card_lost_stolen and atm_nearby the
+generated answer hardly depends on the exact wording, yet every occurrence
+pays for retrieval plus a full Mistral generation. This module:
+- Builds a catalogue offline by running the normal RAG pipeline over a set
+  of common query variants per intent
+- Stores it as JSON together with the knowledge-base version it was built
+  against (kb_manifest.json)
+- Serves a catalogue answer at runtime when the cleaned query is close enough
+  to a known variant (token-set similarity above a threshold)
+- Ignores the catalogue entirely once the knowledge base version changes,
+  until it is rebuilt
+
+Usage:
+    python suggestion_catalogue.py build [--output data/suggestion_catalogue.json] [--allow-partial]
+    python suggestion_catalogue.py lookup balance_inquiry "what's my balance"
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from config import SUGGESTION_CATALOGUE_PATH, CATALOGUE_MATCH_THRESHOLD
+from kb_manifest import kb_version
+
+logger = logging.getLogger(__name__)
+
+# How often the knowledge-base manifest is re-read to detect staleness
+KB_VERSION_CHECK_SECONDS = 30.0
+
+# Common phrasings per intent; each becomes one catalogue entry
+SEED_QUERIES: Dict[str, List[str]] = {
+    "balance_inquiry": [
+        "How do I check my account balance?",
+        "What is my current balance?",
+        "How can I see my available balance in the app?",
+        "How do I get a mini statement?",
+        "Check balance using internet banking",
+    ],
+    "card_lost_stolen": [
+        "I lost my debit card",
+        "My credit card was stolen",
+        "What should I do if my card is lost?",
+        "How do I report a stolen card?",
+        "How do I get a replacement for a lost card?",
+    ],
+    "atm_nearby": [
+        "Where is the nearest ATM?",
+        "How do I find an ATM near me?",
+        "Find the nearest branch",
+        "Is there an ATM close to my location?",
+    ],
+    "card_block_unblock": [
+        "How do I block my card?",
+        "How do I unblock my debit card?",
+        "Temporarily freeze my card",
+    ],
+    "charges_fees": [
+        "What are the charges for a savings account?",
+        "What is the minimum balance penalty?",
+        "What fees apply to ATM withdrawals?",
+    ],
+    "fd_rd_info": [
+        "What are the fixed deposit interest rates?",
+        "How do I open a fixed deposit?",
+        "How do I open a recurring deposit?",
+    ],
+}
+
+STOPWORDS = frozenset("""
+a an the i me my we our you your it its is are was were be been am do does did can could
+would should will shall may might to of in on at for from with by about into near please
+how what where when which who why there this that these those and or if so just want need
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(query: str) -> FrozenSet[str]:
+    """Lowercased content words with plural/verb -s stripped"""
+    tokens = set()
+    for token in TOKEN_PATTERN.findall(query.lower().replace("'", "")):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return frozenset(tokens)
+
+
+def similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class SuggestionCatalogue:
+    """Runtime view of the catalogue file; reloads when the file changes"""
+
+    def __init__(self, path: str = SUGGESTION_CATALOGUE_PATH, threshold: float = CATALOGUE_MATCH_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.kb_version: Optional[str] = None
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+        self._entries: Dict[str, List[Tuple[FrozenSet[str], Dict]]] = {}
+        self._file_mtime: Optional[int] = None
+        self._current_kb_version: Optional[str] = None
+        self._kb_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Reload the file if it changed and re-check the knowledge-base version"""
+        now = time.monotonic()
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+
+            if mtime != self._file_mtime:
+                self._file_mtime = mtime
+                self._load()
+
+            if now - self._kb_checked_at >= KB_VERSION_CHECK_SECONDS:
+                self._kb_checked_at = now
+                self._current_kb_version = kb_version()
+
+    def _load(self):
+        self._entries = {}
+        self.kb_version = None
+        if self._file_mtime is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Could not load suggestion catalogue %s: %s", self.path, e)
+            return
+
+        self.kb_version = data.get("kb_version")
+        for intent, entries in data.get("intents", {}).items():
+            self._entries[intent] = [(normalize_query(entry["query"]), entry) for entry in entries]
+        logger.info("Loaded suggestion catalogue: %d intents (kb version %s)", len(self._entries), self.kb_version)
+
+    @property
+    def is_current(self) -> bool:
+        return bool(self._entries) and self.kb_version == self._current_kb_version
+
+    def lookup(self, intent: str, query: str, threshold: Optional[float] = None) -> Optional[str]:
+        """Catalogue answer for a close match, or None to fall through to RAG"""
+        threshold = self.threshold if threshold is None else threshold
+        self._refresh()
+        candidates = self._entries.get(intent)
+        if not candidates:
+            return None
+        if not self.is_current:
+            self.stats["stale"] += 1
+            return None
+
+        tokens = normalize_query(query)
+        best_score, best_entry = -1.0, None
+        for variant_tokens, entry in candidates:
+            score = similarity(tokens, variant_tokens)
+            if score > best_score:
+                best_score, best_entry = score, entry
+
+        if best_entry is None or best_score < threshold:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        logger.debug("Catalogue hit for %s (%.2f): %r ~ %r", intent, best_score, query, best_entry["query"])
+        return best_entry["suggestion"]
+
+    def summary(self) -> Dict:
+        self._refresh()
+        return {
+            "path": self.path,
+            "kb_version": self.kb_version,
+            "current": self.is_current,
+            "intents": {intent: len(entries) for intent, entries in self._entries.items()},
+            **self.stats,
+        }
+
+
+class CatalogueBuildError(RuntimeError):
+    """Some seed queries got no grounded answer; the existing catalogue was kept"""
+
+
+def build_catalogue(path: str = SUGGESTION_CATALOGUE_PATH, seeds: Dict[str, List[str]] = SEED_QUERIES,
+                    allow_partial: bool = False) -> Dict:
+    """Generate an answer for every seed query and write the catalogue.
+
+    Entries whose retrieval or generation fails are never stored, since an
+    apology or fallback text would then be served as a catalogue hit. Unless
+    allow_partial is set, any failure raises CatalogueBuildError before the
+    file is touched, so the previous catalogue stays in place.
+    """
+    from main_llm import rag_answer  # main_llm uses the catalogue at runtime
+
+    version = kb_version()
+    catalogue = {"kb_version": version, "built_at": datetime.utcnow().isoformat(), "intents": {}}
+    failed: List[Tuple[str, str, str]] = []
+
+    for intent, queries in seeds.items():
+        entries = []
+        for query in queries:
+            started = time.perf_counter()
+            try:
+                suggestion = rag_answer(intent, query)
+            except Exception as e:
+                failed.append((intent, query, str(e) or type(e).__name__))
+                logger.warning("%s: %r failed, skipping: %s", intent, query, e)
+                continue
+            entries.append({"query": query, "suggestion": suggestion})
+            logger.info("%s: %r (%.1fs)", intent, query, time.perf_counter() - started)
+        if entries:
+            catalogue["intents"][intent] = entries
+
+    if failed and not allow_partial:
+        raise CatalogueBuildError(f"{len(failed)} seed queries failed; kept {path}: "
+                                  + "; ".join(f"{intent} {query!r}: {error}" for intent, query, error in failed))
+    if not catalogue["intents"]:
+        raise CatalogueBuildError(f"No seed query produced an answer; kept {path}")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(catalogue, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return catalogue
+
+
+# Global catalogue instance (loads lazily on first lookup)
+suggestion_catalogue = SuggestionCatalogue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputed suggestion catalogue tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Generate the catalogue against the current knowledge base")
+    build.add_argument("--output", default=SUGGESTION_CATALOGUE_PATH)
+    build.add_argument("--allow-partial", action="store_true",
+                       help="Write the catalogue without the entries that failed instead of keeping the old one")
+    lookup = subcommands.add_parser("lookup", help="Show what the catalogue would serve for a query")
+    lookup.add_argument("intent")
+    lookup.add_argument("query")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        try:
+            result = build_catalogue(args.output, allow_partial=args.allow_partial)
+        except CatalogueBuildError as e:
+            raise SystemExit(str(e))
+        count = sum(len(entries) for entries in result["intents"].values())
+        print(f"Built {count} entries for {len(result['intents'])} intents (kb version {result['kb_version']})")
+    else:
+        answer = suggestion_catalogue.lookup(args.intent, args.query)
+        print(answer if answer is not None else f"No catalogue match: {suggestion_catalogue.summary()}")
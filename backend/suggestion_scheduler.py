@@ -0,0 +1,153 @@
+"""
+Priority scheduling of suggestion work across live sessions.
+
+Intent classification and suggestion generation are the expensive steps of a
+live call, and every session's handler used to call the providers as soon as
+it had enough transcript. When providers are saturated that makes a fraud
+call wait behind routine balance questions. SuggestionScheduler puts a
+priority gate in front of both steps:
+- At most SUGGESTION_CONCURRENCY jobs run at once; the rest wait in a heap
+- Urgent sessions (admitted as urgent, or with any classification so far in
+  the call in URGENT_INTENTS) go first; a session stays urgent once it has
+  been classified as such
+- Within a priority, generation (finishing work already classified) goes
+  before classification, then the session that has been served least, so a
+  chatty call cannot crowd out a quiet one; then arrival order
+- A job still queued SUGGESTION_DEADLINE_SECONDS after it was submitted is
+  dropped with JobExpired: by then the transcript window has moved on and
+  the agent no longer needs the answer
+
+Usage:
+    async with suggestion_scheduler.slot(session_id, priority, "classify"):
+        ...provider calls...
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from admission import PRIORITY_NAMES
+from config import SUGGESTION_CONCURRENCY, SUGGESTION_DEADLINE_SECONDS
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STAGES = {"generate": 0, "classify": 1}  # lower runs first within a priority
+SERVED_SESSIONS_KEPT = 1000  # sessions remembered for fairness
+
+suggestion_jobs = registry.counter("suggestion_jobs", "Suggestion jobs by priority and outcome",
+                                   ("priority", "outcome"))
+suggestion_queue_seconds = registry.histogram("suggestion_queue_seconds", "Time suggestion jobs waited for a slot",
+                                              ("priority", "stage"))
+suggestion_seconds = registry.histogram("suggestion_seconds", "Suggestion round latency including queueing",
+                                        ("priority",))
+
+
+class JobExpired(Exception):
+    """The job waited past its deadline and was dropped"""
+
+
+class _Job:
+    def __init__(self, session_id: str, priority: int, stage: str, deadline: float):
+        self.session_id = session_id
+        self.priority = priority
+        self.stage = stage
+        self.deadline = deadline
+        self.submitted_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class SuggestionScheduler:
+    """Priority, fairness and deadlines for suggestion provider work"""
+
+    def __init__(self, concurrency: int = SUGGESTION_CONCURRENCY, deadline: float = SUGGESTION_DEADLINE_SECONDS):
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.running = 0
+        self.served: Counter = Counter()  # jobs started per session
+        self.totals: Counter = Counter()
+        self._queue: List = []  # heap of (priority, stage rank, served, sequence, _Job)
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, priority: int, stage: str):
+        """Hold one of the concurrent slots; raises JobExpired if none frees up in time"""
+        await self._acquire(session_id, priority, stage)
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+    async def _acquire(self, session_id: str, priority: int, stage: str) -> _Job:
+        job = _Job(session_id, priority, stage, time.monotonic() + self.deadline)
+        heapq.heappush(self._queue, (priority, STAGES[stage], self.served[session_id], next(self._sequence), job))
+        self._dispatch()
+        try:
+            # Not wait_for: it swallows a cancellation that arrives just as the slot is granted
+            await asyncio.wait({job.future}, timeout=self.deadline)
+        except asyncio.CancelledError:
+            self._withdraw(job)
+            raise
+
+        if not job.future.done():
+            self._withdraw(job)
+            self._count(job, "expired")
+            logger.warning("Dropped %s job queued past its %.1fs deadline", stage, self.deadline,
+                           extra={"session_id": session_id})
+            raise JobExpired(stage)
+        suggestion_queue_seconds.observe(time.monotonic() - job.submitted_at, PRIORITY_NAMES[priority], stage)
+        self._count(job, "started")
+        return job
+
+    def _dispatch(self):
+        while self._queue and self.running < self.concurrency:
+            job = heapq.heappop(self._queue)[-1]
+            if job.future.done():
+                continue
+            if time.monotonic() > job.deadline:
+                # The waiter wakes on its own timeout and reports the expiry
+                continue
+            self.running += 1
+            self.served[job.session_id] += 1
+            job.future.set_result(None)
+        while len(self.served) > SERVED_SESSIONS_KEPT:
+            del self.served[next(iter(self.served))]
+
+    def _withdraw(self, job: _Job):
+        if job.future.done():
+            # Granted while being cancelled; give the slot back
+            self.running -= 1
+            self._dispatch()
+            return
+        job.future.cancel()
+        self._queue = [entry for entry in self._queue if entry[-1] is not job]
+        heapq.heapify(self._queue)
+
+    def _count(self, job: _Job, outcome: str):
+        self.totals[f"{PRIORITY_NAMES[job.priority]}_{outcome}"] += 1
+        suggestion_jobs.inc(PRIORITY_NAMES[job.priority], outcome)
+
+    def summary(self) -> Dict:
+        waiting = Counter(PRIORITY_NAMES[entry[0]] for entry in self._queue if not entry[-1].future.done())
+        return {
+            "concurrency": self.concurrency,
+            "deadline_seconds": self.deadline,
+            "running": self.running,
+            "waiting": dict(waiting),
+            "totals": dict(self.totals),
+        }
+
+
+# Global scheduler shared by every session's transcript handler
+suggestion_scheduler = SuggestionScheduler()
+
+registry.gauge_callback("suggestion_jobs_running", "Suggestion jobs holding a slot",
+                        lambda: suggestion_scheduler.running)
+registry.gauge_callback("suggestion_jobs_waiting", "Suggestion jobs queued for a slot",
+                        lambda: sum(1 for entry in suggestion_scheduler._queue if not entry[-1].future.done()))
@@ -8,19 +8,24 @@ This module provides:
 - User data retrieval from Supabase database
 
 Handles all database operations for user management using Supabase as the backend.
+The Supabase client (and the supabase package, ~0.5s to import) is created on
+first use, so importing this module stays cheap.
 """
 
 import os
 import logging
-from typing import Optional, Dict, Any
+import threading
+from typing import TYPE_CHECKING, Optional, Dict, Any
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 from jose import jwt
 from auth.models import User
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -35,11 +40,25 @@ class SupabaseService:
         if not all([url, service_key]):
             raise ValueError("Missing Supabase environment variables")
             
-        self.client = create_client(url, service_key)
+        self.url = url
+        self.service_key = service_key
+        self._client: Optional["Client"] = None
+        self._client_lock = threading.Lock()
         self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
         self.secret_key = os.getenv("SECRET_KEY", "bankai_secret_key_change_in_production_2024")
         self.algorithm = "HS256"
     
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            # The warm-up thread and the first request may get here together
+            with self._client_lock:
+                if self._client is None:
+                    from supabase import create_client
+
+                    self._client = create_client(self.url, self.service_key)
+        return self._client
+
     def hash_password(self, password: str) -> str:
         return self.pwd_context.hash(password)
     
@@ -0,0 +1,77 @@
+"""Admission queue: a waiter whose tenant starts another session while it waits"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def controller() -> AdmissionController:
+    admission = AdmissionController(max_sessions=1, max_per_customer=1, urgent_headroom=0, max_wait=5)
+    admission.overload_reason = lambda signals=None: None  # only the limits under test apply
+    return admission
+
+
+def test_waiter_rejected_on_redispatch_when_tenant_gained_a_session():
+    async def scenario():
+        admission = controller()
+        await admission.admit("s1", "other")
+        waiting = asyncio.create_task(admission.admit("s2", "cust"))
+        await asyncio.sleep(0)
+        # Capacity frees while the customer already holds a session started elsewhere (e.g. a resume)
+        admission.force_admit("s3", "cust")
+        admission.max_sessions = 3
+        with pytest.raises(AdmissionRejected) as rejected:
+            await waiting
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.reason == "customer_limit"
+    assert set(admission.active) == {"s1", "s3"}
+    assert admission.by_customer["cust"] == 1
+    assert not admission._waiters
+
+
+def test_waiter_rejected_on_release_when_tenant_gained_a_session():
+    async def scenario():
+        admission = controller()
+        admission.max_sessions = 3
+        admission.max_per_customer = 2
+        await admission.admit("s0", "other")
+        await admission.admit("s1", "another")
+        await admission.admit("s4", "cust")
+        waiting = asyncio.create_task(admission.admit("s2", "cust"))
+        await asyncio.sleep(0)
+        admission.mark_urgent("s4")  # the live call classifies as fraud; the customer's next call is urgent
+        urgent = asyncio.create_task(admission.admit("s3", "cust"))
+        await asyncio.sleep(0)
+        # Each release dispatches from this task, not from the waiters' own loops
+        admission.release("s0")  # the urgent call of the same customer goes first
+        await urgent
+        admission.release("s1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await waiting
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.reason == "customer_limit"
+    assert set(admission.active) == {"s3", "s4"}
+    assert admission.totals["rejected_customer_limit"] == 1
+
+
+def test_cancelled_waiter_granted_at_the_same_time_frees_its_slot():
+    async def scenario():
+        admission = controller()
+        await admission.admit("s1", "other")
+        waiting = asyncio.create_task(admission.admit("s2", "cust"))
+        await asyncio.sleep(0)
+        admission.release("s1")
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert not admission.active
+    assert not admission.by_customer
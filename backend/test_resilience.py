@@ -0,0 +1,83 @@
+"""Circuit breaker: opens after repeated transient failures, probes when half-open, closes on success"""
+
+import asyncio
+import time
+
+import pytest
+
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker("test", deadline=1, retries=0, failure_threshold=2, reset_seconds=0.05)
+
+
+def fail():
+    raise ConnectionError("provider unreachable")
+
+
+def succeed():
+    return "ok"
+
+
+def test_breaker_opens_probes_and_closes():
+    circuit = breaker()
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            circuit.call(fail)
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit.call(succeed)
+
+    time.sleep(0.06)
+    assert circuit.state == HALF_OPEN
+    assert circuit.call(succeed) == "ok"
+    assert circuit.state == CLOSED
+    assert circuit.counters["opened"] == 1
+    assert circuit.counters["rejected"] == 1
+
+
+def test_failed_probe_reopens_and_lets_one_probe_through():
+    async def scenario():
+        circuit = breaker()
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                circuit.call(fail)
+        await asyncio.sleep(0.06)
+
+        probe_started = asyncio.Event()
+
+        async def slow_failure():
+            probe_started.set()
+            await asyncio.sleep(0.01)
+            raise ConnectionError("still down")
+
+        probe = asyncio.create_task(circuit.acall(slow_failure))
+        await probe_started.wait()
+        # Only one probe at a time while half-open
+        with pytest.raises(CircuitOpenError):
+            await circuit.acall(slow_failure)
+        with pytest.raises(ConnectionError):
+            await probe
+        return circuit
+
+    circuit = asyncio.run(scenario())
+    assert circuit.state == OPEN
+    assert circuit.counters["opened"] == 2
+
+
+def test_client_errors_are_not_retried_and_do_not_open_the_breaker():
+    circuit = CircuitBreaker("test", deadline=1, retries=2, failure_threshold=1)
+    attempts = []
+
+    def rejected():
+        attempts.append(1)
+        raise ValueError("malformed request")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            circuit.call(rejected)
+    assert len(attempts) == 3
+    assert circuit.state == CLOSED
+    assert circuit.counters["client_errors"] == 3
+    assert circuit.counters["retries"] == 0
@@ -0,0 +1,98 @@
+"""Session teardown: concurrent end/abort share one teardown; a checkpoint resumes in a new manager"""
+
+import asyncio
+
+import session_manager as session_module
+from session_manager import ABORTED, CHECKPOINTED, ENDED, SessionManager
+
+
+class StandInHandler:
+    def __init__(self, window):
+        self.window = window
+
+    def checkpoint(self):
+        return self.window
+
+
+def stand_in_transcriber(monkeypatch, received, resumed):
+    """Replace the Transcribe stream with a task that drains the queue until the sentinel"""
+    async def stream_to_transcribe(session_id, queue, broadcast_callback, resume=None, on_handler=None):
+        resumed.append(resume)
+        on_handler(StandInHandler({"accumulated_text": f"window of {session_id}"}))
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            received.append(chunk)
+        await asyncio.sleep(0.01)  # flushing the final transcript
+
+    monkeypatch.setattr(session_module, "stream_to_transcribe", stream_to_transcribe)
+
+
+def stand_in_archiver(monkeypatch):
+    archived = []
+
+    async def archive_session(session_id, customer_id, chunks):
+        archived.append((session_id, customer_id, [chunk.data for chunk in chunks]))
+        return {"session_id": session_id}
+
+    monkeypatch.setattr(session_module.audio_archiver, "archive_session", archive_session)
+    return archived
+
+
+async def broadcast(suggestion):
+    pass
+
+
+def test_concurrent_end_and_abort_tear_down_once(monkeypatch):
+    stand_in_transcriber(monkeypatch, [], [])
+    archived = stand_in_archiver(monkeypatch)
+
+    async def scenario():
+        manager = SessionManager(end_grace=1)
+        session = manager.start_session("s1", "cust", "cust@example.com", broadcast)
+        await session.add_chunk(b"audio", 0)
+        ended, aborted = await asyncio.gather(manager.end("s1"), manager.abort("s1"))
+        repeated = await manager.abort("s1")
+        return manager, session, ended, aborted, repeated
+
+    manager, session, ended, aborted, repeated = asyncio.run(scenario())
+    assert ended is aborted is repeated is session
+    assert session.state == ENDED
+    assert manager.totals[ENDED] == 1
+    assert manager.totals[ABORTED] == 0
+    assert archived == [("s1", "cust", [b"audio"])]
+    assert "s1" not in manager.sessions
+
+
+def test_checkpoint_resumes_in_a_new_manager(monkeypatch, tmp_path):
+    received, resumed = [], []
+    stand_in_transcriber(monkeypatch, received, resumed)
+    archived = stand_in_archiver(monkeypatch)
+    monkeypatch.setattr(session_module, "SESSION_CHECKPOINT_DIR", str(tmp_path))
+
+    async def scenario():
+        old = SessionManager(end_grace=1)
+        session = old.start_session("s1", "cust", "cust@example.com", broadcast)
+        await session.add_chunk(b"first", 0)
+        await session.add_chunk(b"second", 1)
+        checkpointed = await old.checkpoint("s1")
+
+        new = SessionManager(end_grace=1)
+        result = await new.resume_from_checkpoints(broadcast)
+        restored = new.active("s1")
+        chunks = [chunk.data for chunk in restored.chunks]
+        await restored.add_chunk(b"third", restored.next_chunk_index)
+        await new.end("s1")
+        return checkpointed, result, restored, chunks
+
+    checkpointed, result, restored, chunks = asyncio.run(scenario())
+    assert checkpointed.state == CHECKPOINTED
+    assert result == {"resumed": 1, "expired": 0, "failed": 0}
+    assert restored.resumed and restored.customer_id == "cust"
+    assert chunks == [b"first", b"second"]
+    assert restored.chunk_count == 3
+    assert resumed == [None, {"accumulated_text": "window of s1"}]
+    assert received == [b"first", b"second", b"third"]
+    assert archived == [("s1", "cust", [b"first", b"second", b"third"])]
+    assert not list(tmp_path.iterdir())
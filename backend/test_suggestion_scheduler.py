@@ -0,0 +1,85 @@
+"""Suggestion scheduler: urgent work first, expiry of stale jobs, slots granted while cancelled"""
+
+import asyncio
+
+import pytest
+
+from admission import NORMAL, URGENT
+from suggestion_scheduler import JobExpired, SuggestionScheduler
+
+
+def test_urgent_job_runs_before_earlier_normal_job():
+    async def scenario():
+        scheduler = SuggestionScheduler(concurrency=1, deadline=5)
+        order = []
+        release = asyncio.Event()
+
+        async def job(session_id, priority):
+            async with scheduler.slot(session_id, priority, "classify"):
+                order.append(session_id)
+                if session_id == "busy":
+                    await release.wait()
+
+        busy = asyncio.create_task(job("busy", NORMAL))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(job("routine", NORMAL))]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.create_task(job("fraud", URGENT)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(busy, *waiting)
+        return scheduler, order
+
+    scheduler, order = asyncio.run(scenario())
+    assert order == ["busy", "fraud", "routine"]
+    assert scheduler.running == 0
+
+
+def test_job_queued_past_its_deadline_expires():
+    async def scenario():
+        scheduler = SuggestionScheduler(concurrency=1, deadline=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("busy", NORMAL, "classify"):
+                await release.wait()
+
+        busy = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(JobExpired):
+            async with scheduler.slot("late", NORMAL, "generate"):
+                pass
+        release.set()
+        await busy
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.totals["normal_expired"] == 1
+    assert scheduler.running == 0
+    assert not scheduler._queue
+
+
+def test_slot_granted_while_job_is_cancelled_is_given_back():
+    async def scenario():
+        scheduler = SuggestionScheduler(concurrency=1, deadline=5)
+        entered = []
+
+        async def wait_for_slot():
+            async with scheduler.slot("cancelled", NORMAL, "classify"):
+                entered.append(True)
+
+        busy = scheduler.slot("busy", NORMAL, "classify")
+        await busy.__aenter__()
+        waiting = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0)
+        # Freeing the slot grants it to the waiter, which is cancelled before it wakes
+        await busy.__aexit__(None, None, None)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return scheduler, entered
+
+    scheduler, entered = asyncio.run(scenario())
+    assert not entered
+    assert scheduler.running == 0
+    assert not scheduler._queue
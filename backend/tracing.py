@@ -0,0 +1,200 @@
+"""
+Latency tracing for the live audio to suggestion pipeline.
+
+This module records where time goes between an uploaded audio chunk and the
+suggestion broadcast to agents:
+- Per-session marks (last frame sent to Transcribe, start of a suggestion round)
+- Per-stage spans (decode, transcribe, classify, retrieve, generate, broadcast)
+- Aggregated p50/p95/p99 summaries per stage for the metrics endpoint
+- Time-to-suggestion SLO tracking with a violation counter
+
+Stage samples are kept in bounded reservoirs so memory stays flat no matter
+how long the server runs.
+"""
+
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import SUGGESTION_SLO_SECONDS
+from metrics import stage_seconds
+
+logger = logging.getLogger(__name__)
+
+STAGES = (
+    "decode",
+    "transcribe",
+    "classify",
+    "catalogue",
+    "retrieve",
+    "generate",
+    "combined",
+    "broadcast",
+    "time_to_suggestion",
+)
+
+RESERVOIR_SIZE = 2048      # samples kept per stage for percentile estimates
+SESSION_SPAN_HISTORY = 50  # recent spans kept per stage for each session
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class StageHistogram:
+    """Bounded reservoir of stage durations with running totals"""
+
+    def __init__(self, size: int = RESERVOIR_SIZE):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(percentile(ordered, 50), 4),
+            "p95": round(percentile(ordered, 95), 4),
+            "p99": round(percentile(ordered, 99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class SessionTrace:
+    """Marks and recent spans for a single streaming session"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.marks: Dict[str, float] = {}
+        self.spans: Dict[str, deque] = {}
+
+    def mark_once(self, name: str):
+        """Remember when an event first happened since the mark was last consumed"""
+        self.marks.setdefault(name, time.perf_counter())
+
+    def mark_latest(self, name: str):
+        """Remember when an event last happened, replacing any earlier mark"""
+        self.marks[name] = time.perf_counter()
+
+    def pop_elapsed(self, name: str) -> Optional[float]:
+        """Seconds since the named mark, consuming it. None if it was never set."""
+        started = self.marks.pop(name, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started
+
+    def add_span(self, stage: str, seconds: float):
+        if stage not in self.spans:
+            self.spans[stage] = deque(maxlen=SESSION_SPAN_HISTORY)
+        self.spans[stage].append(round(seconds, 4))
+
+    def summary(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "pending_marks": sorted(self.marks),
+            "stages": {stage: list(spans) for stage, spans in self.spans.items()},
+        }
+
+
+class LatencyTracer:
+    """Collects per-session spans and aggregates them per stage"""
+
+    def __init__(self, slo_seconds: float):
+        self.slo_seconds = slo_seconds
+        self.slo_violations = 0
+        self.histograms: Dict[str, StageHistogram] = {stage: StageHistogram() for stage in STAGES}
+        self.sessions: Dict[str, SessionTrace] = {}
+
+    def session(self, session_id: str) -> SessionTrace:
+        trace = self.sessions.get(session_id)
+        if trace is None:
+            trace = SessionTrace(session_id)
+            self.sessions[session_id] = trace
+        return trace
+
+    def end_session(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    def record(self, session_id: Optional[str], stage: str, seconds: float):
+        """Record a stage duration globally and, when known, for the session"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = StageHistogram()
+        histogram.observe(seconds)
+        stage_seconds.observe(seconds, stage)
+
+        if session_id:
+            self.session(session_id).add_span(stage, seconds)
+
+        if stage == "time_to_suggestion" and seconds > self.slo_seconds:
+            self.slo_violations += 1
+            logger.warning(
+                f"Time-to-suggestion SLO missed for session {session_id}: "
+                f"{seconds:.2f}s > {self.slo_seconds:.2f}s"
+            )
+
+    @contextmanager
+    def span(self, session_id: Optional[str], stage: str):
+        """Time the wrapped block as one span of the given stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(session_id, stage, time.perf_counter() - started)
+
+    def mark(self, session_id: Optional[str], name: str, latest: bool = False):
+        """Mark an event; by default the first occurrence wins until the mark is consumed"""
+        if session_id:
+            trace = self.session(session_id)
+            if latest:
+                trace.mark_latest(name)
+            else:
+                trace.mark_once(name)
+
+    def record_since(self, session_id: Optional[str], name: str, stage: str) -> Optional[float]:
+        """Record the time since a mark as a stage duration, consuming the mark"""
+        if not session_id or session_id not in self.sessions:
+            return None
+        elapsed = self.sessions[session_id].pop_elapsed(name)
+        if elapsed is not None:
+            self.record(session_id, stage, elapsed)
+        return elapsed
+
+    def clear_mark(self, session_id: Optional[str], name: str):
+        if session_id and session_id in self.sessions:
+            self.sessions[session_id].marks.pop(name, None)
+
+    def summary(self) -> Dict:
+        stages = {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+        p95 = stages["time_to_suggestion"]["p95"]
+        return {
+            "stages": stages,
+            "active_sessions": len(self.sessions),
+            "slo": {
+                "time_to_suggestion_seconds": self.slo_seconds,
+                "p95_seconds": p95,
+                "violations": self.slo_violations,
+                "within_slo": p95 <= self.slo_seconds,
+            },
+        }
+
+
+# Global tracer instance
+tracer = LatencyTracer(SUGGESTION_SLO_SECONDS)
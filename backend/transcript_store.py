@@ -0,0 +1,303 @@
+"""
+Indexed storage for session transcripts and suggestions.
+
+This module replaces the free-text files under transcripts/ and suggestions/
+with an append-only SQLite database in WAL mode:
+- transcripts(session_id, ts, text), indexed on (session_id, ts)
+- suggestions(session_id, ts, intent, query, suggestion), indexed on
+  (intent, ts), (session_id, ts) and ts
+- SessionStoreWriter batches a session's rows through BatchedWriter so the
+  live path pays one executemany per flush instead of one write per utterance
+- Keyset-paginated queries, so "all fraud_reporting suggestions this week"
+  is an index range scan rather than a scan of every file
+
+Run `python transcript_store.py migrate` to import the existing text files.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import TRANSCRIPT_DB_PATH
+from session_writer import BatchedWriter
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_session_ts ON transcripts (session_id, ts);
+
+CREATE TABLE IF NOT EXISTS suggestions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    intent TEXT NOT NULL,
+    query TEXT NOT NULL,
+    suggestion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_suggestions_intent_ts ON suggestions (intent, ts);
+CREATE INDEX IF NOT EXISTS idx_suggestions_session_ts ON suggestions (session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_suggestions_ts ON suggestions (ts);
+
+CREATE TABLE IF NOT EXISTS migrated_files (
+    path TEXT PRIMARY KEY,
+    migrated_at REAL NOT NULL
+);
+"""
+
+MAX_PAGE_SIZE = 500
+
+
+class TranscriptStore:
+    """SQLite-backed store; one writer connection, one reader connection per thread"""
+
+    def __init__(self, path: str = TRANSCRIPT_DB_PATH):
+        self.path = path
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _writer_conn(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+            self._writer.executescript(SCHEMA)
+        return self._writer
+
+    def _reader_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Make sure the schema exists before the first read
+            with self._write_lock:
+                self._writer_conn()
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # --- Writes ---
+
+    def insert_rows(self, transcripts: List[Tuple] = (), suggestions: List[Tuple] = ()):
+        """Insert transcript (session_id, ts, text) and suggestion
+        (session_id, ts, intent, query, suggestion) rows in one transaction"""
+        with self._write_lock:
+            conn = self._writer_conn()
+            with conn:
+                self._insert(conn, transcripts, suggestions)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, transcripts: List[Tuple], suggestions: List[Tuple]):
+        if transcripts:
+            conn.executemany(
+                "INSERT INTO transcripts (session_id, ts, text) VALUES (?, ?, ?)", transcripts
+            )
+        if suggestions:
+            conn.executemany(
+                "INSERT INTO suggestions (session_id, ts, intent, query, suggestion) VALUES (?, ?, ?, ?, ?)",
+                suggestions,
+            )
+
+    # --- Reads ---
+
+    def session_text(self, session_id: str) -> str:
+        """Full transcript of a session as a single string"""
+        rows = self._reader_conn().execute(
+            "SELECT text FROM transcripts WHERE session_id = ? ORDER BY ts, id", (session_id,)
+        ).fetchall()
+        return " ".join(row["text"] for row in rows)
+
+    def query_transcripts(self, session_id: str, since: Optional[float] = None, until: Optional[float] = None,
+                          limit: int = 100, after: Optional[Tuple[float, int]] = None) -> List[Dict]:
+        """Transcript lines for a session in time order"""
+        clauses, params = ["session_id = ?"], [session_id]
+        self._add_range(clauses, params, since, until)
+        if after:
+            clauses.append("(ts > ? OR (ts = ? AND id > ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        sql = f"SELECT id, session_id, ts, text FROM transcripts WHERE {' AND '.join(clauses)} ORDER BY ts, id LIMIT ?"
+        params.append(min(limit, MAX_PAGE_SIZE))
+        return [dict(row) for row in self._reader_conn().execute(sql, params)]
+
+    def query_suggestions(self, intent: Optional[str] = None, session_id: Optional[str] = None,
+                          since: Optional[float] = None, until: Optional[float] = None,
+                          limit: int = 100, before: Optional[Tuple[float, int]] = None) -> List[Dict]:
+        """Suggestions newest first, filtered by intent, session and time range"""
+        clauses, params = [], []
+        if intent:
+            clauses.append("intent = ?")
+            params.append(intent)
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        self._add_range(clauses, params, since, until)
+        if before:
+            clauses.append("(ts < ? OR (ts = ? AND id < ?))")
+            params.extend([before[0], before[0], before[1]])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT id, session_id, ts, intent, query, suggestion FROM suggestions {where} ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(min(limit, MAX_PAGE_SIZE))
+        return [dict(row) for row in self._reader_conn().execute(sql, params)]
+
+    @staticmethod
+    def _add_range(clauses: List[str], params: List, since: Optional[float], until: Optional[float]):
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+
+    # --- Migration of legacy text files ---
+
+    def is_migrated(self, *keys: str) -> bool:
+        placeholders = ", ".join("?" for _ in keys)
+        row = self._reader_conn().execute(
+            f"SELECT 1 FROM migrated_files WHERE path IN ({placeholders})", keys
+        ).fetchone()
+        return row is not None
+
+    def import_file(self, key: str, transcripts: List[Tuple] = (), suggestions: List[Tuple] = ()):
+        """Insert a legacy file's rows and mark it migrated in one transaction,
+        so an interrupted migration neither loses nor duplicates the file"""
+        with self._write_lock:
+            conn = self._writer_conn()
+            with conn:
+                self._insert(conn, transcripts, suggestions)
+                conn.execute(
+                    "INSERT OR REPLACE INTO migrated_files (path, migrated_at) VALUES (?, ?)", (key, time.time())
+                )
+
+
+class SessionStoreWriter(BatchedWriter):
+    """Batches one session's transcript and suggestion rows into the store"""
+
+    def __init__(self, store: TranscriptStore, session_id: str, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.session_id = session_id
+
+    async def write_transcript(self, text: str, ts: Optional[float] = None):
+        await self.write(("transcript", (self.session_id, ts or time.time(), text)), len(text))
+
+    async def write_suggestion(self, intent: str, query: str, suggestion: str, ts: Optional[float] = None):
+        row = (self.session_id, ts or time.time(), intent, query, suggestion)
+        await self.write(("suggestion", row), len(query) + len(suggestion))
+
+    def _write_batch(self, batch: List[Tuple[str, Tuple]]):
+        transcripts = [row for kind, row in batch if kind == "transcript"]
+        suggestions = [row for kind, row in batch if kind == "suggestion"]
+        self.store.insert_rows(transcripts, suggestions)
+
+
+# --- Legacy file parsing ---
+
+LEGACY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+TRANSCRIPT_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$")
+SUGGESTION_BLOCK = re.compile(
+    r"=== SUGGESTION GENERATED ===\n"
+    r"Timestamp: (?P<ts>[^\n]*)\n"
+    r"Session ID: (?P<session_id>[^\n]*)\n"
+    r"Intent: (?P<intent>[^\n]*)\n"
+    r"Query: (?P<query>[^\n]*)\n"
+    r"Suggestion:\n(?P<suggestion>.*?)\n={10,}",
+    re.DOTALL,
+)
+
+
+def _parse_legacy_time(value: str) -> float:
+    return time.mktime(time.strptime(value.strip(), LEGACY_TIME_FORMAT))
+
+
+def parse_transcript_file(path: str) -> List[Tuple]:
+    session_id = os.path.splitext(os.path.basename(path))[0]
+    rows = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = TRANSCRIPT_LINE.match(line.rstrip("\n"))
+            if match and match.group(2).strip():
+                rows.append((session_id, _parse_legacy_time(match.group(1)), match.group(2).strip()))
+    return rows
+
+
+def parse_suggestion_file(path: str) -> List[Tuple]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        content = f.read()
+    rows = []
+    for match in SUGGESTION_BLOCK.finditer(content):
+        rows.append((
+            match.group("session_id").strip(),
+            _parse_legacy_time(match.group("ts")),
+            match.group("intent").strip(),
+            match.group("query").strip(),
+            match.group("suggestion").strip(),
+        ))
+    return rows
+
+
+def migrate_legacy_files(store: TranscriptStore, transcripts_dir: str = "transcripts",
+                         suggestions_dir: str = "suggestions") -> Dict[str, int]:
+    """Import legacy text files; files already imported are skipped.
+
+    A file is recorded under its directory's role and its name (e.g.
+    "transcripts/<session>.txt"), so the record survives moving or remounting
+    the backend. Files recorded by absolute path by earlier runs still count.
+    """
+    stats = {"files": 0, "skipped": 0, "transcripts": 0, "suggestions": 0}
+
+    for directory, suffix, parser, kind in (
+        (transcripts_dir, ".txt", parse_transcript_file, "transcripts"),
+        (suggestions_dir, "_suggestions.txt", parse_suggestion_file, "suggestions"),
+    ):
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if not filename.endswith(suffix):
+                continue
+            key = f"{kind}/{filename}"
+            if store.is_migrated(key, os.path.abspath(path)):
+                stats["skipped"] += 1
+                continue
+
+            rows = parser(path)
+            store.import_file(key, **{kind: rows})
+            stats["files"] += 1
+            stats[kind] += len(rows)
+
+    return stats
+
+
+# Global store instance (connects lazily)
+transcript_store = TranscriptStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcript and suggestion store tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate = subcommands.add_parser("migrate", help="Import legacy transcripts/ and suggestions/ text files")
+    migrate.add_argument("--db", default=TRANSCRIPT_DB_PATH)
+    migrate.add_argument("--transcripts-dir", default="transcripts")
+    migrate.add_argument("--suggestions-dir", default="suggestions")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        result = migrate_legacy_files(TranscriptStore(args.db), args.transcripts_dir, args.suggestions_dir)
+        print(f"Migrated {result['files']} files ({result['skipped']} already imported): "
+              f"{result['transcripts']} transcript lines, {result['suggestions']} suggestions")
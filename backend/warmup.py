@@ -0,0 +1,97 @@
+"""
+Background warm-up of provider SDKs and shared clients.
+
+Heavy dependencies (anthropic/langchain_anthropic, boto3/langchain_aws,
+Chroma, supabase) are imported lazily by the modules that use them, so the server
+starts listening in well under a second. Left alone, the first live
+suggestion would then pay for those imports and for opening the vector
+store. WarmUp does that work in a worker thread right after startup:
+each step is timed, a failure is logged and recorded without stopping the
+others, and summary() reports progress for the readiness probe and
+benchmarks/import_time.py.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _import(module: str) -> Callable[[], None]:
+    return lambda: importlib.import_module(module)
+
+
+def _vector_store():
+    from main_llm import get_vectorstore
+    get_vectorstore()
+
+
+def _rag_chain():
+    from main_llm import get_rag_chain
+    get_rag_chain()
+
+
+def _supabase():
+    from supabase_service import supabase_service
+    supabase_service.client
+
+
+def _lexical_index():
+    from lexical_index import lexical_index
+    lexical_index.ensure_current()
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("anthropic_sdk", _import("langchain_anthropic")),
+    ("vector_store", _vector_store),
+    ("rag_chain", _rag_chain),
+    ("lexical_index", _lexical_index),
+    ("supabase", _supabase),
+]
+
+
+class WarmUp:
+    """Runs STEPS once in a worker thread and records how each went"""
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], None]]] = STEPS):
+        self.steps = steps
+        self.status: Dict[str, Dict] = {name: {"state": "pending"} for name, _ in steps}
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.seconds is not None
+
+    def succeeded(self, name: str) -> bool:
+        return self.status.get(name, {}).get("state") == "ok"
+
+    def start(self):
+        """Schedule the warm-up on the running loop (idempotent)"""
+        if self._task is None:
+            self._task = asyncio.create_task(asyncio.to_thread(self.run), name="warm-up")
+
+    def run(self):
+        self.started_at = time.monotonic()
+        for name, step in self.steps:
+            started = time.perf_counter()
+            try:
+                step()
+                self.status[name] = {"state": "ok", "seconds": round(time.perf_counter() - started, 3)}
+            except Exception as e:
+                self.status[name] = {"state": "failed", "seconds": round(time.perf_counter() - started, 3),
+                                     "error": str(e)}
+                logger.warning("Warm-up step %s failed: %s", name, e)
+        self.seconds = round(time.monotonic() - self.started_at, 3)
+        logger.info("Warm-up finished in %.2fs", self.seconds)
+
+    def summary(self) -> Dict:
+        return {"complete": self.complete, "seconds": self.seconds, "steps": self.status}
+
+
+# Global warm-up, started by the app
+warm_up = WarmUp()
@@ -1,9 +1,9 @@
 import json
-from datetime import datetime ,UTC
 import logging
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from auth.utils import verify_jwt_token
 from database.fake_db import db
+from records import ConnectionRecord
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -26,11 +26,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
     await websocket.accept()
 
     # Store connection
-    db.active_connections[websocket] = {
-        "username": username,
-        "role": role,
-        "connected_at": datetime.now(UTC)
-    }
+    db.active_connections[websocket] = ConnectionRecord(username, role)
 
     logger.info(f"✅ WebSocket connected: {username} ({role})")
 
@@ -53,15 +49,15 @@ async def forward_message(sender_ws, message):
     if not sender_info:
         return
 
-    sender_role = sender_info["role"]
+    sender_role = sender_info.role
     
     for ws, user_info in db.active_connections.items():
         if ws != sender_ws:
             try:
                 # Route agent->customer, customer->agent
                 should_forward = (
-                    (sender_role == "agent" and user_info["role"] == "customer") or
-                    (sender_role == "customer" and user_info["role"] == "agent") or
+                    (sender_role == "agent" and user_info.role == "customer") or
+                    (sender_role == "customer" and user_info.role == "agent") or
                     message.get("type") in ["peer-ready", "peer-disconnected"]
                 )
                 
@@ -89,6 +89,20 @@ update_env_file() {
     log ".env file updated with new endpoint"
 }
 
+# Checkpoint live calls so the restarted backend resumes them instead of dropping them
+drain_backend() {
+    local token="${ADMIN_API_TOKEN:-$(grep -s '^ADMIN_API_TOKEN=' backend/.env | cut -d= -f2-)}"
+    if [ -z "$token" ]; then
+        warn "ADMIN_API_TOKEN not set; live calls will be checkpointed on shutdown instead"
+        return
+    fi
+    if curl -f -s -X POST --max-time 60 -H "X-Admin-Token: $token" http://localhost:9795/admin/drain >/dev/null 2>&1; then
+        log "Backend drained; live calls checkpointed"
+    else
+        warn "Backend drain request failed; continuing"
+    fi
+}
+
 # Restart containers with new configuration
 restart_containers() {
     # Check if containers are running
@@ -102,6 +116,7 @@ restart_containers() {
     log "Restarting containers with new IP..."
     
     # Quick restart (no rebuild)
+    drain_backend
     docker-compose restart
     
     log "Containers restarted"
@@ -152,11 +152,26 @@ EOF
     log "Auto-startup script created"
 }
 
+# Checkpoint live calls so the restarted backend resumes them instead of dropping them
+drain_backend() {
+    local token="${ADMIN_API_TOKEN:-$(grep -s '^ADMIN_API_TOKEN=' backend/.env | cut -d= -f2-)}"
+    if [ -z "$token" ]; then
+        warn "ADMIN_API_TOKEN not set; live calls will be checkpointed on shutdown instead"
+        return
+    fi
+    if curl -f -s -X POST --max-time 60 -H "X-Admin-Token: $token" http://localhost:9795/admin/drain >/dev/null 2>&1; then
+        log "Backend drained; live calls checkpointed"
+    else
+        warn "Backend drain request failed; continuing"
+    fi
+}
+
 # Check if containers are running
 check_existing_containers() {
     if docker-compose ps | grep -q "Up"; then
         warn "Containers are running with potentially old IP"
         warn "Stopping and rebuilding with current IP..."
+        drain_backend
         docker-compose down 2>/dev/null || true
     fi
 }
@@ -201,8 +216,8 @@ wait_for_services() {
     attempt=0
     
     while [ $attempt -lt $max_attempts ]; do
-        # Check backend
-        if curl -f -s http://localhost:9795/health >/dev/null 2>&1; then
+        # Check backend: /ready passes once warm-up is done and ffmpeg and ASR are reachable
+        if curl -f -s http://localhost:9795/ready >/dev/null 2>&1; then
             log "Backend is ready"
             break
         fi
@@ -215,7 +230,7 @@ wait_for_services() {
     done
     
     if [ $attempt -eq $max_attempts ]; then
-        warn "Backend health check timeout, but continuing..."
+        warn "Backend readiness check timeout (see http://localhost:9795/ready), but continuing..."
     fi
     
     # Check if nginx is responding